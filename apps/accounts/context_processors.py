@@ -1,14 +1,17 @@
-from .utils import get_current_team, get_user_teams
+from django.utils.functional import SimpleLazyObject
+
+from .utils import get_current_team, get_team_nav, get_user_teams
 
 def team_context_processor(request):
     """
     Context processor to add the current team and its members to the request context.
+    The navigation comes from `team_nav`, which is cached per user; the model
+    instances are only loaded by templates that use them.
     """
     if not request.user.is_authenticated:
         return {}
-    current_team = get_current_team(request)
-    user_teams = get_user_teams(request)
     return {
-        'current_team': current_team,
-        'user_teams': user_teams,
-    }
\ No newline at end of file
+        'team_nav': get_team_nav(request),
+        'current_team': SimpleLazyObject(lambda: get_current_team(request)),
+        'user_teams': SimpleLazyObject(lambda: get_user_teams(request)),
+    }
@@ -3,8 +3,8 @@ from django.shortcuts import redirect
 from django.core.exceptions import PermissionDenied
 
 from django.http import HttpRequest
-from .models import Team, UserActivation
-from .utils import get_or_null, get_user_teams
+from .models import Team
+from .utils import get_or_null, get_user_teams, is_activation_required
 from django.contrib import messages
 
 
@@ -12,7 +12,7 @@ def require_team(view_func):
     @wraps(view_func)
     def _wrapped_view(request: HttpRequest, *args, **kwargs):
 
-        if UserActivation.objects.filter(user=request.user, is_active=False).exists():
+        if is_activation_required(request):
             messages.error(
                 request, "Please activate your account to access this feature."
             )
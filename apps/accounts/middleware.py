@@ -5,9 +5,8 @@ from django.http import HttpResponse, JsonResponse
 from django.urls import resolve
 from django.utils.deprecation import MiddlewareMixin
 
-from .models import UserActivation
-from apps.accounts.utils import get_current_team
-from apps.core.utils import get_or_null, is_htmx  # assume you have `is_htmx`
+from apps.accounts.utils import get_current_team, is_activation_required
+from apps.core.utils import is_htmx
 
 logger = logging.getLogger(__name__)
 
@@ -46,8 +45,7 @@ class UserActivationMiddleware(MiddlewareMixin):
         if request.path in self.exempt_paths:
             return  # exempt path
 
-        activation_required = get_or_null(UserActivation, user=user, is_active=False)
-        if not activation_required:
+        if not is_activation_required(request):
             return  # already activated
 
         # log the block
@@ -1,7 +1,8 @@
-from .models import User, UserProfile, UserActivation, Team
+from .models import User, UserProfile, UserActivation, Team, TeamMember
+from .utils import invalidate_team_nav
 from apps.accounts.tasks import send_user_activation_email
 from django.contrib.auth.signals import user_logged_in
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from apps.billing.models import Plan
 
@@ -49,3 +50,28 @@ def set_base_free_plan(sender, instance, created, **kwargs):
         )
         instance.plan = base_free_plan
         instance.save()
+
+
+@receiver(post_save, sender=TeamMember)
+@receiver(post_delete, sender=TeamMember)
+def invalidate_member_team_nav(sender, instance, **kwargs):
+    """
+    Refresh the team navigation of a user who joined or left a team.
+    """
+    invalidate_team_nav([instance.user_id])
+
+
+@receiver(post_save, sender=Team)
+def invalidate_members_team_nav(sender, instance, **kwargs):
+    """
+    Refresh the team navigation of every member of a changed team.
+    """
+    invalidate_team_nav(list(instance.members.values_list("id", flat=True)))
+
+
+@receiver(post_save, sender=Plan)
+def invalidate_plan_team_nav(sender, instance, **kwargs):
+    """
+    Refresh every team navigation, since it shows the plans' names.
+    """
+    invalidate_team_nav()
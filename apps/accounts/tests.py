@@ -1,3 +1,70 @@
+from types import SimpleNamespace
+from unittest import mock
+
 from django.test import TestCase
 
-# Create your tests here.
+from apps.accounts import utils
+from apps.accounts.models import Team, TeamMember, User, UserActivation
+from apps.accounts.utils import ACTIVATED_SESSION_KEY, get_team_nav, is_activation_required
+
+
+class ActivationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="new", password="password")
+        self.request = SimpleNamespace(user=self.user, session={})
+
+    def test_queries_until_the_account_is_activated(self):
+        self.assertTrue(is_activation_required(self.request))
+        self.assertNotIn(ACTIVATED_SESSION_KEY, self.request.session)
+        UserActivation.objects.filter(user=self.user).update(is_active=True)
+        self.assertFalse(is_activation_required(self.request))
+        self.assertEqual(self.request.session[ACTIVATED_SESSION_KEY], self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertFalse(is_activation_required(self.request))
+
+    def test_flag_only_applies_to_its_user(self):
+        self.request.session[ACTIVATED_SESSION_KEY] = self.user.pk + 1
+        self.assertTrue(is_activation_required(self.request))
+
+
+class TeamNavTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="member", password="password")
+        self.team = Team.objects.create(name="First", slug="first", owner=self.user)
+        TeamMember.objects.create(user=self.user, team=self.team)
+        self.request = SimpleNamespace(user=self.user, session={})
+
+    def names(self):
+        return [team["name"] for team in get_team_nav(self.request)["teams"]]
+
+    def test_current_team_falls_back_to_the_first(self):
+        other = Team.objects.create(name="Second", slug="second", owner=self.user)
+        TeamMember.objects.create(user=self.user, team=other)
+        self.assertEqual(get_team_nav(self.request)["current"]["id"], self.team.pk)
+        self.request.session["current_team_id"] = other.pk
+        self.assertEqual(get_team_nav(self.request)["current"]["id"], other.pk)
+
+    def test_cached_until_a_team_changes(self):
+        self.assertEqual(self.names(), ["First"])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names(), ["First"])
+        self.team.name = "Renamed"
+        self.team.save()
+        self.assertEqual(self.names(), ["Renamed"])
+
+    def test_refreshed_when_the_user_joins_a_team(self):
+        self.assertEqual(self.names(), ["First"])
+        other = Team.objects.create(name="Second", slug="second", owner=self.user)
+        TeamMember.objects.create(user=self.user, team=other)
+        self.assertEqual(self.names(), ["First", "Second"])
+
+    def test_cached_for_a_bounded_time(self):
+        with mock.patch.object(utils.cache, "set") as cache_set:
+            get_team_nav(self.request)
+        self.assertEqual(cache_set.call_args.args[2], utils.TEAM_NAV_TTL)
+        self.assertLessEqual(utils.TEAM_NAV_TTL, 5 * 60)
+
+    def test_invalidating_no_users_is_a_no_op(self):
+        with mock.patch.object(utils.cache, "get_many") as get_many:
+            utils.invalidate_team_nav([])
+        get_many.assert_not_called()
@@ -1,7 +1,34 @@
-from .models import Team
+from .models import Team, UserActivation
 from apps.core.utils import get_or_null
+from django.core.cache import cache
 from django.shortcuts import redirect
 
+
+# Session key holding the id of the user once their account is known to be
+# activated. Activation never expires, so the flag is kept for the session.
+ACTIVATED_SESSION_KEY = "activated_user_id"
+
+
+def mark_activated(request):
+    """
+    Remember in the session that the current user's account is activated.
+    """
+    request.session[ACTIVATED_SESSION_KEY] = request.user.pk
+
+
+def is_activation_required(request):
+    """
+    Whether the authenticated user still has to activate their account.
+    Only queries `UserActivation` until the account is seen activated once
+    in the session.
+    """
+    if request.session.get(ACTIVATED_SESSION_KEY) == request.user.pk:
+        return False
+    if UserActivation.objects.filter(user=request.user, is_active=False).exists():
+        return True
+    mark_activated(request)
+    return False
+
 def switch_team(request, team_id):
     """
     Switch the current team context for the user.
@@ -29,4 +56,57 @@ def get_user_teams(request):
     """
     Get all teams associated with the user.
     """
-    return request.user.teams.all() if request.user.is_authenticated else None
\ No newline at end of file
+    return request.user.teams.all() if request.user.is_authenticated else None
+
+# How long a user's team navigation is cached. Changes bump a version; this
+# bounds how stale it gets when a bump is missed, e.g. with a per-process cache.
+TEAM_NAV_TTL = 5 * 60
+# Bumped when something shown for every team changes, e.g. a plan's name.
+TEAM_NAV_VERSION_KEY = "team_nav:version"
+
+
+def _team_nav_version_key(user_id):
+    return f"team_nav:{user_id}:version"
+
+
+def invalidate_team_nav(user_ids=None):
+    """
+    Drop the cached team navigation of `user_ids`, or of every user.
+    """
+    if user_ids is None:
+        keys = [TEAM_NAV_VERSION_KEY]
+    else:
+        keys = [_team_nav_version_key(user_id) for user_id in user_ids]
+    if not keys:
+        return
+    versions = cache.get_many(keys)
+    cache.set_many({key: versions.get(key, 0) + 1 for key in keys}, None)
+
+
+def get_team_nav(request):
+    """
+    Return the navigation context of the user's teams, cached per user:
+    `{"teams": [{"id", "name", "slug", "logo_url", "plan"}], "current": team}`,
+    with `current` the session's current team, falling back to the first
+    team like `get_current_team`.
+    """
+    user_id = request.user.pk
+    version_key = _team_nav_version_key(user_id)
+    versions = cache.get_many([TEAM_NAV_VERSION_KEY, version_key])
+    key = f"team_nav:{user_id}:{versions.get(TEAM_NAV_VERSION_KEY, 0)}:{versions.get(version_key, 0)}"
+    teams = cache.get(key)
+    if teams is None:
+        teams = [
+            {
+                "id": team.id,
+                "name": team.name,
+                "slug": team.slug,
+                "logo_url": team.logo.url if team.logo else "",
+                "plan": team.plan.name if team.plan else "",
+            }
+            for team in request.user.teams.select_related("plan")
+        ]
+        cache.set(key, teams, TEAM_NAV_TTL)
+    team_id = request.session.get('current_team_id')
+    current = next((team for team in teams if team["id"] == team_id), teams[0] if teams else None)
+    return {"teams": teams, "current": current}
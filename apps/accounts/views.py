@@ -10,6 +10,7 @@ from apps.accounts.forms import (
 )
 from apps.core.utils import get_or_null
 from .models import UserActivation
+from .utils import mark_activated
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from .tasks import send_user_activation_email
@@ -100,6 +101,7 @@ def activate_view(request):
                     "Your account has been activated successfully!",
                 )
                 login(request, activation.user)
+                mark_activated(request)
             else:
                 messages.error(request, "Activation code is invalid or expired.")
             return redirect("analytics:index")
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import VisitorSession, PageView, Site
+from .models import VisitorSession, PageView, Site, SiteDailyStats, Visit
 from .tasks import verify_site
 
 
@@ -56,3 +56,25 @@ class VisitorSessionAdmin(admin.ModelAdmin):
     ordering = ("-created_at",)
     list_filter = ("created_at",)
     inlines = [PageViewInline]
+
+
+@admin.register(SiteDailyStats)
+class SiteDailyStatsAdmin(admin.ModelAdmin):
+    """Admin interface for browsing daily rollups."""
+
+    list_display = ("site", "date", "pageviews", "visitors", "updated_at")
+    list_filter = ("date",)
+    search_fields = ("site__name", "site__site_id")
+    ordering = ("-date",)
+    readonly_fields = ("updated_at",)
+
+
+@admin.register(Visit)
+class VisitAdmin(admin.ModelAdmin):
+    """Admin interface for browsing sessionized visits."""
+
+    list_display = ("site", "visitor", "started_at", "last_seen_at", "pageviews", "entry_url")
+    list_filter = ("site",)
+    search_fields = ("visitor__pf_id", "entry_url", "exit_url")
+    ordering = ("-started_at",)
+    raw_id_fields = ("visitor",)
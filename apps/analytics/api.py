@@ -1,11 +1,19 @@
-import uuid, json
-from django.http import JsonResponse
+from django.db import InterfaceError, OperationalError
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404
 from django.views.decorators.csrf import csrf_exempt
-from apps.analytics.models import VisitorSession, PageView, Site
+from apps.analytics.models import Site
 from django.contrib.auth.decorators import login_required
-from apps.analytics.services import get_site_analytics
-from apps.core.utils import cors_enabled
+from apps.analytics.caching import CHART_TTLS, get_cached_site_analytics
+from apps.analytics.ingest import (
+    InvalidBeacon,
+    QuotaExceeded,
+    decode_payload,
+    ingest_beacon,
+    parse_beacon,
+)
+from apps.analytics.spool import spool_beacon
+from apps.core.utils import cors_enabled, lean_route
 
 
 from rest_framework.views import APIView
@@ -14,6 +22,7 @@ from rest_framework.permissions import IsAuthenticated
 from .serializers import AnalyticsChartQuerySerializer
 
 
+@lean_route
 @csrf_exempt
 @cors_enabled
 def collect_data(request):
@@ -23,36 +32,35 @@ def collect_data(request):
     It expects a POST request with JSON data containing the analytics information.
     """
     if request.method == "POST":
-        data = json.loads(request.body.decode("utf-8")) if request.body else {}
-        pf_id = data.get("pf_id")
-        site_id = data.get("site_id")
-        if not site_id:
+        try:
+            data = decode_payload(request.body)
+        except InvalidBeacon as e:
+            return JsonResponse({"status": "error", "message": str(e)}, status=400)
+        beacon = parse_beacon(request, data)
+        try:
+            page_view = ingest_beacon(beacon)
+        except Site.DoesNotExist:
+            raise Http404("Site not found.")
+        except QuotaExceeded:
             return JsonResponse(
-                {"status": "error", "message": "Site ID is required."}, status=400
+                {"status": "error", "message": "Pageview quota exceeded."}, status=429
+            )
+        except (OperationalError, InterfaceError):
+            # Keep the beacon; it is stored once the database is back.
+            spool_beacon(beacon)
+            return JsonResponse(
+                {
+                    "status": "success",
+                    "message": "Data queued.",
+                    "visitor_id": beacon["pf_id"],
+                    "page_view_id": None,
+                },
+                status=202,
             )
-        site = get_object_or_404(Site, site_id=site_id)
-        if not pf_id:
-            pf_id = str(uuid.uuid4())
-        visitor_session, created = VisitorSession.objects.get_or_create(
-            pf_id=pf_id,
-        )
-        visitor_session.user_agent = data.get("ua", "")
-        visitor_session.timestamp = data.get(
-            "ts", None
-        )  # Optional: Update timestamp if provided
-        visitor_session.save()
-        page_view = PageView.objects.create(
-            visitor=visitor_session,
-            site=site,
-            url=data.get("url", ""),
-            referrer=data.get("referrer", ""),
-            screen_width=data.get("width", ""),
-            screen_height=data.get("height", ""),
-        )
         response_data = {
             "status": "success",
             "message": "Data collected successfully.",
-            "visitor_id": visitor_session.pf_id,
+            "visitor_id": beacon["pf_id"],
             "page_view_id": page_view.id,
         }
         return JsonResponse(response_data, status=200)
@@ -78,5 +86,11 @@ class AnalyticsChartDataAPI(APIView):
         range = serializer.validated_data["range"]
 
         site = get_object_or_404(Site, site_id=site_id)
-        data = get_site_analytics(site, range)
-        return Response(data, status=200)
+        data, etag = get_cached_site_analytics(site, range)
+        headers = {
+            "ETag": etag,
+            "Cache-Control": f"private, max-age={CHART_TTLS[range]}",
+        }
+        if etag in request.headers.get("If-None-Match", ""):
+            return Response(status=304, headers=headers)
+        return Response(data, status=200, headers=headers)
@@ -0,0 +1,413 @@
+"""
+Benchmark helpers: synthetic analytics data and latency statistics.
+
+`generate_page_views` fills a site with page views whose shape resembles real
+traffic (a long tail of pages, a mix of referrers, devices and countries,
+visits of a few pages each and more traffic during the day than at night), so
+dashboard timings measured on it carry over to production. The management
+commands `generate_analytics_data`, `benchmark_analytics` and
+`benchmark_collector` build on these helpers.
+"""
+
+import math
+import random
+import time
+from array import array
+from datetime import datetime, time as dt_time, timedelta
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.analytics.caching import (
+    get_cached_all_site_analytics,
+    get_cached_site_analytics,
+    invalidate_site_analytics,
+)
+from apps.analytics.dashboard import get_dashboard
+from apps.analytics.devices import set_device_dimensions
+from apps.analytics.importer import write_page_views
+from apps.analytics.models import DEVICE_MOBILE, DEVICE_TABLET, PageView, VisitorSession
+from apps.analytics.normalization import get_url_dimensions
+from apps.analytics.services import (
+    CHART_RANGES,
+    count_views_since,
+    encode_log_cursor,
+    get_all_site_analytics,
+    get_page_view_log,
+    get_pageviews_by_day,
+    get_site_analytics,
+    get_top_pages,
+    get_top_referrers,
+    get_visitors,
+)
+from apps.analytics.visits import get_device_breakdowns, get_visit_stats
+from apps.forms.models import FormSubmission
+
+
+BATCH_SIZE = 10000
+# Distinct pages per site; their popularity follows Zipf's law.
+PAGE_COUNT = 500
+# Average page views per visitor over the generated period.
+VIEWS_PER_VISITOR = 5
+# Average page views per visit and seconds between them.
+MEAN_VISIT_PAGES = 2.5
+MEAN_PAGE_GAP = 45
+
+SECTIONS = ["", "pricing", "docs", "blog", "features", "about", "contact", "changelog"]
+
+REFERRERS = [
+    ("", 45),
+    ("https://www.google.com/", 25),
+    ("https://www.bing.com/", 3),
+    ("https://duckduckgo.com/", 3),
+    ("https://t.co/", 4),
+    ("https://news.ycombinator.com/", 4),
+    ("https://www.reddit.com/r/webdev/", 5),
+    ("https://www.linkedin.com/", 3),
+    ("https://github.com/", 5),
+    ("https://www.facebook.com/", 3),
+]
+
+USER_AGENTS = [
+    (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36",
+        35,
+    ),
+    (
+        "Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 "
+        "(KHTML, like Gecko) Version/17.5 Mobile/15E148 Safari/604.1",
+        22,
+    ),
+    (
+        "Mozilla/5.0 (Linux; Android 14; Pixel 8) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/126.0.0.0 Mobile Safari/537.36",
+        18,
+    ),
+    (
+        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 "
+        "(KHTML, like Gecko) Version/17.5 Safari/605.1.15",
+        10,
+    ),
+    ("Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:127.0) Gecko/20100101 Firefox/127.0", 6),
+    (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36 Edg/126.0.0.0",
+        5,
+    ),
+    (
+        "Mozilla/5.0 (iPad; CPU OS 17_5 like Mac OS X) AppleWebKit/605.1.15 "
+        "(KHTML, like Gecko) Version/17.5 Mobile/15E148 Safari/604.1",
+        2,
+    ),
+    ("Mozilla/5.0 (X11; Linux x86_64; rv:127.0) Gecko/20100101 Firefox/127.0", 2),
+]
+
+# (width, height) of the screens of desktop and mobile visitors.
+DESKTOP_SCREENS = [
+    ((1920, 1080), 40), ((1536, 864), 15), ((1440, 900), 15), ((1366, 768), 15), ((2560, 1440), 15),
+]
+MOBILE_SCREENS = [((390, 844), 45), ((414, 896), 20), ((360, 800), 25), ((820, 1180), 10)]
+
+COUNTRIES = [
+    ("US", 30), ("IN", 10), ("DE", 8), ("GB", 7), ("FR", 5), ("BR", 5), ("CA", 4),
+    ("JP", 3), ("NL", 3), ("ES", 3), ("PL", 2), ("AU", 2), ("IT", 2), ("", 16),
+]
+
+
+def _hour_weights():
+    """
+    Relative traffic per local hour: lowest around 04:00, highest around 16:00.
+    """
+    return [1.2 + math.cos((hour - 16) * math.pi / 12) for hour in range(24)]
+
+
+def _split(weighted):
+    values, weights = zip(*weighted)
+    return list(values), list(weights)
+
+
+class TrafficModel:
+    """
+    Draws visitors, visits and page views of one site.
+    """
+
+    def __init__(self, site, days, seed=None):
+        self.site = site
+        self.tz = site.tzinfo
+        self.today = timezone.now().astimezone(self.tz).date()
+        self.days = days
+        self.random = random.Random(seed)
+        base = site.url.rstrip("/")
+        self.pages = [f"{base}/{section}" for section in SECTIONS]
+        self.pages += [
+            f"{base}/{SECTIONS[3 + index % 3]}/{index}" for index in range(PAGE_COUNT - len(self.pages))
+        ]
+        self.page_weights = [1 / rank for rank in range(1, len(self.pages) + 1)]
+        self.referrers, self.referrer_weights = _split(REFERRERS)
+        self.user_agents, self.user_agent_weights = _split(USER_AGENTS)
+        self.countries, self.country_weights = _split(COUNTRIES)
+        self.desktop_screens, self.desktop_weights = _split(DESKTOP_SCREENS)
+        self.mobile_screens, self.mobile_weights = _split(MOBILE_SCREENS)
+        self.hour_weights = _hour_weights()
+
+    def user_agent(self):
+        return self.random.choices(self.user_agents, self.user_agent_weights)[0]
+
+    def visit_start(self):
+        """
+        A random time in the last `days` days, weighted by local hour.
+        """
+        day = self.today - timedelta(days=self.random.randrange(self.days))
+        hour = self.random.choices(range(24), self.hour_weights)[0]
+        start = datetime.combine(day, dt_time(hour), tzinfo=self.tz)
+        start += timedelta(seconds=self.random.randrange(3600))
+        # Leave room for the rest of the visit before now.
+        return min(start, timezone.now() - timedelta(hours=1))
+
+    def visit_pages(self):
+        """
+        The number of pages of a visit, geometrically distributed.
+        """
+        return 1 + int(math.log(1 - self.random.random()) / math.log(1 - 1 / MEAN_VISIT_PAGES))
+
+    def visit(self, visitor_id, handheld, pages):
+        """
+        Yield the unsaved page views of one visit of a visitor.
+        """
+        screen = (
+            self.random.choices(self.mobile_screens, self.mobile_weights)[0]
+            if handheld
+            else self.random.choices(self.desktop_screens, self.desktop_weights)[0]
+        )
+        country = self.random.choices(self.countries, self.country_weights)[0]
+        referrer = self.random.choices(self.referrers, self.referrer_weights)[0]
+        timestamp = self.visit_start()
+        for _ in range(pages):
+            url = self.random.choices(self.pages, self.page_weights)[0]
+            yield PageView(
+                site=self.site,
+                visitor_id=visitor_id,
+                url=url,
+                referrer=referrer,
+                **get_url_dimensions(url, referrer),
+                country=country,
+                screen_width=screen[0],
+                screen_height=screen[1],
+                timestamp=timestamp,
+            )
+            # Later pages of the visit are referred by the previous one.
+            referrer = url
+            timestamp += timedelta(seconds=self.random.expovariate(1 / MEAN_PAGE_GAP))
+
+    def beacon(self, visitors):
+        """
+        The JSON body of a collect request by one of `visitors` random visitors.
+        """
+        width, height = self.random.choices(self.desktop_screens, self.desktop_weights)[0]
+        return {
+            "site_id": self.site.site_id,
+            "pf_id": f"bench:{self.site.site_id}:{int(visitors * self.random.random() ** 2)}",
+            "url": self.random.choices(self.pages, self.page_weights)[0],
+            "referrer": self.random.choices(self.referrers, self.referrer_weights)[0],
+            "ua": self.user_agent(),
+            "width": width,
+            "height": height,
+        }
+
+
+def _create_visitors(model, count, batch_size):
+    """
+    Create `count` visitors for the model's site and return their primary keys
+    and whether each is on a handheld device. Existing generated visitors of
+    the site are reused.
+    """
+    prefix = f"bench:{model.site.site_id}:"
+    existing = VisitorSession.objects.filter(pf_id__startswith=prefix).count()
+    for start in range(existing, count, batch_size):
+        visitors = []
+        for index in range(start, min(start + batch_size, count)):
+            visitor = VisitorSession(pf_id=f"{prefix}{index}", user_agent=model.user_agent())
+            set_device_dimensions(visitor)
+            visitors.append(visitor)
+        VisitorSession.objects.bulk_create(visitors, batch_size=1000, ignore_conflicts=True)
+
+    pks = array("q")
+    handheld = bytearray()
+    visitors = (
+        VisitorSession.objects.filter(pf_id__startswith=prefix)
+        .order_by("pk")
+        .values_list("pk", "device_type")
+    )
+    for pk, device_type in visitors.iterator(chunk_size=batch_size):
+        pks.append(pk)
+        handheld.append(device_type in (DEVICE_MOBILE, DEVICE_TABLET))
+    return pks, handheld
+
+
+def generate_page_views(site, rows, days=90, batch_size=BATCH_SIZE, seed=None, progress=None):
+    """
+    Add `rows` synthetic page views from the last `days` days to `site`.
+
+    Visitors are drawn with a skew towards returning ones, so a few visitors
+    account for many visits. `progress(written)` is called after every batch.
+    Returns the earliest generated timestamp, or None when nothing was written.
+    """
+    model = TrafficModel(site, days, seed)
+    pks, handheld = _create_visitors(model, max(1, rows // VIEWS_PER_VISITOR), batch_size)
+
+    written = 0
+    earliest = None
+    batch = []
+    while written + len(batch) < rows:
+        # Squaring a uniform draw favours the first visitors of the pool.
+        index = int(len(pks) * model.random.random() ** 2)
+        pages = min(model.visit_pages(), rows - written - len(batch))
+        for page_view in model.visit(pks[index], handheld[index], pages):
+            batch.append(page_view)
+            earliest = page_view.timestamp if earliest is None else min(earliest, page_view.timestamp)
+        if len(batch) >= batch_size:
+            write_page_views(batch)
+            written += len(batch)
+            batch = []
+            if progress:
+                progress(written)
+    if batch:
+        write_page_views(batch)
+        written += len(batch)
+        if progress:
+            progress(written)
+    return earliest
+
+
+def generate_form_submissions(form, site, rows, days=90, batch_size=BATCH_SIZE, seed=None):
+    """
+    Add `rows` synthetic submissions from the last `days` days to `form`,
+    timed like the page views of `site`.
+
+    Submissions are bulk-created, so no webhook events are sent for them.
+    Returns the number of submissions written.
+    """
+    model = TrafficModel(site, days, seed)
+    names = list(form.fields.values_list("name", flat=True)) or ["name", "email", "message"]
+
+    written = 0
+    while written < rows:
+        submissions = [
+            FormSubmission(
+                form=form,
+                submitted_at=model.visit_start(),
+                data={name: f"{name}-{index}" for name in names},
+            )
+            for index in range(written, min(written + batch_size, rows))
+        ]
+        FormSubmission.objects.bulk_create(submissions, batch_size=1000)
+        written += len(submissions)
+    return written
+
+
+def percentile(samples, percent):
+    """
+    The `percent` percentile of `samples` by the nearest-rank method.
+    """
+    ordered = sorted(samples)
+    if not ordered:
+        return 0
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(samples, queries=None):
+    """
+    Return count, mean, p50, p99 and max of latency `samples` in milliseconds,
+    and the queries per call when `queries` is given.
+    """
+    summary = {
+        "count": len(samples),
+        "mean_ms": round(sum(samples) / len(samples), 2) if samples else 0,
+        "p50_ms": round(percentile(samples, 50), 2),
+        "p99_ms": round(percentile(samples, 99), 2),
+        "max_ms": round(max(samples), 2) if samples else 0,
+    }
+    if queries is not None:
+        summary["queries"] = queries
+    return summary
+
+
+def time_call(func, repeat=5, setup=None):
+    """
+    Call `func` `repeat` times and summarize its latency. The query count is
+    the one of the last call, after caches are warm; queries made by other
+    threads, such as the dashboard pool, are not counted. `setup` runs untimed
+    before every call.
+    """
+    samples = []
+    queries = 0
+    for _ in range(repeat):
+        if setup:
+            setup()
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            result = func()
+            if hasattr(result, "__iter__") and not isinstance(result, (dict, str)):
+                # Evaluate lazy querysets inside the timed block.
+                list(result)
+            samples.append((time.perf_counter() - started) * 1000)
+        queries = len(context.captured_queries)
+    return summarize(samples, queries)
+
+
+def get_service_benchmarks(site):
+    """
+    Return `{name: (func, setup)}` of the service calls the dashboard and the
+    chart API make for `site`. Cold variants drop the site's caches first.
+    """
+    oldest = PageView.objects.filter(site=site).order_by("timestamp", "pk").first()
+    deep_cursor = encode_log_cursor(oldest) if oldest else None
+
+    def cold():
+        invalidate_site_analytics(site)
+
+    benchmarks = {}
+    for range in CHART_RANGES:
+        benchmarks[f"site_analytics:{range}"] = (lambda range=range: get_site_analytics(site, range), None)
+        benchmarks[f"cached_site_analytics:{range}:cold"] = (
+            lambda range=range: get_cached_site_analytics(site, range),
+            cold,
+        )
+        benchmarks[f"cached_site_analytics:{range}:warm"] = (
+            lambda range=range: get_cached_site_analytics(site, range),
+            None,
+        )
+    benchmarks.update(
+        {
+            "all_site_analytics": (lambda: get_all_site_analytics(site), None),
+            "cached_all_site_analytics:cold": (lambda: get_cached_all_site_analytics(site), cold),
+            "count_views_since": (lambda: count_views_since(site), None),
+            "visitors_count": (lambda: get_visitors(site).count(), None),
+            "top_pages": (lambda: get_top_pages(site), None),
+            "top_referrers": (lambda: get_top_referrers(site), None),
+            "pageviews_by_day": (lambda: get_pageviews_by_day(site), None),
+            "page_view_log:first": (lambda: get_page_view_log(site)[0], None),
+            "page_view_log:deep": (lambda: get_page_view_log(site, deep_cursor, "prev")[0], None),
+            "visit_stats": (lambda: get_visit_stats(site), None),
+            "device_breakdowns": (lambda: get_device_breakdowns(site), None),
+            "dashboard:cold": (lambda: get_dashboard(site), cold),
+            "dashboard:warm": (lambda: get_dashboard(site), None),
+        }
+    )
+    return benchmarks
+
+
+def format_table(results, columns):
+    """
+    Render `{name: summary}` as a fixed width text table.
+    """
+    width = max([len("name")] + [len(name) for name in results])
+    lines = [f"{'name':<{width}}  " + "  ".join(f"{column:>10}" for column in columns)]
+    for name, summary in results.items():
+        lines.append(
+            f"{name:<{width}}  " + "  ".join(f"{summary.get(column, ''):>10}" for column in columns)
+        )
+    return "\n".join(lines)
@@ -0,0 +1,130 @@
+"""
+Caching for the analytics chart data.
+
+Chart responses are cached per site and range, keyed by the start of the bucket
+that is still open, so every poll within the same bucket shares one entry.
+Closed buckets never change once their period is over: they are cached
+separately and carried over to the next bucket, so a refresh only has to count
+the bucket that just closed and the one that is still open.
+"""
+
+import hashlib
+import json
+
+from django.core.cache import cache
+
+from apps.analytics.models import PageView
+from apps.analytics.services import (
+    CHART_RANGES,
+    count_views_by_bucket,
+    fill_empty_buckets,
+    format_chart_rows,
+    get_all_site_analytics,
+    get_bucket_start,
+    get_range_start,
+    shift_bucket,
+)
+
+
+# How long a chart response is served from cache, per range.
+CHART_TTLS = {
+    "minute": 10,
+    "hourly": 5 * 60,
+    "daily": 60 * 60,
+}
+
+
+def _version_key(site):
+    return f"analytics:chart:{site.pk}:version"
+
+
+def invalidate_site_analytics(site):
+    """
+    Drop every cached chart and panel of `site`, e.g. after importing or deleting data
+    that falls into already closed buckets.
+    """
+    version = cache.get(_version_key(site), 0)
+    cache.set(_version_key(site), version + 1, None)
+
+
+def site_cache_key(site, name):
+    """
+    Return the cache key prefix for `name` (a chart range or dashboard panel)
+    of `site`. Keys change when the site's data is invalidated or its
+    timezone changes.
+    """
+    version = cache.get(_version_key(site), 0)
+    return f"analytics:chart:{site.pk}:{version}:{site.timezone}:{name}"
+
+
+def _closed_key(prefix, bucket_start):
+    return f"{prefix}:closed:{bucket_start:%Y%m%d%H%M}"
+
+
+def get_closed_buckets(site, range, open_start, prefix):
+    """
+    Return the `(bucket_start, count)` rows of every closed bucket shown for
+    `range` while the bucket starting at `open_start` is open.
+    """
+    key = _closed_key(prefix, open_start)
+    rows = cache.get(key)
+    if rows is not None:
+        return rows
+
+    step = CHART_RANGES[range]["step"]
+    window_start = get_range_start(range, open_start, site.tzinfo)
+    previous_start = shift_bucket(range, open_start, -1)
+    previous = cache.get(_closed_key(prefix, previous_start))
+    if previous is not None:
+        # Only the bucket that closed since the previous refresh is counted.
+        rows = [row for row in previous if row[0] >= window_start]
+        rows += count_views_by_bucket(site, range, previous_start, open_start)
+    else:
+        rows = count_views_by_bucket(site, range, window_start, open_start)
+
+    cache.set(key, rows, int(step.total_seconds()) * 2)
+    return rows
+
+
+def get_cached_site_analytics(site, range="daily"):
+    """
+    Cached equivalent of `get_site_analytics`.
+    Returns `(data, etag)`, where the ETag identifies the payload.
+    """
+    if range not in CHART_RANGES:
+        return [], None
+
+    open_start = get_bucket_start(range, tz=site.tzinfo)
+    prefix = site_cache_key(site, range)
+    response_key = f"{prefix}:response:{open_start:%Y%m%d%H%M}"
+    cached = cache.get(response_key)
+    if cached is not None:
+        return cached
+
+    rows = list(get_closed_buckets(site, range, open_start, prefix))
+    open_count = PageView.objects.filter(site=site, timestamp__gte=open_start).count()
+    rows.append((open_start, open_count))
+    rows = fill_empty_buckets(
+        rows, range, get_range_start(range, open_start, site.tzinfo), open_start
+    )
+
+    data = format_chart_rows(rows, range)
+    digest = hashlib.md5(json.dumps(data).encode("utf-8")).hexdigest()
+    result = (data, f'"{digest}"')
+    cache.set(response_key, result, CHART_TTLS[range])
+    return result
+
+
+def get_cached_all_site_analytics(site):
+    """
+    Cached `get_all_site_analytics`, formatted for the charts.
+    Refreshed as often as the minute chart, since it includes it.
+    """
+    open_start = get_bucket_start("minute", tz=site.tzinfo)
+    key = f"{site_cache_key(site, 'all')}:response:{open_start:%Y%m%d%H%M}"
+    data = cache.get(key)
+    if data is None:
+        series = get_all_site_analytics(site)
+        data = {range: format_chart_rows(rows, range) for range, rows in series.items()}
+        cache.set(key, data, CHART_TTLS["minute"])
+    return data
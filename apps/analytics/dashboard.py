@@ -0,0 +1,115 @@
+"""
+Panels of the site details dashboard.
+
+Each panel is an independent aggregate with its own cache entry and template,
+so the page can render the panels that are already cached and either compute
+the rest concurrently or let HTMX load them one by one after the first paint.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+
+from apps.analytics.caching import site_cache_key
+from apps.analytics.services import (
+    count_views_since,
+    get_top_pages,
+    get_top_referrers,
+    get_visitors,
+)
+from apps.analytics.visits import get_device_breakdowns, get_visit_stats
+
+
+# How long a computed panel is served from cache.
+PANEL_TTL = 60
+
+PANELS = {
+    "visitors": {
+        "compute": lambda site: get_visitors(site).count(),
+        "template": "analytics/islands/panels/visitors.html",
+    },
+    "page_views": {
+        "compute": count_views_since,
+        "template": "analytics/islands/panels/page_views.html",
+    },
+    "visits": {
+        "compute": get_visit_stats,
+        "template": "analytics/islands/panels/visits.html",
+    },
+    "devices": {
+        "compute": get_device_breakdowns,
+        "template": "analytics/islands/panels/devices.html",
+    },
+    "top_pages": {
+        "compute": get_top_pages,
+        "template": "analytics/islands/panels/top_pages.html",
+    },
+    "top_referrers": {
+        "compute": get_top_referrers,
+        "template": "analytics/islands/panels/top_referrers.html",
+    },
+}
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.PINGFOX_DASHBOARD_WORKERS,
+    thread_name_prefix="pf-dashboard",
+)
+
+
+def _panel_key(site, name):
+    return f"{site_cache_key(site, 'panel')}:{name}"
+
+
+def _compute_panel(site, name):
+    """
+    Compute and cache one panel. Runs in a pool thread, which has its own
+    database connection; it is released afterwards unless persistent
+    connections are enabled.
+    """
+    try:
+        data = PANELS[name]["compute"](site)
+        cache.set(_panel_key(site, name), data, PANEL_TTL)
+        return data
+    finally:
+        close_old_connections()
+
+
+def get_cached_panels(site, names=None):
+    """
+    Return `{name: data}` for the panels of `site` that are already cached.
+    """
+    names = list(names or PANELS)
+    keys = {_panel_key(site, name): name for name in names}
+    return {keys[key]: data for key, data in cache.get_many(list(keys)).items()}
+
+
+def submit_panels(site, names):
+    """
+    Start computing `names` in the dashboard pool and return `{name: future}`.
+    The caller can keep working on the request thread in the meantime.
+    """
+    return {name: _executor.submit(_compute_panel, site, name) for name in names}
+
+
+def get_panel(site, name):
+    """
+    Return the data of a single panel, computing it if it is not cached.
+    """
+    data = get_cached_panels(site, [name])
+    if name in data:
+        return data[name]
+    data = PANELS[name]["compute"](site)
+    cache.set(_panel_key(site, name), data, PANEL_TTL)
+    return data
+
+
+def get_dashboard(site):
+    """
+    Return the data of every panel, computing the missing ones concurrently.
+    """
+    panels = get_cached_panels(site)
+    futures = submit_panels(site, [name for name in PANELS if name not in panels])
+    panels.update({name: future.result() for name, future in futures.items()})
+    return panels
@@ -0,0 +1,154 @@
+"""
+Device dimensions of visitors.
+
+User agents are reduced to a browser family, an operating system and a device
+type, and screen widths to a few size classes, all stored as small integers
+so breakdowns are plain GROUP BYs. Few distinct user agents make up most of
+the traffic, so parsed results are kept in a bounded per-process LRU cache.
+"""
+
+import re
+from functools import lru_cache
+
+from apps.analytics.models import (
+    BROWSER_CHROME,
+    BROWSER_EDGE,
+    BROWSER_FIREFOX,
+    BROWSER_IE,
+    BROWSER_OPERA,
+    BROWSER_OTHER,
+    BROWSER_SAFARI,
+    BROWSER_SAMSUNG,
+    BROWSER_UNKNOWN,
+    DEVICE_BOT,
+    DEVICE_DESKTOP,
+    DEVICE_MOBILE,
+    DEVICE_TABLET,
+    DEVICE_UNKNOWN,
+    OS_ANDROID,
+    OS_CHROMEOS,
+    OS_IOS,
+    OS_LINUX,
+    OS_MACOS,
+    OS_OTHER,
+    OS_UNKNOWN,
+    OS_WINDOWS,
+    SCREEN_LARGE,
+    SCREEN_MEDIUM,
+    SCREEN_SMALL,
+    SCREEN_UNKNOWN,
+    SCREEN_XLARGE,
+    VisitorSession,
+)
+
+# Rules are checked in order and the first match wins, so more specific
+# tokens come first (Edge and Opera also send "Chrome", Chrome sends "Safari",
+# iPadOS sends "Mac OS X", Android sends "Linux").
+BROWSER_RULES = [
+    (re.compile(r"Edg(e|A|iOS)?/"), BROWSER_EDGE),
+    (re.compile(r"OPR/|Opera"), BROWSER_OPERA),
+    (re.compile(r"SamsungBrowser/"), BROWSER_SAMSUNG),
+    (re.compile(r"Firefox/|FxiOS/"), BROWSER_FIREFOX),
+    (re.compile(r"Chrome/|CriOS/|Chromium/"), BROWSER_CHROME),
+    (re.compile(r"Version/[\d.]+.*Safari/"), BROWSER_SAFARI),
+    (re.compile(r"MSIE |Trident/"), BROWSER_IE),
+]
+OS_RULES = [
+    (re.compile(r"Windows"), OS_WINDOWS),
+    (re.compile(r"iPhone|iPad|iPod"), OS_IOS),
+    (re.compile(r"Mac OS X|Macintosh"), OS_MACOS),
+    (re.compile(r"Android"), OS_ANDROID),
+    (re.compile(r"CrOS"), OS_CHROMEOS),
+    (re.compile(r"Linux|X11"), OS_LINUX),
+]
+BOT_PATTERN = re.compile(r"bot|crawl|spider|slurp|headless|lighthouse|preview", re.IGNORECASE)
+TABLET_PATTERN = re.compile(r"iPad|Tablet|Android(?!.*Mobile)")
+MOBILE_PATTERN = re.compile(r"Mobi|iPhone|iPod|Windows Phone")
+
+# Upper bounds (exclusive) of the screen width classes.
+SCREEN_BREAKPOINTS = [
+    (576, SCREEN_SMALL),
+    (992, SCREEN_MEDIUM),
+    (1440, SCREEN_LARGE),
+]
+# Distinct user agents remembered per process.
+PARSE_CACHE_SIZE = 2048
+# Longer user agents are not worth matching against.
+MAX_USER_AGENT_LENGTH = 512
+
+
+def _match(rules, user_agent, default):
+    for pattern, value in rules:
+        if pattern.search(user_agent):
+            return value
+    return default
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_user_agent(user_agent):
+    """
+    Return `(browser, os, device_type)` codes for a user agent string.
+    """
+    if not user_agent:
+        return BROWSER_UNKNOWN, OS_UNKNOWN, DEVICE_UNKNOWN
+    browser = _match(BROWSER_RULES, user_agent, BROWSER_OTHER)
+    os = _match(OS_RULES, user_agent, OS_OTHER)
+    if BOT_PATTERN.search(user_agent):
+        device_type = DEVICE_BOT
+    elif TABLET_PATTERN.search(user_agent):
+        device_type = DEVICE_TABLET
+    elif MOBILE_PATTERN.search(user_agent):
+        device_type = DEVICE_MOBILE
+    else:
+        device_type = DEVICE_DESKTOP
+    return browser, os, device_type
+
+
+def set_device_dimensions(visitor):
+    """
+    Parse `visitor.user_agent` into the visitor's browser, OS and device type.
+    """
+    visitor.browser, visitor.os, visitor.device_type = parse_user_agent(
+        (visitor.user_agent or "")[:MAX_USER_AGENT_LENGTH]
+    )
+
+
+def get_screen_class(width):
+    """
+    Return the screen class code for a screen width in pixels.
+    """
+    try:
+        width = int(width or 0)
+    except (TypeError, ValueError):
+        return SCREEN_UNKNOWN
+    if width <= 0:
+        return SCREEN_UNKNOWN
+    for limit, screen_class in SCREEN_BREAKPOINTS:
+        if width < limit:
+            return screen_class
+    return SCREEN_XLARGE
+
+
+def backfill_device_dimensions(batch_size=1000):
+    """
+    Parse the user agents of visitors recorded before device dimensions were
+    captured. Returns the number of visitors updated.
+    """
+    total = 0
+    last_pk = 0
+    while True:
+        batch = list(
+            VisitorSession.objects.filter(pk__gt=last_pk, device_type=DEVICE_UNKNOWN)
+            .exclude(user_agent="")
+            .only("id", "user_agent")
+            .order_by("pk")[:batch_size]
+        )
+        if not batch:
+            return total
+        for visitor in batch:
+            set_device_dimensions(visitor)
+        VisitorSession.objects.bulk_update(
+            batch, ["browser", "os", "device_type"], batch_size=batch_size
+        )
+        total += len(batch)
+        last_pk = batch[-1].pk
@@ -0,0 +1,165 @@
+"""
+Support for the standalone edge collector (`pingfox.collector`).
+
+Edge collectors never touch the database. They check `site_id`s against a
+snapshot of all sites that the main app keeps in Redis, and forward accepted
+beacons in batches to the `ingest_beacon_batch` actor, which stores them with
+`ingest_beacons`. When the broker is unreachable, batches go to the local
+spool and are forwarded again once it is back.
+"""
+
+import time
+
+import dramatiq
+import redis
+from django.conf import settings
+
+from apps.analytics.models import Site
+from apps.analytics.spool import claim_segments, read_segment, spool_beacon
+from apps.core.utils import get_redis_connection
+
+
+SNAPSHOT_KEY = "pf:edge:sites"
+# Bumped on every change, so collectors only reload the set when it changed.
+SNAPSHOT_VERSION_KEY = "pf:edge:sites:version"
+SNAPSHOT_CHUNK_SIZE = 5000
+
+
+def publish_site_snapshot():
+    """
+    Replace the snapshot of site IDs in Redis with the sites in the database.
+    Returns the number of sites published.
+    """
+    connection = get_redis_connection()
+    staging_key = f"{SNAPSHOT_KEY}:staging"
+    connection.delete(staging_key)
+    count = 0
+    site_ids = Site.objects.values_list("site_id", flat=True).order_by("pk")
+    chunk = []
+    for site_id in site_ids.iterator(chunk_size=SNAPSHOT_CHUNK_SIZE):
+        chunk.append(site_id)
+        if len(chunk) >= SNAPSHOT_CHUNK_SIZE:
+            connection.sadd(staging_key, *chunk)
+            count += len(chunk)
+            chunk = []
+    if chunk:
+        connection.sadd(staging_key, *chunk)
+        count += len(chunk)
+
+    pipeline = connection.pipeline()
+    if count:
+        pipeline.rename(staging_key, SNAPSHOT_KEY)
+    else:
+        pipeline.delete(SNAPSHOT_KEY)
+    pipeline.incr(SNAPSHOT_VERSION_KEY)
+    pipeline.execute()
+    return count
+
+
+def update_site_snapshot(site_id, exists=True):
+    """
+    Add or remove one site in the snapshot. Best effort: the periodic
+    `publish_site_snapshot` repairs missed updates.
+    """
+    try:
+        pipeline = get_redis_connection().pipeline()
+        if exists:
+            pipeline.sadd(SNAPSHOT_KEY, site_id)
+        else:
+            pipeline.srem(SNAPSHOT_KEY, site_id)
+        pipeline.incr(SNAPSHOT_VERSION_KEY)
+        pipeline.execute()
+    except redis.RedisError as e:
+        print(f"[PingFox Edge] Could not update the site snapshot: {e}")
+
+
+class SiteSnapshot:
+    """
+    A collector's local copy of the site snapshot.
+
+    Until a snapshot has been loaded every site is accepted; `ingest_beacons`
+    skips beacons of unknown sites anyway, so a Redis outage at startup does
+    not lose traffic.
+    """
+
+    def __init__(self):
+        self.site_ids = None
+        self.version = None
+        self.refreshed_at = 0
+
+    def is_stale(self):
+        return time.monotonic() - self.refreshed_at >= settings.PINGFOX_COLLECTOR_SNAPSHOT_INTERVAL
+
+    def refresh(self):
+        """
+        Reload the site IDs if the snapshot changed since the last refresh.
+        """
+        self.refreshed_at = time.monotonic()
+        try:
+            connection = get_redis_connection()
+            version = connection.get(SNAPSHOT_VERSION_KEY)
+            if version is not None and version == self.version:
+                return
+            site_ids = {site_id.decode("utf-8") for site_id in connection.smembers(SNAPSHOT_KEY)}
+        except redis.RedisError as e:
+            print(f"[PingFox Edge] Could not refresh the site snapshot: {e}")
+            return
+        if version is None and not site_ids:
+            # Never published; keep accepting everything.
+            return
+        self.site_ids = site_ids
+        self.version = version
+
+    def __contains__(self, site_id):
+        return self.site_ids is None or site_id in self.site_ids
+
+
+def _send(beacons, live=True):
+    # Imported here: the tasks module pulls in every actor of the app.
+    from apps.analytics.tasks import ingest_beacon_batch
+
+    ingest_beacon_batch.send(beacons, live)
+
+
+def forward_beacons(beacons):
+    """
+    Send a batch of beacons to the ingestion queue, or spool them when the
+    broker is unavailable. Returns True when they were sent.
+    """
+    if not beacons:
+        return True
+    try:
+        _send(beacons)
+        return True
+    except (dramatiq.errors.DramatiqError, redis.RedisError) as e:
+        print(f"[PingFox Edge] Spooling {len(beacons)} beacon(s), broker unavailable: {e}")
+        for beacon in beacons:
+            spool_beacon(beacon)
+        return False
+
+
+def forward_spool():
+    """
+    Send the beacons of every ready spool segment to the ingestion queue.
+    They are sent as late beacons, so the worker refreshes the aggregates of
+    their sites instead of extending visits. Beacons that cannot be sent are
+    spooled again for the next attempt. Returns the number of beacons sent.
+    """
+    batch_size = settings.PINGFOX_COLLECTOR_BATCH_SIZE
+    total = 0
+    for path in claim_segments():
+        beacons = list(read_segment(path))
+        sent = 0
+        try:
+            while sent < len(beacons):
+                _send(beacons[sent : sent + batch_size], live=False)
+                sent += len(beacons[sent : sent + batch_size])
+        except (dramatiq.errors.DramatiqError, redis.RedisError) as e:
+            print(f"[PingFox Edge] Forwarding {path.name} failed, will retry: {e}")
+            for beacon in beacons[sent:]:
+                spool_beacon(beacon)
+        path.unlink()
+        total += sent
+        if sent < len(beacons):
+            break
+    return total
@@ -0,0 +1,107 @@
+"""
+Optional GeoIP enrichment of page views.
+
+When `PINGFOX_GEOIP_DATABASE` points at a MaxMind DB file (GeoLite2 Country or
+City) and the `maxminddb` package is installed, the collector resolves the
+client IP to a country and region code. The file is memory-mapped, so lookups
+never leave the process. Results are cached per network prefix and the IP
+itself is never stored.
+"""
+
+import ipaddress
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+
+try:
+    import maxminddb
+except ImportError:
+    maxminddb = None
+
+
+# Clients in the same network are resolved once; both prefixes are well below
+# the granularity of country and region data.
+IPV4_PREFIX = 24
+IPV6_PREFIX = 48
+# Distinct networks remembered per process.
+LOOKUP_CACHE_SIZE = 8192
+
+UNKNOWN_LOCATION = ("", "")
+
+_reader = None
+_reader_lock = threading.Lock()
+
+
+def get_reader():
+    """
+    Return the memory-mapped GeoIP database, or None when enrichment is off.
+    """
+    global _reader
+    if _reader is None and settings.PINGFOX_GEOIP_DATABASE:
+        with _reader_lock:
+            if _reader is None:
+                if maxminddb is None:
+                    print("[PingFox GeoIP] maxminddb is not installed, enrichment disabled.")
+                    _reader = False
+                else:
+                    try:
+                        _reader = maxminddb.open_database(
+                            settings.PINGFOX_GEOIP_DATABASE, maxminddb.MODE_MMAP
+                        )
+                    except (OSError, maxminddb.InvalidDatabaseError) as e:
+                        print(f"[PingFox GeoIP] Could not open the database: {e}")
+                        _reader = False
+    return _reader or None
+
+
+def resolve_client_ip(remote_addr, forwarded_for=""):
+    """
+    Return the client IP from the peer address and `X-Forwarded-For` header.
+    The header is only trusted when `PINGFOX_TRUST_X_FORWARDED_FOR` is set,
+    i.e. behind a known proxy.
+    """
+    if settings.PINGFOX_TRUST_X_FORWARDED_FOR and forwarded_for:
+        return forwarded_for.split(",")[0].strip()
+    return remote_addr or ""
+
+
+def get_client_ip(request):
+    """
+    Return the client IP of `request`.
+    """
+    return resolve_client_ip(
+        request.META.get("REMOTE_ADDR", ""), request.META.get("HTTP_X_FORWARDED_FOR", "")
+    )
+
+
+@lru_cache(maxsize=LOOKUP_CACHE_SIZE)
+def _lookup_network(network):
+    record = get_reader().get(network.network_address) or {}
+    country = (record.get("country") or record.get("registered_country") or {}).get("iso_code", "")
+    subdivisions = record.get("subdivisions") or [{}]
+    return country[:2], (subdivisions[0].get("iso_code") or "")[:3]
+
+
+def lookup_location(ip):
+    """
+    Return `(country, region)` codes for `ip`, or empty strings when unknown.
+    """
+    if get_reader() is None or not ip:
+        return UNKNOWN_LOCATION
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return UNKNOWN_LOCATION
+    if not address.is_global:
+        return UNKNOWN_LOCATION
+    prefix = IPV4_PREFIX if address.version == 4 else IPV6_PREFIX
+    return _lookup_network(ipaddress.ip_network(f"{address}/{prefix}", strict=False))
+
+
+def get_location_dimensions(ip):
+    """
+    Return the location fields of a page view collected from `ip`.
+    """
+    country, region = lookup_location(ip)
+    return {"country": country, "region": region}
@@ -0,0 +1,280 @@
+"""
+Bulk import of historical page views.
+
+Exports of other analytics tools (or PingFox's own CSV download) are read as a
+stream of CSV or NDJSON rows and written in large batches: with `COPY` when
+the database is Postgres on psycopg 3, with `bulk_create` otherwise. Visits,
+rollups and cached charts are refreshed once at the end instead of per row.
+"""
+
+import csv
+import json
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from urllib.parse import urljoin
+
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.analytics.devices import set_device_dimensions
+from apps.analytics.ingest import MAX_FIELD_LENGTHS, MAX_SCREEN_SIZE
+from apps.analytics.models import PageView, VisitorSession
+from apps.analytics.normalization import get_url_dimensions
+from apps.analytics.rollups import refresh_site_aggregates
+
+
+BATCH_SIZE = 5000
+FORMATS = ("csv", "ndjson")
+
+# Accepted column names, after lowercasing and replacing spaces with
+# underscores, for each page view field. The first names match PingFox's own
+# CSV export.
+COLUMN_ALIASES = {
+    "timestamp": ["timestamp", "time", "date", "datetime", "created_at"],
+    "url": ["url", "page", "page_url", "href"],
+    "referrer": ["referrer", "referer", "referrer_url"],
+    "visitor_id": ["visitor_pf_id", "visitor_id", "pf_id", "client_id", "session_id"],
+    "user_agent": ["user_agent", "ua", "useragent"],
+    "screen_width": ["screen_width", "width"],
+    "screen_height": ["screen_height", "height"],
+    "country": ["country", "country_code"],
+}
+
+
+def import_enabled(team):
+    """
+    Whether the team's plan includes the `import_enabled` feature.
+    """
+    return str(team.feature_limit("import_enabled")).lower() in ("true", "1", "yes")
+
+
+def read_rows(file, format):
+    """
+    Yield the rows of an export as dicts keyed by normalized column names.
+    NDJSON lines that are not a JSON object are yielded as None.
+    """
+    if format == "ndjson":
+        rows = (_parse_json_line(line) for line in file if line.strip())
+    else:
+        rows = csv.DictReader(file)
+    for row in rows:
+        if row is None:
+            yield None
+            continue
+        yield {
+            str(key).strip().lower().replace(" ", "_"): value
+            for key, value in row.items()
+        }
+
+
+def _parse_json_line(line):
+    try:
+        row = json.loads(line)
+    except ValueError:
+        return None
+    return row if isinstance(row, dict) else None
+
+
+def _pick(row, field):
+    for name in COLUMN_ALIASES[field]:
+        value = row.get(name)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def _parse_timestamp(value, tz):
+    if isinstance(value, (int, float)) or str(value).replace(".", "", 1).isdigit():
+        seconds = float(value)
+        # Millisecond epochs are common in JavaScript based exports.
+        if seconds > 1e11:
+            seconds /= 1000
+        return datetime.fromtimestamp(seconds, dt_timezone.utc)
+    try:
+        parsed = parse_datetime(str(value).strip().replace(" ", "T", 1))
+    except ValueError:
+        return None
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = parsed.replace(tzinfo=tz)
+    return parsed
+
+
+def _parse_int(value):
+    try:
+        return int(float(value)) or None
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def _clean_row(row, site, tz):
+    """
+    Return the page view fields of an exported row, or None when the row
+    cannot be imported as is.
+    """
+    if row is None:
+        return None
+    url = _pick(row, "url")
+    timestamp = _parse_timestamp(_pick(row, "timestamp") or "", tz)
+    if not url or timestamp is None:
+        return None
+    url = urljoin(site.url, str(url))
+    referrer = str(_pick(row, "referrer") or "")
+    visitor_id = str(_pick(row, "visitor_id") or uuid.uuid4())
+    if (
+        len(url) > MAX_FIELD_LENGTHS["url"]
+        or len(referrer) > MAX_FIELD_LENGTHS["referrer"]
+        or len(f"import:{site.site_id}:{visitor_id}") > MAX_FIELD_LENGTHS["pf_id"]
+    ):
+        return None
+    screen_width = _parse_int(_pick(row, "screen_width"))
+    screen_height = _parse_int(_pick(row, "screen_height"))
+    for size in (screen_width, screen_height):
+        if size is not None and not 0 < size <= MAX_SCREEN_SIZE:
+            return None
+    return {
+        "timestamp": timestamp,
+        "url": url,
+        "referrer": referrer,
+        "visitor_id": visitor_id,
+        "user_agent": str(_pick(row, "user_agent") or ""),
+        "screen_width": screen_width,
+        "screen_height": screen_height,
+        "country": str(_pick(row, "country") or ""),
+    }
+
+
+def _get_visitors(site, rows):
+    """
+    Return `{visitor_id: VisitorSession}` for a batch, creating missing ones.
+    Imported ids are namespaced by site so they never merge with visitors of
+    other sites.
+    """
+    pf_ids = {f"import:{site.site_id}:{row['visitor_id']}": row for row in rows}
+    visitors = {
+        visitor.pf_id: visitor
+        for visitor in VisitorSession.objects.filter(pf_id__in=list(pf_ids))
+    }
+    new_visitors = []
+    for pf_id, row in pf_ids.items():
+        if pf_id not in visitors:
+            visitor = VisitorSession(pf_id=pf_id, user_agent=row["user_agent"][:512])
+            set_device_dimensions(visitor)
+            new_visitors.append(visitor)
+    if new_visitors:
+        VisitorSession.objects.bulk_create(new_visitors, ignore_conflicts=True)
+        visitors.update(
+            (visitor.pf_id, visitor)
+            for visitor in VisitorSession.objects.filter(
+                pf_id__in=[visitor.pf_id for visitor in new_visitors]
+            )
+        )
+    return {row["visitor_id"]: visitors[pf_id] for pf_id, row in pf_ids.items()}
+
+
+def _copy_page_views(page_views, using):
+    """
+    Write page views with `COPY ... FROM STDIN`. Returns False when the
+    database driver does not support it.
+    """
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return False
+    fields = [field for field in PageView._meta.concrete_fields if not field.primary_key]
+    columns = ", ".join(connection.ops.quote_name(field.column) for field in fields)
+    table = connection.ops.quote_name(PageView._meta.db_table)
+    with connection.cursor() as cursor:
+        raw = cursor.cursor
+        if not hasattr(raw, "copy"):
+            # psycopg2 has no row based COPY API.
+            return False
+        with raw.copy(f"COPY {table} ({columns}) FROM STDIN") as copy:
+            for page_view in page_views:
+                copy.write_row(
+                    [
+                        field.get_db_prep_save(getattr(page_view, field.attname), connection)
+                        for field in fields
+                    ]
+                )
+    return True
+
+
+def write_page_views(page_views, using="default"):
+    """
+    Insert unsaved page views in one transaction, with `COPY` when possible.
+    """
+    with transaction.atomic(using=using):
+        if not _copy_page_views(page_views, using):
+            PageView.objects.using(using).bulk_create(page_views, batch_size=1000)
+
+
+def _write_batch(site, rows, using):
+    visitors = _get_visitors(site, rows)
+    page_views = []
+    for row in rows:
+        page_views.append(
+            PageView(
+                site=site,
+                visitor=visitors[row["visitor_id"]],
+                url=row["url"],
+                referrer=row["referrer"],
+                **get_url_dimensions(row["url"], row["referrer"]),
+                country=row["country"][:2].upper(),
+                screen_width=row["screen_width"],
+                screen_height=row["screen_height"],
+                timestamp=row["timestamp"],
+            )
+        )
+    write_page_views(page_views, using)
+
+
+def import_page_views(site, rows, batch_size=BATCH_SIZE, using="default"):
+    """
+    Import the page views of `rows` (as yielded by `read_rows`) into `site`.
+
+    Rows without a parseable timestamp or URL, with a URL, referrer or
+    visitor id too long to store, or with a screen size out of range are
+    skipped, as are unparseable NDJSON lines. Relative URLs are resolved
+    against the site's URL, naive timestamps are read in the site's timezone,
+    and rows without a visitor id each get a visitor of their own.
+    Returns `{"imported": n, "skipped": n}`.
+    """
+    tz = site.tzinfo
+    imported = skipped = 0
+    earliest = None
+    batch = []
+
+    for row in rows:
+        row = _clean_row(row, site, tz)
+        if row is None:
+            skipped += 1
+            continue
+        batch.append(row)
+        earliest = row["timestamp"] if earliest is None else min(earliest, row["timestamp"])
+        if len(batch) >= batch_size:
+            _write_batch(site, batch, using)
+            imported += len(batch)
+            batch = []
+
+    if batch:
+        _write_batch(site, batch, using)
+        imported += len(batch)
+
+    if earliest is not None:
+        refresh_site_aggregates(site, earliest)
+        connection = connections[using]
+        if connection.vendor == "postgresql":
+            # Refresh planner statistics after the bulk load.
+            with connection.cursor() as cursor:
+                cursor.execute(f"ANALYZE {connection.ops.quote_name(PageView._meta.db_table)}")
+    return {"imported": imported, "skipped": skipped}
+
+
+def import_file(site, path, format="csv", batch_size=BATCH_SIZE):
+    """
+    Import an export file from disk, streaming it row by row.
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Unsupported import format: {format}")
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        return import_page_views(site, read_rows(file, format), batch_size)
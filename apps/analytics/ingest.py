@@ -0,0 +1,243 @@
+"""
+Beacon ingestion.
+
+`collect_data` turns a request into a beacon, a plain dict carrying everything
+needed to store the page view later (including request-derived fields such as
+the location and the time it was received), and stores it right away with
+`ingest_beacon`. When the database is unavailable the beacon is appended to the
+local spool instead and stored in bulk by `ingest_beacons` once it recovers.
+The edge collector (`pingfox.collector`) builds beacons with the same helpers
+and hands them to `ingest_beacons` through the task queue.
+"""
+
+import json
+import uuid
+from collections import Counter
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.analytics.devices import set_device_dimensions
+from apps.analytics.geoip import get_client_ip, get_location_dimensions
+from apps.analytics.live import publish_pageview
+from apps.analytics.models import PageView, Site, VisitorSession
+from apps.analytics.normalization import get_url_dimensions
+from apps.analytics.quota import QUOTA_DROP, QUOTA_FLAG, check_pageview_quota, release_pageview_quota
+from apps.analytics.visits import lock_visitors, record_visit
+
+
+# Collect requests with larger bodies are rejected.
+MAX_PAYLOAD_SIZE = 16 * 1024
+# Longest values accepted for the string fields of a payload, as stored.
+MAX_FIELD_LENGTHS = {"site_id": 24, "pf_id": 255, "url": 200, "referrer": 200, "ua": 512}
+# Fields cut to their length instead of rejecting the beacon: a long URL or
+# user agent still makes a valid page view.
+TRUNCATED_FIELDS = ("url", "referrer", "ua")
+# Larger screen dimensions are rejected.
+MAX_SCREEN_SIZE = 100_000
+
+
+class QuotaExceeded(Exception):
+    """
+    The beacon's site has used up its pageview quota and the policy drops it.
+    """
+
+
+class InvalidBeacon(ValueError):
+    """
+    The body of a collect request is not a valid `pf.js` payload.
+    """
+
+
+def decode_payload(body):
+    """
+    Decode and validate the JSON body of a collect request.
+    Identifiers must fit their columns, longer URLs and user agents are
+    truncated, and screen dimensions are coerced to integers or None.
+    Raises `InvalidBeacon` with a message for the client.
+    """
+    if len(body) > MAX_PAYLOAD_SIZE:
+        raise InvalidBeacon("Payload too large.")
+    try:
+        data = json.loads(body.decode("utf-8")) if body else {}
+    except (UnicodeDecodeError, ValueError):
+        raise InvalidBeacon("Invalid JSON payload.")
+    if not isinstance(data, dict) or not data.get("site_id"):
+        raise InvalidBeacon("Site ID is required.")
+    for field, max_length in MAX_FIELD_LENGTHS.items():
+        value = data.get(field)
+        if value is None:
+            continue
+        if not isinstance(value, str):
+            raise InvalidBeacon(f"Invalid {field}.")
+        if len(value) > max_length:
+            if field not in TRUNCATED_FIELDS:
+                raise InvalidBeacon(f"Invalid {field}.")
+            data[field] = value[:max_length]
+    for field in ("width", "height"):
+        data[field] = _clean_screen_size(data.get(field), field)
+    return data
+
+
+def _clean_screen_size(value, field):
+    if value in (None, "", 0):
+        return None
+    if isinstance(value, str) and value.isdigit():
+        value = int(value)
+    elif isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value <= MAX_SCREEN_SIZE:
+        raise InvalidBeacon(f"Invalid {field}.")
+    return value or None
+
+
+def make_beacon(data, client_ip):
+    """
+    Build a beacon from a decoded payload `data` sent from `client_ip`.
+    """
+    return {
+        "site_id": data.get("site_id"),
+        "pf_id": data.get("pf_id") or str(uuid.uuid4()),
+        "url": data.get("url", ""),
+        "referrer": data.get("referrer", ""),
+        "ua": data.get("ua", ""),
+        "width": data.get("width"),
+        "height": data.get("height"),
+        "received_at": timezone.now().isoformat(),
+        **get_location_dimensions(client_ip),
+    }
+
+
+def parse_beacon(request, data):
+    """
+    Build a beacon from the decoded JSON body `data` of a collect request.
+    """
+    return make_beacon(data, get_client_ip(request))
+
+
+def build_page_view(beacon, site, visitor, quota, dimensions):
+    """
+    Return the unsaved page view of `beacon`, with the lookup ids
+    `dimensions` from `get_url_dimensions`.
+    """
+    return PageView(
+        visitor=visitor,
+        site=site,
+        url=beacon["url"],
+        referrer=beacon["referrer"],
+        **dimensions,
+        country=beacon["country"],
+        region=beacon["region"],
+        screen_width=beacon["width"],
+        screen_height=beacon["height"],
+        timestamp=parse_datetime(beacon["received_at"]),
+        over_quota=quota == QUOTA_FLAG,
+    )
+
+
+def ingest_beacon(beacon):
+    """
+    Store one beacon and return its page view.
+
+    Raises `Site.DoesNotExist` for unknown sites, `QuotaExceeded` when the
+    beacon is dropped, and `OperationalError` or `InterfaceError` when the
+    database is unavailable; nothing is stored or counted against the quota
+    in that case, so the beacon can safely be spooled.
+    """
+    site = Site.objects.get(site_id=beacon["site_id"])
+    quota = check_pageview_quota(site)
+    if quota == QUOTA_DROP:
+        raise QuotaExceeded(site.site_id)
+
+    # Resolved before the transaction, so new lookup rows survive a rollback.
+    try:
+        dimensions = get_url_dimensions(beacon["url"], beacon["referrer"])
+        with transaction.atomic():
+            visitor, _created = VisitorSession.objects.get_or_create(pf_id=beacon["pf_id"])
+            visitor.user_agent = beacon["ua"]
+            set_device_dimensions(visitor)
+            visitor.save()
+            page_view = build_page_view(beacon, site, visitor, quota, dimensions)
+            page_view.save()
+            record_visit(page_view)
+    except Exception:
+        # Not stored; the beacon is counted again if it is retried.
+        release_pageview_quota(site)
+        raise
+    publish_pageview(site, visitor.pf_id)
+    return page_view
+
+
+def ingest_beacons(beacons, batch_size=1000, live=False):
+    """
+    Store a batch of beacons in bulk, in one transaction.
+
+    Visitors are created in bulk, quotas are applied as if the beacons had
+    just arrived, and beacons of unknown sites are skipped. Spooled beacons
+    leave visits, rollups and cached charts to the caller (see
+    `spool.replay_segment`); `live` batches from the edge collector are
+    recent, so their visits and live stats are updated like in `ingest_beacon`.
+    Returns the number of page views stored and `{site: earliest timestamp}`
+    of the sites that received them.
+    """
+    beacons = list(beacons)
+    sites = Site.objects.in_bulk({beacon["site_id"] for beacon in beacons}, field_name="site_id")
+
+    visitors = {}
+    pf_ids = {beacon["pf_id"] for beacon in beacons}
+    for visitor in VisitorSession.objects.filter(pf_id__in=pf_ids):
+        visitors[visitor.pf_id] = visitor
+
+    # Resolved before the transaction, so new lookup rows survive a rollback.
+    dimensions = {
+        (beacon["url"], beacon["referrer"]): None for beacon in beacons if beacon["site_id"] in sites
+    }
+    for url, referrer in dimensions:
+        dimensions[url, referrer] = get_url_dimensions(url, referrer)
+
+    page_views = []
+    touched = {}
+    counted = Counter()
+    try:
+        with transaction.atomic():
+            new_visitors = {}
+            for beacon in beacons:
+                if beacon["pf_id"] not in visitors and beacon["pf_id"] not in new_visitors:
+                    visitor = VisitorSession(pf_id=beacon["pf_id"], user_agent=beacon["ua"])
+                    set_device_dimensions(visitor)
+                    new_visitors[beacon["pf_id"]] = visitor
+            VisitorSession.objects.bulk_create(
+                new_visitors.values(), batch_size=batch_size, ignore_conflicts=True
+            )
+            for visitor in VisitorSession.objects.filter(pf_id__in=list(new_visitors)):
+                visitors[visitor.pf_id] = visitor
+
+            for beacon in beacons:
+                site = sites.get(beacon["site_id"])
+                if site is None:
+                    continue
+                quota = check_pageview_quota(site)
+                counted[site] += 1
+                if quota == QUOTA_DROP:
+                    continue
+                page_view = build_page_view(
+                    beacon, site, visitors[beacon["pf_id"]], quota, dimensions[beacon["url"], beacon["referrer"]]
+                )
+                page_views.append(page_view)
+                if site not in touched or page_view.timestamp < touched[site]:
+                    touched[site] = page_view.timestamp
+            PageView.objects.bulk_create(page_views, batch_size=batch_size)
+            if live:
+                lock_visitors({page_view.visitor_id for page_view in page_views})
+                for page_view in sorted(page_views, key=lambda page_view: page_view.timestamp):
+                    record_visit(page_view)
+    except Exception:
+        # Nothing was stored; a retry of the batch counts the beacons again.
+        for site, count in counted.items():
+            release_pageview_quota(site, count)
+        raise
+    if live:
+        for page_view in page_views:
+            publish_pageview(page_view.site, page_view.visitor.pf_id)
+    return len(page_views), touched
@@ -0,0 +1,185 @@
+"""
+Live visitor stats for the site dashboard.
+
+The collector keeps a few short-lived Redis keys per site (visitors seen in the
+last minutes and a pageview counter per second) and publishes the resulting
+stats on the site's channel. Dashboards stream them as server-sent events:
+each web process holds a single pub/sub connection shared by all of its open
+streams, so an open dashboard costs no database query and no Redis round trip
+per update.
+"""
+
+import asyncio
+import json
+import time
+from collections import defaultdict
+
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+
+from apps.core.utils import get_redis_connection
+
+
+# Visitors seen within this many seconds count as active.
+ACTIVE_WINDOW = 5 * 60
+# Streams without traffic re-read the stats this often, so expired visitors
+# drop off and proxies keep the connection open.
+HEARTBEAT_INTERVAL = 15
+# Streams push at most one update per this many seconds.
+MIN_PUSH_INTERVAL = 1.0
+
+
+def _channel(site_pk):
+    return f"pf:live:{site_pk}"
+
+
+def _visitors_key(site_pk):
+    return f"pf:live:{site_pk}:visitors"
+
+
+def _rate_key(site_pk, second):
+    return f"pf:live:{site_pk}:rate:{second}"
+
+
+def _stats(active_visitors, pageviews, now):
+    return {
+        "active_visitors": active_visitors,
+        "pageviews_per_second": pageviews,
+        "ts": int(now),
+    }
+
+
+def publish_pageview(site, visitor_id):
+    """
+    Record a pageview of `visitor_id` on `site` and publish the site's live
+    stats. Best effort: a Redis outage never fails the beacon.
+    """
+    now = time.time()
+    second = int(now)
+    try:
+        pipe = get_redis_connection().pipeline(transaction=False)
+        pipe.zadd(_visitors_key(site.pk), {visitor_id: now})
+        pipe.zremrangebyscore(_visitors_key(site.pk), 0, now - ACTIVE_WINDOW)
+        pipe.zcard(_visitors_key(site.pk))
+        pipe.expire(_visitors_key(site.pk), ACTIVE_WINDOW)
+        pipe.incr(_rate_key(site.pk, second))
+        pipe.expire(_rate_key(site.pk, second), 10)
+        results = pipe.execute()
+        stats = _stats(results[2], results[4], now)
+        get_redis_connection().publish(_channel(site.pk), json.dumps(stats))
+    except redis.RedisError:
+        pass
+
+
+def format_event(data):
+    """
+    Serialize `data` as a server-sent event.
+    """
+    return f"event: stats\ndata: {data if isinstance(data, str) else json.dumps(data)}\n\n"
+
+
+class LiveHub:
+    """
+    Fans the live stats published by the collectors out to the open streams
+    of this process.
+
+    The Redis subscription is opened with the first stream and closed with
+    the last one; each site's channel is only subscribed while at least one
+    of its streams is open.
+    """
+
+    def __init__(self):
+        self._queues = defaultdict(set)
+        self._connection = None
+        self._pubsub = None
+        self._task = None
+
+    def _get_connection(self):
+        if self._connection is None:
+            self._connection = aioredis.Redis.from_url(settings.REDIS_URL)
+        return self._connection
+
+    async def get_stats(self, site_pk):
+        """
+        Read the current live stats of a site from Redis.
+        """
+        now = time.time()
+        pipe = self._get_connection().pipeline(transaction=False)
+        pipe.zcount(_visitors_key(site_pk), now - ACTIVE_WINDOW, "+inf")
+        pipe.get(_rate_key(site_pk, int(now)))
+        active_visitors, pageviews = await pipe.execute()
+        return _stats(active_visitors, int(pageviews or 0), now)
+
+    async def join(self, site_pk):
+        """
+        Register a stream for `site_pk` and return the queue it reads from.
+        Only the latest stats are kept, so a slow stream skips updates
+        instead of buffering them.
+        """
+        channel = _channel(site_pk)
+        queue = asyncio.Queue(maxsize=1)
+        first = not self._queues[channel]
+        self._queues[channel].add(queue)
+        if first and self._pubsub is not None:
+            await self._pubsub.subscribe(channel)
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._listen())
+        return queue
+
+    async def leave(self, site_pk, queue):
+        """
+        Unregister a stream's queue.
+        """
+        channel = _channel(site_pk)
+        self._queues[channel].discard(queue)
+        if not self._queues[channel]:
+            del self._queues[channel]
+            if self._pubsub is not None:
+                await self._pubsub.unsubscribe(channel)
+
+    def _dispatch(self, message):
+        for queue in self._queues.get(message["channel"].decode(), ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(message["data"].decode())
+
+    async def _listen(self):
+        while self._queues:
+            self._pubsub = self._get_connection().pubsub()
+            try:
+                await self._pubsub.subscribe(*self._queues)
+                while self._queues:
+                    message = await self._pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=1.0
+                    )
+                    if message is not None:
+                        self._dispatch(message)
+            except redis.RedisError as e:
+                print(f"Live stats subscription failed: {e}")
+                await asyncio.sleep(1)
+            finally:
+                pubsub, self._pubsub = self._pubsub, None
+                await pubsub.aclose()
+
+
+live_hub = LiveHub()
+
+
+async def stream_live_stats(site):
+    """
+    Yield the live stats of `site` as server-sent events until the client
+    disconnects.
+    """
+    queue = await live_hub.join(site.pk)
+    try:
+        yield format_event(await live_hub.get_stats(site.pk))
+        while True:
+            try:
+                data = await asyncio.wait_for(queue.get(), HEARTBEAT_INTERVAL)
+            except TimeoutError:
+                data = await live_hub.get_stats(site.pk)
+            yield format_event(data)
+            await asyncio.sleep(MIN_PUSH_INTERVAL)
+    finally:
+        await live_hub.leave(site.pk, queue)
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from apps.analytics.devices import backfill_device_dimensions
+from apps.analytics.normalization import backfill_url_dimensions
+
+
+class Command(BaseCommand):
+    help = "Fill the normalized dimensions of page views recorded before they were captured."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of rows updated per query.",
+        )
+
+    def handle(self, *args, **options):
+        count = backfill_url_dimensions(options["batch_size"])
+        self.stdout.write(f"Normalized the URLs of {count} page view(s).")
+        count = backfill_device_dimensions(options["batch_size"])
+        self.stdout.write(f"Parsed the user agents of {count} visitor(s).")
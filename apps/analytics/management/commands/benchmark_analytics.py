@@ -0,0 +1,55 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.analytics.benchmarks import format_table, get_service_benchmarks, time_call
+from apps.analytics.models import PageView, Site
+from apps.core.utils import get_or_null
+
+
+class Command(BaseCommand):
+    help = "Time the analytics service functions against a site's data."
+
+    def add_arguments(self, parser):
+        parser.add_argument("site_id", help="Site ID of the site to benchmark.")
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Number of timed calls per function.",
+        )
+        parser.add_argument(
+            "--only",
+            nargs="+",
+            default=[],
+            help="Only run benchmarks whose name starts with one of these prefixes.",
+        )
+        parser.add_argument("--json", help="Also write the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        site = get_or_null(Site, site_id=options["site_id"])
+        if not site:
+            raise CommandError(f"Site ID {options['site_id']} not found.")
+
+        rows = PageView.objects.filter(site=site).count()
+        self.stdout.write(
+            f"Benchmarking {site.site_id} on {connection.vendor} "
+            f"with {rows} page view(s), {options['repeat']} call(s) each."
+        )
+
+        results = {}
+        for name, (func, setup) in get_service_benchmarks(site).items():
+            if options["only"] and not name.startswith(tuple(options["only"])):
+                continue
+            results[name] = time_call(func, options["repeat"], setup)
+            self.stdout.write(f"  {name}: p50 {results[name]['p50_ms']} ms")
+
+        self.stdout.write(format_table(results, ["mean_ms", "p50_ms", "p99_ms", "max_ms", "queries"]))
+        if options["json"]:
+            with open(options["json"], "w") as file:
+                json.dump(
+                    {"site": site.site_id, "vendor": connection.vendor, "rows": rows, "results": results},
+                    file,
+                    indent=2,
+                )
@@ -0,0 +1,139 @@
+import json
+import threading
+import time
+from collections import Counter
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.analytics.benchmarks import TrafficModel, format_table, summarize
+from apps.analytics.models import Site
+from apps.core.utils import get_or_null
+
+
+class Command(BaseCommand):
+    help = (
+        "Send beacons to the collect endpoint and report throughput and latency. "
+        "Targets a running server (e.g. `uvicorn pingfox.asgi:application --workers 4`) "
+        "with --url, or runs the view in-process and also counts its queries."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("site_id", help="Site ID the beacons are sent for.")
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=10000,
+            help="Total number of beacons to send.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=8,
+            help="Number of concurrent senders.",
+        )
+        parser.add_argument(
+            "--visitors",
+            type=int,
+            default=1000,
+            help="Number of distinct visitors the beacons come from.",
+        )
+        parser.add_argument(
+            "--url",
+            help="Full URL of the collect endpoint of a running server, "
+            "e.g. http://127.0.0.1:8000/api/analytics/collect/.",
+        )
+        parser.add_argument("--seed", type=int, help="Seed for reproducible beacons.")
+        parser.add_argument("--json", help="Also write the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        site = get_or_null(Site, site_id=options["site_id"])
+        if not site:
+            raise CommandError(f"Site ID {options['site_id']} not found.")
+
+        concurrency = max(1, options["concurrency"])
+        per_sender = [
+            options["requests"] // concurrency + (index < options["requests"] % concurrency)
+            for index in range(concurrency)
+        ]
+        latencies = []
+        queries = []
+        statuses = Counter()
+        lock = threading.Lock()
+
+        def send(index, count):
+            model = TrafficModel(site, 1, None if options["seed"] is None else options["seed"] + index)
+            samples = []
+            query_counts = []
+            codes = Counter()
+            if options["url"]:
+                session = requests.Session()
+                post = lambda body: session.post(options["url"], data=body, timeout=30).status_code
+            else:
+                client = Client()
+                url = reverse("collect_data")
+                post = lambda body: client.post(url, body, content_type="application/json").status_code
+            try:
+                for _ in range(count):
+                    body = json.dumps(model.beacon(options["visitors"]))
+                    with CaptureQueriesContext(connection) as context:
+                        started = time.perf_counter()
+                        try:
+                            code = post(body)
+                        except requests.RequestException as e:
+                            code = type(e).__name__
+                        samples.append((time.perf_counter() - started) * 1000)
+                    codes[code] += 1
+                    if not options["url"]:
+                        query_counts.append(len(context.captured_queries))
+            finally:
+                close_old_connections()
+            with lock:
+                latencies.extend(samples)
+                queries.extend(query_counts)
+                statuses.update(codes)
+
+        threads = [
+            threading.Thread(target=send, args=(index, count))
+            for index, count in enumerate(per_sender)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        summary = summarize(latencies, round(sum(queries) / len(queries), 1) if queries else None)
+        summary["throughput"] = round(len(latencies) / elapsed, 1) if elapsed else 0
+        target = options["url"] or f"in-process ({connection.vendor})"
+        self.stdout.write(
+            f"Sent {len(latencies)} beacon(s) to {target} with {concurrency} sender(s) "
+            f"in {elapsed:.1f}s."
+        )
+        self.stdout.write(
+            format_table(
+                {"collect_data": summary},
+                ["throughput", "mean_ms", "p50_ms", "p99_ms", "max_ms", "queries"],
+            )
+        )
+        self.stdout.write(
+            "Responses: " + ", ".join(f"{code}: {count}" for code, count in sorted(statuses.items(), key=str))
+        )
+        if options["json"]:
+            with open(options["json"], "w") as file:
+                json.dump(
+                    {
+                        "site": site.site_id,
+                        "target": target,
+                        "concurrency": concurrency,
+                        "results": summary,
+                        "responses": {str(code): count for code, count in statuses.items()},
+                    },
+                    file,
+                    indent=2,
+                )
@@ -0,0 +1,97 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.analytics.benchmarks import BATCH_SIZE, generate_form_submissions, generate_page_views
+from apps.analytics.models import PageView, Site
+from apps.analytics.rollups import refresh_site_aggregates, rollup_site
+from apps.core.utils import get_or_null
+
+
+class Command(BaseCommand):
+    help = "Fill a site with synthetic page views and form submissions for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument("site_id", help="Site ID of the site to fill.")
+        parser.add_argument(
+            "--rows",
+            type=int,
+            default=1_000_000,
+            help="Number of page views to generate.",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=90,
+            help="Spread the page views over this many past days.",
+        )
+        parser.add_argument(
+            "--form-submissions",
+            type=int,
+            default=0,
+            help="Number of submissions to generate, spread over the forms of the site's team.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="Number of rows written per batch.",
+        )
+        parser.add_argument("--seed", type=int, help="Seed for reproducible data.")
+        parser.add_argument(
+            "--skip-aggregates",
+            action="store_true",
+            help="Do not rebuild visits and rollups afterwards.",
+        )
+
+    def handle(self, *args, **options):
+        site = get_or_null(Site, site_id=options["site_id"])
+        if not site:
+            raise CommandError(f"Site ID {options['site_id']} not found.")
+        if options["days"] < 1:
+            raise CommandError("--days must be at least 1.")
+
+        started = time.perf_counter()
+
+        def progress(written):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"  {written} page view(s), {written / elapsed:.0f} rows/s")
+
+        earliest = generate_page_views(
+            site,
+            options["rows"],
+            options["days"],
+            options["batch_size"],
+            options["seed"],
+            progress,
+        )
+        self.stdout.write(
+            f"Generated {options['rows']} page view(s) for {site.site_id} "
+            f"in {time.perf_counter() - started:.1f}s."
+        )
+
+        if options["form_submissions"]:
+            forms = list(site.team.forms.all())
+            if not forms:
+                self.stdout.write(f"Team {site.team} has no forms, skipping submissions.")
+            for index, form in enumerate(forms):
+                # Spread the submissions evenly, the first forms taking the remainder.
+                rows = options["form_submissions"] // len(forms) + (
+                    index < options["form_submissions"] % len(forms)
+                )
+                count = generate_form_submissions(
+                    form, site, rows, options["days"], options["batch_size"], options["seed"]
+                )
+                self.stdout.write(f"Generated {count} submission(s) for form {form.slug}.")
+
+        if earliest is not None and not options["skip_aggregates"]:
+            started = time.perf_counter()
+            refresh_site_aggregates(site, earliest)
+            rollup_site(site)
+            self.stdout.write(
+                f"Rebuilt visits and rollups in {time.perf_counter() - started:.1f}s."
+            )
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(f"ANALYZE {connection.ops.quote_name(PageView._meta.db_table)}")
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.analytics.importer import BATCH_SIZE, FORMATS, import_enabled, import_file
+from apps.analytics.models import Site
+from apps.core.utils import get_or_null
+
+
+class Command(BaseCommand):
+    help = "Import historical page views of a site from a CSV or NDJSON export."
+
+    def add_arguments(self, parser):
+        parser.add_argument("site_id", help="Site ID of the site to import into.")
+        parser.add_argument("path", help="Path of the export file.")
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="Format of the export. Guessed from the file extension by default.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="Number of rows written per batch.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Import even if the team's plan does not include imports.",
+        )
+
+    def handle(self, *args, **options):
+        site = get_or_null(Site, site_id=options["site_id"])
+        if not site:
+            raise CommandError(f"Site ID {options['site_id']} not found.")
+        if not options["force"] and not import_enabled(site.team):
+            raise CommandError(f"Imports are not enabled for team {site.team}.")
+
+        format = options["format"] or ("ndjson" if options["path"].endswith((".ndjson", ".jsonl")) else "csv")
+        result = import_file(site, options["path"], format, options["batch_size"])
+        self.stdout.write(
+            f"Imported {result['imported']} page view(s) into {site.site_id}, "
+            f"skipped {result['skipped']} row(s)."
+        )
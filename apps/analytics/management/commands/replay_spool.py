@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.analytics.spool import replay_spool
+
+
+class Command(BaseCommand):
+    help = (
+        "Store the beacons spooled on this host while the database was unavailable. "
+        "Run it on every host that receives collect requests."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            type=int,
+            metavar="SECONDS",
+            help="Keep running and replay the spool every SECONDS seconds.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            count = replay_spool()
+            if count:
+                self.stdout.write(f"Replayed {count} page view(s).")
+            if not options["loop"]:
+                return
+            time.sleep(options["loop"])
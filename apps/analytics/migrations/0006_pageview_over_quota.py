@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0005_alter_site_domain'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pageview',
+            name='over_quota',
+            field=models.BooleanField(default=False, help_text='Indicates whether the page view was recorded after the pageview quota was used up.', verbose_name='Over Quota'),
+        ),
+    ]
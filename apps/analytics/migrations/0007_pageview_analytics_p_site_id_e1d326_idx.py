@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0006_pageview_over_quota'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pageview',
+            index=models.Index(fields=['site', 'timestamp'], name='analytics_p_site_id_e1d326_idx'),
+        ),
+    ]
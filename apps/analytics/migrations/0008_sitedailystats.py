@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0007_pageview_analytics_p_site_id_e1d326_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SiteDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(help_text="The day these totals cover, in the site's timezone.", verbose_name='Date')),
+                ('pageviews', models.PositiveIntegerField(default=0, help_text='The number of page views recorded on this day.', verbose_name='Page Views')),
+                ('visitors', models.PositiveIntegerField(default=0, help_text='The number of distinct visitors seen on this day.', verbose_name='Visitors')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='The date and time when these totals were last computed.', verbose_name='Updated At')),
+                ('site', models.ForeignKey(help_text='The site these totals belong to.', on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='analytics.site', verbose_name='Site')),
+            ],
+            options={
+                'verbose_name': 'Site Daily Stats',
+                'verbose_name_plural': 'Site Daily Stats',
+                'ordering': ['site', 'date'],
+                'unique_together': {('site', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0008_sitedailystats'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='pageview',
+            name='analytics_p_site_id_e1d326_idx',
+        ),
+        migrations.AddIndex(
+            model_name='pageview',
+            index=models.Index(fields=['site', 'timestamp', 'id'], name='analytics_p_site_id_13af73_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0009_remove_pageview_analytics_p_site_id_e1d326_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Visit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(help_text='The timestamp of the first page view of the visit.', verbose_name='Started At')),
+                ('last_seen_at', models.DateTimeField(help_text='The timestamp of the latest page view of the visit.', verbose_name='Last Seen At')),
+                ('pageviews', models.PositiveIntegerField(default=1, help_text='The number of page views in this visit.', verbose_name='Page Views')),
+                ('entry_url', models.URLField(help_text='The first page viewed in this visit.', verbose_name='Entry URL')),
+                ('exit_url', models.URLField(help_text='The latest page viewed in this visit.', verbose_name='Exit URL')),
+                ('referrer', models.URLField(blank=True, help_text='The referrer of the first page view of the visit.', null=True, verbose_name='Referrer')),
+                ('site', models.ForeignKey(help_text='The site that was visited.', on_delete=django.db.models.deletion.CASCADE, related_name='visits', to='analytics.site', verbose_name='Site')),
+                ('visitor', models.ForeignKey(help_text='The visitor who made this visit.', on_delete=django.db.models.deletion.CASCADE, related_name='visits', to='analytics.visitorsession', verbose_name='Visitor')),
+            ],
+            options={
+                'verbose_name': 'Visit',
+                'verbose_name_plural': 'Visits',
+                'indexes': [models.Index(fields=['site', 'visitor', 'last_seen_at'], name='analytics_v_site_id_7661bc_idx'), models.Index(fields=['site', 'started_at'], name='analytics_v_site_id_52c74f_idx')],
+            },
+        ),
+    ]
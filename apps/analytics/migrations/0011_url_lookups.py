@@ -0,0 +1,59 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0010_visit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Hostname',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='The lowercased host name, without port or credentials.', max_length=255, unique=True, verbose_name='Name')),
+            ],
+            options={
+                'verbose_name': 'Hostname',
+                'verbose_name_plural': 'Hostnames',
+            },
+        ),
+        migrations.CreateModel(
+            name='Pathname',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='The URL path and remaining query string.', max_length=2000, unique=True, verbose_name='Name')),
+            ],
+            options={
+                'verbose_name': 'Pathname',
+                'verbose_name_plural': 'Pathnames',
+            },
+        ),
+        migrations.AddField(
+            model_name='pageview',
+            name='hostname',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='The normalized host of the viewed page.', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='analytics.hostname', verbose_name='Hostname'),
+        ),
+        migrations.AddField(
+            model_name='pageview',
+            name='referrer_hostname',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='The normalized host of the referrer, if any.', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='analytics.hostname', verbose_name='Referrer Hostname'),
+        ),
+        migrations.AddField(
+            model_name='pageview',
+            name='pathname',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='The normalized path of the viewed page.', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='analytics.pathname', verbose_name='Pathname'),
+        ),
+        migrations.AddIndex(
+            model_name='pageview',
+            index=models.Index(fields=['site', 'hostname', 'pathname'], name='analytics_p_site_id_784699_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pageview',
+            index=models.Index(fields=['site', 'referrer_hostname'], name='analytics_p_site_id_a773bb_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0011_url_lookups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visit',
+            name='browser',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Unknown'), (1, 'Chrome'), (2, 'Safari'), (3, 'Firefox'), (4, 'Edge'), (5, 'Opera'), (6, 'Samsung Internet'), (7, 'Internet Explorer'), (99, 'Other')], default=0, help_text='The browser family parsed from the user agent when the visit started.', verbose_name='Browser'),
+        ),
+        migrations.AddField(
+            model_name='visit',
+            name='device_type',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Unknown'), (1, 'Desktop'), (2, 'Mobile'), (3, 'Tablet'), (4, 'Bot')], default=0, help_text='The kind of device parsed from the user agent when the visit started.', verbose_name='Device Type'),
+        ),
+        migrations.AddField(
+            model_name='visit',
+            name='os',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Unknown'), (1, 'Windows'), (2, 'macOS'), (3, 'iOS'), (4, 'Android'), (5, 'Linux'), (6, 'ChromeOS'), (99, 'Other')], default=0, help_text='The operating system parsed from the user agent when the visit started.', verbose_name='Operating System'),
+        ),
+        migrations.AddField(
+            model_name='visit',
+            name='screen_class',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Unknown'), (1, 'Small (< 576px)'), (2, 'Medium (576–991px)'), (3, 'Large (992–1439px)'), (4, 'Extra Large (≥ 1440px)')], default=0, help_text='The screen width bucket of the first page view of the visit.', verbose_name='Screen Class'),
+        ),
+        migrations.AddField(
+            model_name='visitorsession',
+            name='browser',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Unknown'), (1, 'Chrome'), (2, 'Safari'), (3, 'Firefox'), (4, 'Edge'), (5, 'Opera'), (6, 'Samsung Internet'), (7, 'Internet Explorer'), (99, 'Other')], default=0, help_text='The browser family parsed from the user agent.', verbose_name='Browser'),
+        ),
+        migrations.AddField(
+            model_name='visitorsession',
+            name='device_type',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Unknown'), (1, 'Desktop'), (2, 'Mobile'), (3, 'Tablet'), (4, 'Bot')], default=0, help_text='The kind of device parsed from the user agent.', verbose_name='Device Type'),
+        ),
+        migrations.AddField(
+            model_name='visitorsession',
+            name='os',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Unknown'), (1, 'Windows'), (2, 'macOS'), (3, 'iOS'), (4, 'Android'), (5, 'Linux'), (6, 'ChromeOS'), (99, 'Other')], default=0, help_text='The operating system parsed from the user agent.', verbose_name='Operating System'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0012_device_dimensions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pageview',
+            name='country',
+            field=models.CharField(blank=True, default='', help_text="ISO 3166-1 code of the visitor's country, if GeoIP enrichment is enabled.", max_length=2, verbose_name='Country'),
+        ),
+        migrations.AddField(
+            model_name='pageview',
+            name='region',
+            field=models.CharField(blank=True, default='', help_text="ISO 3166-2 subdivision code of the visitor's region, without the country prefix.", max_length=3, verbose_name='Region'),
+        ),
+        migrations.AddField(
+            model_name='visit',
+            name='country',
+            field=models.CharField(blank=True, default='', help_text="ISO 3166-1 code of the visitor's country when the visit started.", max_length=2, verbose_name='Country'),
+        ),
+    ]
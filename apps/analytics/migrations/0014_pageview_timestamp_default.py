@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:42
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0013_geoip'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pageview',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='The timestamp when the page view occurred.', verbose_name='Timestamp'),
+        ),
+    ]
@@ -1,7 +1,10 @@
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 import secrets
+from datetime import timezone as dt_timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from django.utils.translation import gettext_lazy as _
 from django.db import models
 from apps.accounts.models import Team, User
@@ -141,6 +144,123 @@ class Site(models.Model):
     def __str__(self):
         return f"{self.name} ({self.domain})"
 
+    @property
+    def tzinfo(self):
+        """
+        The site's timezone, falling back to UTC when the name is unknown.
+        """
+        try:
+            return ZoneInfo(self.timezone)
+        except (ZoneInfoNotFoundError, ValueError):
+            return dt_timezone.utc
+
+
+# Device dimensions parsed from the user agent and the screen size. They are
+# stored as small integers; 0 always means unknown.
+BROWSER_UNKNOWN = 0
+BROWSER_CHROME = 1
+BROWSER_SAFARI = 2
+BROWSER_FIREFOX = 3
+BROWSER_EDGE = 4
+BROWSER_OPERA = 5
+BROWSER_SAMSUNG = 6
+BROWSER_IE = 7
+BROWSER_OTHER = 99
+BROWSER_CHOICES = [
+    (BROWSER_UNKNOWN, _("Unknown")),
+    (BROWSER_CHROME, "Chrome"),
+    (BROWSER_SAFARI, "Safari"),
+    (BROWSER_FIREFOX, "Firefox"),
+    (BROWSER_EDGE, "Edge"),
+    (BROWSER_OPERA, "Opera"),
+    (BROWSER_SAMSUNG, "Samsung Internet"),
+    (BROWSER_IE, "Internet Explorer"),
+    (BROWSER_OTHER, _("Other")),
+]
+
+OS_UNKNOWN = 0
+OS_WINDOWS = 1
+OS_MACOS = 2
+OS_IOS = 3
+OS_ANDROID = 4
+OS_LINUX = 5
+OS_CHROMEOS = 6
+OS_OTHER = 99
+OS_CHOICES = [
+    (OS_UNKNOWN, _("Unknown")),
+    (OS_WINDOWS, "Windows"),
+    (OS_MACOS, "macOS"),
+    (OS_IOS, "iOS"),
+    (OS_ANDROID, "Android"),
+    (OS_LINUX, "Linux"),
+    (OS_CHROMEOS, "ChromeOS"),
+    (OS_OTHER, _("Other")),
+]
+
+DEVICE_UNKNOWN = 0
+DEVICE_DESKTOP = 1
+DEVICE_MOBILE = 2
+DEVICE_TABLET = 3
+DEVICE_BOT = 4
+DEVICE_CHOICES = [
+    (DEVICE_UNKNOWN, _("Unknown")),
+    (DEVICE_DESKTOP, _("Desktop")),
+    (DEVICE_MOBILE, _("Mobile")),
+    (DEVICE_TABLET, _("Tablet")),
+    (DEVICE_BOT, _("Bot")),
+]
+
+SCREEN_UNKNOWN = 0
+SCREEN_SMALL = 1
+SCREEN_MEDIUM = 2
+SCREEN_LARGE = 3
+SCREEN_XLARGE = 4
+SCREEN_CHOICES = [
+    (SCREEN_UNKNOWN, _("Unknown")),
+    (SCREEN_SMALL, _("Small (< 576px)")),
+    (SCREEN_MEDIUM, _("Medium (576–991px)")),
+    (SCREEN_LARGE, _("Large (992–1439px)")),
+    (SCREEN_XLARGE, _("Extra Large (≥ 1440px)")),
+]
+
+
+class Hostname(models.Model):
+    """
+    A normalized host name, shared by every page view and referrer on it.
+    """
+    name = models.CharField(
+        max_length=255,
+        unique=True,
+        verbose_name=_("Name"),
+        help_text=_("The lowercased host name, without port or credentials.")
+    )
+
+    class Meta:
+        verbose_name = _("Hostname")
+        verbose_name_plural = _("Hostnames")
+
+    def __str__(self):
+        return self.name
+
+
+class Pathname(models.Model):
+    """
+    A normalized URL path, including the query string without tracking parameters.
+    """
+    name = models.CharField(
+        max_length=2000,
+        unique=True,
+        verbose_name=_("Name"),
+        help_text=_("The URL path and remaining query string.")
+    )
+
+    class Meta:
+        verbose_name = _("Pathname")
+        verbose_name_plural = _("Pathnames")
+
+    def __str__(self):
+        return self.name
+
 
 class VisitorSession(models.Model):
     """
@@ -168,6 +288,24 @@ class VisitorSession(models.Model):
         verbose_name=_("User Agent"),
         help_text=_("User agent string of the visitor's browser.")
     )
+    browser = models.PositiveSmallIntegerField(
+        choices=BROWSER_CHOICES,
+        default=BROWSER_UNKNOWN,
+        verbose_name=_("Browser"),
+        help_text=_("The browser family parsed from the user agent.")
+    )
+    os = models.PositiveSmallIntegerField(
+        choices=OS_CHOICES,
+        default=OS_UNKNOWN,
+        verbose_name=_("Operating System"),
+        help_text=_("The operating system parsed from the user agent.")
+    )
+    device_type = models.PositiveSmallIntegerField(
+        choices=DEVICE_CHOICES,
+        default=DEVICE_UNKNOWN,
+        verbose_name=_("Device Type"),
+        help_text=_("The kind of device parsed from the user agent.")
+    )
     def __str__(self):
         return f"Visitor {self.pf_id} - Last seen at {self.last_seen.isoformat()}"
 
@@ -200,6 +338,50 @@ class PageView(models.Model):
         verbose_name=_("Referrer"),
         help_text=_("The URL of the page that referred the visitor to this page.")
     )
+    hostname = models.ForeignKey(
+        Hostname,
+        on_delete=models.PROTECT,
+        null=True,
+        db_index=False,
+        blank=True,
+        related_name="+",
+        verbose_name=_("Hostname"),
+        help_text=_("The normalized host of the viewed page.")
+    )
+    pathname = models.ForeignKey(
+        Pathname,
+        on_delete=models.PROTECT,
+        null=True,
+        db_index=False,
+        blank=True,
+        related_name="+",
+        verbose_name=_("Pathname"),
+        help_text=_("The normalized path of the viewed page.")
+    )
+    referrer_hostname = models.ForeignKey(
+        Hostname,
+        on_delete=models.PROTECT,
+        null=True,
+        db_index=False,
+        blank=True,
+        related_name="+",
+        verbose_name=_("Referrer Hostname"),
+        help_text=_("The normalized host of the referrer, if any.")
+    )
+    country = models.CharField(
+        max_length=2,
+        blank=True,
+        default="",
+        verbose_name=_("Country"),
+        help_text=_("ISO 3166-1 code of the visitor's country, if GeoIP enrichment is enabled.")
+    )
+    region = models.CharField(
+        max_length=3,
+        blank=True,
+        default="",
+        verbose_name=_("Region"),
+        help_text=_("ISO 3166-2 subdivision code of the visitor's region, without the country prefix.")
+    )
     screen_width = models.PositiveIntegerField(
         null=True,
         blank=True,
@@ -213,10 +395,162 @@ class PageView(models.Model):
         help_text=_("The height of the visitor's screen in pixels.")
     )
     timestamp = models.DateTimeField(
-        auto_now_add=True,
+        default=timezone.now,
         verbose_name=_("Timestamp"),
         help_text=_("The timestamp when the page view occurred.")
     )
+    over_quota = models.BooleanField(
+        default=False,
+        verbose_name=_("Over Quota"),
+        help_text=_("Indicates whether the page view was recorded after the pageview quota was used up.")
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["site", "timestamp", "id"]),
+            models.Index(fields=["site", "hostname", "pathname"]),
+            models.Index(fields=["site", "referrer_hostname"]),
+        ]
 
     def __str__(self):
-        return f"{self.url} at {self.timestamp.isoformat()}"
\ No newline at end of file
+        return f"{self.url} at {self.timestamp.isoformat()}"
+
+class SiteDailyStats(models.Model):
+    """
+    Precomputed page view totals for one site and one day in the site's timezone.
+    Closed days are read from here instead of re-aggregating raw page views.
+    """
+    site = models.ForeignKey(
+        Site,
+        on_delete=models.CASCADE,
+        related_name="daily_stats",
+        verbose_name=_("Site"),
+        help_text=_("The site these totals belong to.")
+    )
+    date = models.DateField(
+        verbose_name=_("Date"),
+        help_text=_("The day these totals cover, in the site's timezone.")
+    )
+    pageviews = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_("Page Views"),
+        help_text=_("The number of page views recorded on this day.")
+    )
+    visitors = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_("Visitors"),
+        help_text=_("The number of distinct visitors seen on this day.")
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name=_("Updated At"),
+        help_text=_("The date and time when these totals were last computed.")
+    )
+
+    class Meta:
+        verbose_name = _("Site Daily Stats")
+        verbose_name_plural = _("Site Daily Stats")
+        unique_together = ("site", "date")
+        ordering = ["site", "date"]
+
+    def __str__(self):
+        return f"{self.site.name} on {self.date}: {self.pageviews} views"
+
+
+class Visit(models.Model):
+    """
+    A run of page views by one visitor on one site without a gap longer than
+    the visit timeout. Kept up to date while beacons arrive, so dashboards can
+    aggregate visits, bounce rate and time on site without touching page views.
+    """
+    site = models.ForeignKey(
+        Site,
+        on_delete=models.CASCADE,
+        related_name="visits",
+        verbose_name=_("Site"),
+        help_text=_("The site that was visited.")
+    )
+    visitor = models.ForeignKey(
+        VisitorSession,
+        on_delete=models.CASCADE,
+        related_name="visits",
+        verbose_name=_("Visitor"),
+        help_text=_("The visitor who made this visit.")
+    )
+    started_at = models.DateTimeField(
+        verbose_name=_("Started At"),
+        help_text=_("The timestamp of the first page view of the visit.")
+    )
+    last_seen_at = models.DateTimeField(
+        verbose_name=_("Last Seen At"),
+        help_text=_("The timestamp of the latest page view of the visit.")
+    )
+    pageviews = models.PositiveIntegerField(
+        default=1,
+        verbose_name=_("Page Views"),
+        help_text=_("The number of page views in this visit.")
+    )
+    entry_url = models.URLField(
+        verbose_name=_("Entry URL"),
+        help_text=_("The first page viewed in this visit.")
+    )
+    exit_url = models.URLField(
+        verbose_name=_("Exit URL"),
+        help_text=_("The latest page viewed in this visit.")
+    )
+    referrer = models.URLField(
+        blank=True,
+        null=True,
+        verbose_name=_("Referrer"),
+        help_text=_("The referrer of the first page view of the visit.")
+    )
+    browser = models.PositiveSmallIntegerField(
+        choices=BROWSER_CHOICES,
+        default=BROWSER_UNKNOWN,
+        verbose_name=_("Browser"),
+        help_text=_("The browser family parsed from the user agent when the visit started.")
+    )
+    os = models.PositiveSmallIntegerField(
+        choices=OS_CHOICES,
+        default=OS_UNKNOWN,
+        verbose_name=_("Operating System"),
+        help_text=_("The operating system parsed from the user agent when the visit started.")
+    )
+    device_type = models.PositiveSmallIntegerField(
+        choices=DEVICE_CHOICES,
+        default=DEVICE_UNKNOWN,
+        verbose_name=_("Device Type"),
+        help_text=_("The kind of device parsed from the user agent when the visit started.")
+    )
+    country = models.CharField(
+        max_length=2,
+        blank=True,
+        default="",
+        verbose_name=_("Country"),
+        help_text=_("ISO 3166-1 code of the visitor's country when the visit started.")
+    )
+    screen_class = models.PositiveSmallIntegerField(
+        choices=SCREEN_CHOICES,
+        default=SCREEN_UNKNOWN,
+        verbose_name=_("Screen Class"),
+        help_text=_("The screen width bucket of the first page view of the visit.")
+    )
+
+    class Meta:
+        verbose_name = _("Visit")
+        verbose_name_plural = _("Visits")
+        indexes = [
+            models.Index(fields=["site", "visitor", "last_seen_at"]),
+            models.Index(fields=["site", "started_at"]),
+        ]
+
+    def __str__(self):
+        return f"Visit by {self.visitor_id} on {self.site_id} at {self.started_at.isoformat()}"
+
+    @property
+    def duration(self):
+        return self.last_seen_at - self.started_at
+
+    @property
+    def is_bounce(self):
+        return self.pageviews == 1
@@ -0,0 +1,180 @@
+"""
+URL normalization for page views.
+
+Page and referrer URLs are reduced to a lowercased host and a path with the
+tracking parameters removed, and both are stored once in the `Hostname` and
+`Pathname` lookup tables. Page views point at them by id, so top pages and
+referrers are grouped on small integers instead of full URL strings.
+"""
+
+import threading
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from django.db import IntegrityError, connection, transaction
+
+from apps.analytics.models import Hostname, PageView, Pathname
+
+
+# Query parameters that only identify a campaign or click and never change
+# the page itself.
+TRACKING_PARAMS = {
+    "fbclid",
+    "gclid",
+    "dclid",
+    "gbraid",
+    "wbraid",
+    "msclkid",
+    "yclid",
+    "twclid",
+    "igshid",
+    "mc_cid",
+    "mc_eid",
+    "_ga",
+    "_gl",
+    "_hsenc",
+    "_hsmi",
+    "ref_src",
+}
+TRACKING_PREFIXES = ("utm_", "pk_", "mtm_")
+
+MAX_PATH_LENGTH = Pathname._meta.get_field("name").max_length
+# Distinct hosts and paths remembered per process.
+LOOKUP_CACHE_SIZE = 4096
+
+
+def _is_tracking_param(name):
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def normalize_url(url):
+    """
+    Split `url` into `(host, path)`, or return `(None, None)` when it has no host.
+
+    The host is lowercased without credentials, port or a trailing dot. The
+    path keeps the query string minus tracking parameters, drops the fragment
+    and defaults to "/".
+    """
+    try:
+        parts = urlsplit((url or "").strip())
+        host = parts.hostname
+    except ValueError:
+        return None, None
+    if not host:
+        return None, None
+
+    path = parts.path or "/"
+    query = [
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_tracking_param(key)
+    ]
+    if query:
+        path = f"{path}?{urlencode(query)}"
+    return host.rstrip(".")[:255], path[:MAX_PATH_LENGTH]
+
+
+def _get_or_create_id(model, name):
+    try:
+        return model.objects.only("id").get(name=name).id
+    except model.DoesNotExist:
+        pass
+    try:
+        with transaction.atomic():
+            return model.objects.create(name=name).id
+    except IntegrityError:
+        # Another worker created it first.
+        return model.objects.only("id").get(name=name).id
+
+
+class LookupCache:
+    """
+    Bounded per-process cache of lookup ids by name.
+
+    Only ids that are known to be committed are remembered: an id read or
+    created inside a transaction is added once that transaction commits, so
+    a rollback never leaves the cache pointing at a row that does not exist.
+    """
+
+    def __init__(self, model, maxsize=LOOKUP_CACHE_SIZE):
+        self.model = model
+        self.maxsize = maxsize
+        self._ids = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, name, id):
+        with self._lock:
+            self._ids[name] = id
+            self._ids.move_to_end(name)
+            while len(self._ids) > self.maxsize:
+                self._ids.popitem(last=False)
+
+    def get(self, name):
+        with self._lock:
+            id = self._ids.get(name)
+            if id is not None:
+                self._ids.move_to_end(name)
+                return id
+        id = _get_or_create_id(self.model, name)
+        if connection.in_atomic_block:
+            transaction.on_commit(lambda: self._remember(name, id))
+        else:
+            self._remember(name, id)
+        return id
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+
+
+hostname_ids = LookupCache(Hostname)
+pathname_ids = LookupCache(Pathname)
+
+
+def get_hostname_id(name):
+    return hostname_ids.get(name)
+
+
+def get_pathname_id(name):
+    return pathname_ids.get(name)
+
+
+def get_url_dimensions(url, referrer=None):
+    """
+    Return the lookup ids of a page view's URL and referrer as model field values.
+    Call it outside of transactions where possible, so new lookup rows are
+    committed, and cached, right away.
+    """
+    host, path = normalize_url(url)
+    referrer_host, _referrer_path = normalize_url(referrer)
+    return {
+        "hostname_id": get_hostname_id(host) if host else None,
+        "pathname_id": get_pathname_id(path) if path else None,
+        "referrer_hostname_id": get_hostname_id(referrer_host) if referrer_host else None,
+    }
+
+
+def backfill_url_dimensions(batch_size=1000):
+    """
+    Fill the lookup ids of page views recorded before URLs were normalized.
+    Returns the number of page views updated.
+    """
+    total = 0
+    last_pk = 0
+    while True:
+        batch = list(
+            PageView.objects.filter(pk__gt=last_pk, hostname__isnull=True)
+            .only("id", "url", "referrer")
+            .order_by("pk")[:batch_size]
+        )
+        if not batch:
+            return total
+        for view in batch:
+            for field, value in get_url_dimensions(view.url, view.referrer).items():
+                setattr(view, field, value)
+        PageView.objects.bulk_update(
+            batch, ["hostname", "pathname", "referrer_hostname"], batch_size=batch_size
+        )
+        total += len(batch)
+        last_pk = batch[-1].pk
@@ -0,0 +1,239 @@
+"""
+Pageview quota enforcement for the collector.
+
+Every beacon is counted against the team's `pageviews` plan feature, or against
+the site's own `pageview_limit_override` when one is set. Counters live in Redis,
+one key per team/site and billing period, and are mirrored in-process so the
+collector only talks to Redis every few beacons instead of on every request.
+"""
+
+import random
+import threading
+import time
+from calendar import monthrange
+from dataclasses import dataclass
+
+import redis
+from django.conf import settings
+from django.utils import timezone
+
+from apps.billing.models import PlanFeature
+from apps.core.utils import get_redis_connection
+
+
+QUOTA_ALLOW = "allow"
+QUOTA_FLAG = "flag"
+QUOTA_DROP = "drop"
+
+# How long a resolved limit is trusted before the plan is read again.
+LIMIT_CACHE_SECONDS = 60
+# Local increments are pushed to Redis after this many hits or seconds...
+FLUSH_EVERY = 20
+FLUSH_INTERVAL = 2.0
+# ...or on every hit once the counter is this close to the limit.
+FLUSH_EVERY_HIT_RATIO = 0.9
+
+
+@dataclass(frozen=True)
+class QuotaLimit:
+    key: str
+    limit: int | None
+    reset_day: int
+
+
+def get_period_start(reset_day, now=None):
+    """
+    Return the start of the billing period containing `now`.
+
+    Periods start at midnight UTC on `reset_day` of each month; the day is
+    clamped for short months (a reset day of 31 becomes Feb 28/29).
+    """
+    now = now or timezone.now()
+    year, month = now.year, now.month
+    start = now.replace(
+        day=min(reset_day, monthrange(year, month)[1]),
+        hour=0,
+        minute=0,
+        second=0,
+        microsecond=0,
+    )
+    if start > now:
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+        start = start.replace(
+            year=year, month=month, day=min(reset_day, monthrange(year, month)[1])
+        )
+    return start
+
+
+def get_period_end(reset_day, now=None):
+    """
+    Return the start of the billing period following the one containing `now`.
+    """
+    start = get_period_start(reset_day, now)
+    year, month = (start.year, start.month + 1) if start.month < 12 else (start.year + 1, 1)
+    return start.replace(
+        year=year, month=month, day=min(reset_day, monthrange(year, month)[1])
+    )
+
+
+def _parse_int(value, default=None):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def get_team_quota_settings(team_id):
+    """
+    Return `(pageviews, limit_reset_day)` from the team's plan in one query.
+    A missing or non-positive pageview value means the plan is unlimited.
+    """
+    features = dict(
+        PlanFeature.objects.filter(
+            plan__teams=team_id, key__in=["pageviews", "limit_reset_day"]
+        ).values_list("key", "value")
+    )
+    limit = _parse_int(features.get("pageviews"))
+    reset_day = _parse_int(features.get("limit_reset_day"), 1)
+    return (limit if limit and limit > 0 else None), min(max(reset_day, 1), 31)
+
+
+def quota_key(team_id, site=None, period_start=None):
+    """
+    Redis key of a quota counter. Sites with a limit override get their own
+    counter, every other site of the team shares the team counter.
+    """
+    owner = f"site:{site.pk}" if site is not None else f"team:{team_id}"
+    return f"pf:quota:{owner}:{period_start:%Y%m%d}"
+
+
+class QuotaCounter:
+    """
+    Per-process view of the Redis quota counters.
+
+    Each key remembers the last total read back from Redis plus the hits that
+    have not been flushed yet, so a check is a dict lookup in the common case.
+    Other workers' hits become visible on the next flush; overshoot is bounded
+    by `FLUSH_EVERY` per worker and disappears near the limit, where every hit
+    is flushed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._limits = {}
+
+    def get_limit(self, site):
+        now = time.monotonic()
+        cached = self._limits.get(site.pk)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        team_limit, reset_day = get_team_quota_settings(site.team_id)
+        period_start = get_period_start(reset_day)
+        if site.pageview_limit_override is not None:
+            limit = QuotaLimit(
+                quota_key(site.team_id, site, period_start),
+                site.pageview_limit_override,
+                reset_day,
+            )
+        else:
+            limit = QuotaLimit(
+                quota_key(site.team_id, None, period_start), team_limit, reset_day
+            )
+        if cached and cached[1].key != limit.key:
+            # A new billing period started; the old counter is finished.
+            with self._lock:
+                self._counters.pop(cached[1].key, None)
+        self._limits[site.pk] = (now + LIMIT_CACHE_SECONDS, limit)
+        return limit
+
+    def hit(self, quota):
+        """
+        Count one pageview against `quota` and return the estimated total.
+        """
+        now = time.monotonic()
+        with self._lock:
+            counter = self._counters.setdefault(quota.key, [0, 0, now])
+            counter[1] += 1
+            total = counter[0] + counter[1]
+            if (
+                counter[1] < FLUSH_EVERY
+                and now - counter[2] < FLUSH_INTERVAL
+                and total < quota.limit * FLUSH_EVERY_HIT_RATIO
+            ):
+                return total
+            pending = counter[1]
+            counter[1] = 0
+            counter[2] = now
+
+        try:
+            expire_at = get_period_end(quota.reset_day) + timezone.timedelta(days=1)
+            pipe = get_redis_connection().pipeline()
+            pipe.incrby(quota.key, pending)
+            pipe.expireat(quota.key, expire_at)
+            remote_total = pipe.execute()[0]
+        except redis.RedisError:
+            # Keep counting locally until Redis is reachable again.
+            with self._lock:
+                counter[1] += pending
+            return total
+
+        with self._lock:
+            counter[0] = remote_total
+            return counter[0] + counter[1]
+
+    def release(self, quota, count=1):
+        """
+        Take back `count` hits that were not stored after all. They are
+        subtracted from Redis with the next flush.
+        """
+        with self._lock:
+            counter = self._counters.get(quota.key)
+            if counter is not None:
+                counter[1] -= count
+
+    def reset(self):
+        """
+        Forget all local state so the next check re-reads the plan and Redis.
+        """
+        with self._lock:
+            self._counters.clear()
+            self._limits.clear()
+
+
+quota_counter = QuotaCounter()
+
+
+def check_pageview_quota(site):
+    """
+    Count a beacon for `site` and decide what to do with it.
+
+    Returns `QUOTA_ALLOW` while the site is within its quota. Past the quota the
+    outcome follows `PINGFOX_QUOTA_POLICY`: "drop" rejects the beacon, "flag"
+    stores it marked as over quota, and "sample" stores a
+    `PINGFOX_QUOTA_SAMPLE_RATE` fraction of them (flagged) and drops the rest.
+    """
+    quota = quota_counter.get_limit(site)
+    if quota.limit is None:
+        return QUOTA_ALLOW
+
+    if quota_counter.hit(quota) <= quota.limit:
+        return QUOTA_ALLOW
+
+    policy = settings.PINGFOX_QUOTA_POLICY
+    if policy == "flag":
+        return QUOTA_FLAG
+    if policy == "sample" and random.random() < settings.PINGFOX_QUOTA_SAMPLE_RATE:
+        return QUOTA_FLAG
+    return QUOTA_DROP
+
+
+def release_pageview_quota(site, count=1):
+    """
+    Undo `count` calls of `check_pageview_quota` for `site`, for beacons that
+    could not be stored and will be counted again when they are retried.
+    """
+    quota = quota_counter.get_limit(site)
+    if quota.limit is not None:
+        quota_counter.release(quota, count)
@@ -0,0 +1,130 @@
+"""
+Data retention helpers.
+
+Expired rows are deleted in small batches so each statement only holds row
+locks for a moment and never blocks the collector behind a long transaction.
+"""
+
+from django.db import connections, transaction
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from apps.analytics.caching import invalidate_site_analytics
+from apps.analytics.models import PageView, Site, SiteDailyStats, Visit, VisitorSession
+from apps.billing.models import PlanFeature
+from apps.forms.models import FormSubmission
+
+
+BATCH_SIZE = 5000
+# Visitor sessions are created just before their first page view, so only
+# sessions idle for longer than this are treated as orphans.
+ORPHAN_GRACE = timezone.timedelta(days=1)
+
+
+def get_retention_days(team_id):
+    """
+    Return the team's `data_retention_days`, or None when data is kept forever.
+    """
+    value = (
+        PlanFeature.objects.filter(plan__teams=team_id, key="data_retention_days")
+        .values_list("value", flat=True)
+        .first()
+    )
+    try:
+        days = int(value)
+    except (TypeError, ValueError):
+        return None
+    return days if days > 0 else None
+
+
+def _delete_batch_postgres(queryset, batch_size):
+    """
+    Delete one batch addressed by physical row id (ctid), which lets Postgres
+    go straight to the tuples instead of re-probing the primary key index.
+    Related rows are not cascaded, so `queryset` must only match rows that
+    nothing references anymore.
+    """
+    table = queryset.model._meta.db_table
+    select = (
+        queryset.order_by()
+        .annotate(_ctid=RawSQL(f'"{table}".ctid', []))
+        .values_list("_ctid", flat=True)[:batch_size]
+    )
+    sql, params = select.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM "{table}" WHERE ctid = ANY(ARRAY({sql}))', params
+        )
+        return cursor.rowcount
+
+
+def _delete_batch(queryset, batch_size):
+    """
+    Delete one batch by primary key, oldest rows first.
+    """
+    pks = list(queryset.order_by("pk").values_list("pk", flat=True)[:batch_size])
+    if not pks:
+        return 0
+    queryset.model.objects.filter(pk__in=pks).delete()
+    return len(pks)
+
+
+def delete_in_batches(queryset, batch_size=BATCH_SIZE):
+    """
+    Delete every row matched by `queryset`, one short transaction per batch.
+    Returns the number of rows removed from the queryset's table.
+    """
+    vendor = connections[queryset.db].vendor
+    total = 0
+    while True:
+        with transaction.atomic(using=queryset.db):
+            if vendor == "postgresql":
+                deleted = _delete_batch_postgres(queryset, batch_size)
+            else:
+                deleted = _delete_batch(queryset, batch_size)
+        total += deleted
+        if deleted < batch_size:
+            return total
+
+
+def prune_team_data(team_id, retention_days, now=None):
+    """
+    Delete the team's page views, visits, form submissions and daily rollups older
+    than its retention window, and drop the cached charts of its sites if any
+    were removed. Returns a mapping of model label to rows removed.
+    """
+    cutoff = (now or timezone.now()) - timezone.timedelta(days=retention_days)
+    removed = {
+        "page_views": delete_in_batches(
+            PageView.objects.filter(site__team_id=team_id, timestamp__lt=cutoff)
+        ),
+        "visits": delete_in_batches(
+            Visit.objects.filter(site__team_id=team_id, started_at__lt=cutoff)
+        ),
+        "form_submissions": delete_in_batches(
+            FormSubmission.objects.filter(form__team_id=team_id, submitted_at__lt=cutoff)
+        ),
+        "daily_stats": delete_in_batches(
+            SiteDailyStats.objects.filter(site__team_id=team_id, date__lt=cutoff.date())
+        ),
+    }
+    if any(removed.values()):
+        for site in Site.objects.filter(team_id=team_id):
+            invalidate_site_analytics(site)
+    return removed
+
+
+def prune_orphaned_sessions(now=None):
+    """
+    Delete visitor sessions that no longer have page views, visits or form
+    links.
+    """
+    cutoff = (now or timezone.now()) - ORPHAN_GRACE
+    return delete_in_batches(
+        VisitorSession.objects.filter(
+            last_seen__lt=cutoff,
+            page_views__isnull=True,
+            visits__isnull=True,
+            forms__isnull=True,
+        )
+    )
@@ -0,0 +1,99 @@
+"""
+Daily page view rollups.
+
+Each closed day in a site's own timezone is aggregated once into
+`SiteDailyStats`, so daily charts, quota reconciliation and page counts only
+touch raw page views for the day that is still open.
+"""
+
+from django.db.models import Count, Min
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.analytics.caching import invalidate_site_analytics
+from apps.analytics.models import PageView, SiteDailyStats
+from apps.analytics.services import local_midnight
+from apps.analytics.visits import rebuild_visits
+
+
+def rollup_site(site, now=None):
+    """
+    Aggregate every closed local day of `site` that has no rollup yet.
+
+    The most recent rollup is recomputed as well so beacons that arrived just
+    after midnight are still counted. Days without page views are stored with
+    zero totals so the rollup horizon keeps moving for quiet sites.
+    Returns the number of days written.
+    """
+    tz = site.tzinfo
+    today = (now or timezone.now()).astimezone(tz).date()
+
+    start_day = (
+        SiteDailyStats.objects.filter(site=site)
+        .order_by("-date")
+        .values_list("date", flat=True)
+        .first()
+    )
+    if start_day is None:
+        first_view = PageView.objects.filter(site=site).aggregate(first=Min("timestamp"))["first"]
+        if first_view is None:
+            return 0
+        start_day = first_view.astimezone(tz).date()
+    if start_day >= today:
+        return 0
+
+    totals = {
+        row["day"]: row
+        for row in PageView.objects.filter(
+            site=site,
+            timestamp__gte=local_midnight(start_day, tz),
+            timestamp__lt=local_midnight(today, tz),
+        )
+        .annotate(day=TruncDate("timestamp", tzinfo=tz))
+        .values("day")
+        .annotate(pageviews=Count("id"), visitors=Count("visitor", distinct=True))
+    }
+
+    stats = []
+    day = start_day
+    while day < today:
+        row = totals.get(day, {})
+        stats.append(
+            SiteDailyStats(
+                site=site,
+                date=day,
+                pageviews=row.get("pageviews", 0),
+                visitors=row.get("visitors", 0),
+                updated_at=timezone.now(),
+            )
+        )
+        day += timezone.timedelta(days=1)
+
+    SiteDailyStats.objects.bulk_create(
+        stats,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=["site", "date"],
+        update_fields=["pageviews", "visitors", "updated_at"],
+    )
+    return len(stats)
+
+
+def reset_site_rollups(site):
+    """
+    Drop the site's rollups, e.g. after its timezone changed or historical data
+    was imported. They are rebuilt on the next rollup run.
+    """
+    SiteDailyStats.objects.filter(site=site).delete()
+
+
+def refresh_site_aggregates(site, start):
+    """
+    Bring everything derived from page views up to date after page views from
+    `start` on were added late (spool replays, imports): visits are rebuilt,
+    rollups from that local day on are dropped so the next rollup run
+    recomputes them, and cached charts are invalidated.
+    """
+    rebuild_visits(site, start)
+    SiteDailyStats.objects.filter(site=site, date__gte=start.astimezone(site.tzinfo).date()).delete()
+    invalidate_site_analytics(site)
@@ -1,85 +1,363 @@
-from django.db.models import Count
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import Counter
+from datetime import datetime, time, timezone as dt_timezone
+from django.db import connection
+from django.db.models import Count, Max, Q, Sum
 from django.db.models.functions import TruncDay, TruncHour, TruncMinute
 from django.utils import timezone
-from apps.analytics.models import PageView, VisitorSession
+from apps.analytics.models import Hostname, PageView, Pathname, SiteDailyStats, VisitorSession
+from apps.analytics.normalization import normalize_url
 
 
-def get_site_analytics(site, range="daily"):
-    now = timezone.now()
-    qs = PageView.objects.filter(site=site)
+CHART_RANGES = {
+    "daily": {
+        "trunc": TruncDay,
+        "step": timezone.timedelta(days=1),
+        "floor": {"hour": 0, "minute": 0, "second": 0, "microsecond": 0},
+        "buckets": 30,
+        "label": "%b %d",  # e.g. "Jul 17"
+    },
+    "hourly": {
+        "trunc": TruncHour,
+        "step": timezone.timedelta(hours=1),
+        "floor": {"minute": 0, "second": 0, "microsecond": 0},
+        "buckets": 48,
+        "label": "%H:%M",  # e.g. "14:00"
+    },
+    "minute": {
+        "trunc": TruncMinute,
+        "step": timezone.timedelta(minutes=1),
+        "floor": {"second": 0, "microsecond": 0},
+        "buckets": 60,
+        "label": "%H:%M",  # e.g. "14:52"
+    },
+}
+
+
+def get_bucket_start(range, now=None, tz=dt_timezone.utc):
+    """
+    Return the start of the bucket of `range` that contains `now`, in `tz`.
+    """
+    now = now or timezone.now()
+    return now.astimezone(tz).replace(**CHART_RANGES[range]["floor"])
+
 
+def shift_bucket(range, bucket, count=1):
+    """
+    Move `bucket` by `count` buckets of `range`. Days move by wall-clock time so
+    they stay on local midnight across DST changes; hours and minutes move by
+    elapsed time.
+    """
+    step = CHART_RANGES[range]["step"] * count
     if range == "daily":
-        raw_data = (
-            qs.filter(timestamp__gte=now - timezone.timedelta(days=30))
-            .annotate(label=TruncDay("timestamp"))
-            .values("label")
-            .annotate(count=Count("id"))
-            .order_by("label")
-        )
-        formatter = lambda dt: dt.strftime("%b %d")  # e.g. "Jul 17"
-
-    elif range == "hourly":
-        raw_data = (
-            qs.filter(timestamp__gte=now - timezone.timedelta(days=2))
-            .annotate(label=TruncHour("timestamp"))
-            .values("label")
-            .annotate(count=Count("id"))
-            .order_by("label")
+        return bucket + step
+    return (bucket.astimezone(dt_timezone.utc) + step).astimezone(bucket.tzinfo)
+
+
+def get_range_start(range, now=None, tz=dt_timezone.utc):
+    """
+    Return the start of the oldest bucket shown for `range`.
+    """
+    open_start = get_bucket_start(range, now, tz)
+    return shift_bucket(range, open_start, 1 - CHART_RANGES[range]["buckets"])
+
+
+def local_midnight(date, tz):
+    return datetime.combine(date, time.min, tzinfo=tz)
+
+
+def get_rollup_horizon(site):
+    """
+    Return the local midnight from which the site has no daily rollups yet,
+    or None when nothing has been rolled up.
+    """
+    last = SiteDailyStats.objects.filter(site=site).aggregate(last=Max("date"))["last"]
+    if last is None:
+        return None
+    return local_midnight(last + timezone.timedelta(days=1), site.tzinfo)
+
+
+def count_views_since(site, start=None):
+    """
+    Return the site's total page views since `start` (or ever), reading whole
+    rolled-up days from `SiteDailyStats` and only the rest from raw rows.
+    """
+    tz = site.tzinfo
+    horizon = get_rollup_horizon(site)
+    raw = PageView.objects.filter(site=site)
+    rolled = SiteDailyStats.objects.filter(site=site)
+    if start is None:
+        if horizon is None:
+            return raw.count()
+        first_full = None
+    else:
+        first_full = local_midnight(start.astimezone(tz).date(), tz)
+        if first_full < start:
+            first_full += timezone.timedelta(days=1)
+        if horizon is None or horizon <= first_full:
+            return raw.filter(timestamp__gte=start).count()
+        rolled = rolled.filter(date__gte=first_full.date())
+        raw = raw.filter(
+            Q(timestamp__gte=start, timestamp__lt=first_full) | Q(timestamp__gte=horizon)
         )
-        formatter = lambda dt: dt.strftime("%H:%M")  # e.g. "14:00"
-
-    elif range == "minute":
-        raw_data = (
-            qs.filter(timestamp__gte=now - timezone.timedelta(hours=1))
-            .annotate(label=TruncMinute("timestamp"))
-            .values("label")
-            .annotate(count=Count("id"))
-            .order_by("label")
+
+    if first_full is None:
+        raw = raw.filter(timestamp__gte=horizon)
+    rolled = rolled.filter(date__lt=horizon.date()).aggregate(total=Sum("pageviews"))["total"]
+    return (rolled or 0) + raw.count()
+
+
+def _count_raw_views_by_bucket(site, range, start, end=None):
+    qs = PageView.objects.filter(site=site, timestamp__gte=start)
+    if end is not None:
+        qs = qs.filter(timestamp__lt=end)
+    trunc = CHART_RANGES[range]["trunc"]("timestamp", tzinfo=site.tzinfo)
+    rows = qs.annotate(label=trunc).values("label").annotate(count=Count("id")).order_by("label")
+    return [(row["label"], row["count"]) for row in rows]
+
+
+def _get_rollup_rows(site, start, end):
+    """
+    Return `(local_midnight, pageviews)` rows from the daily rollups.
+    """
+    tz = site.tzinfo
+    rows = SiteDailyStats.objects.filter(
+        site=site, date__gte=start.astimezone(tz).date(), date__lt=end.astimezone(tz).date()
+    ).values_list("date", "pageviews")
+    return [(local_midnight(date, tz), pageviews) for date, pageviews in rows]
+
+
+def count_views_by_bucket(site, range, start, end=None):
+    """
+    Count the site's page views per bucket of `range` between `start` and `end`,
+    bucketed in the site's timezone. Days that have been rolled up are read
+    from `SiteDailyStats`. Returns `(bucket_start, count)` tuples in order.
+    """
+    if range == "daily":
+        horizon = get_rollup_horizon(site)
+        if horizon is not None and horizon > start:
+            rows = _get_rollup_rows(site, start, min(horizon, end) if end else horizon)
+            if end is None or horizon < end:
+                rows += _count_raw_views_by_bucket(site, range, horizon, end)
+            return rows
+    return _count_raw_views_by_bucket(site, range, start, end)
+
+
+def fill_empty_buckets(rows, range, start, end):
+    """
+    Return `rows` with a zero count for every bucket of `range` between
+    `start` and `end` (both bucket starts, inclusive) that has no page views.
+    """
+    counts = dict(rows)
+    filled = []
+    bucket = start
+    while bucket <= end:
+        filled.append((bucket, counts.get(bucket, 0)))
+        bucket = shift_bucket(range, bucket)
+    return filled
+
+
+def format_chart_rows(rows, range):
+    """
+    Turn `(bucket_start, count)` tuples into the chart API payload.
+    """
+    label = CHART_RANGES[range]["label"]
+    return [{"label": dt.strftime(label), "count": count} for dt, count in rows]
+
+
+def get_site_analytics(site, range="daily"):
+    if range not in CHART_RANGES:
+        return []
+    now = timezone.now()
+    range_start = get_range_start(range, now, site.tzinfo)
+    rows = count_views_by_bucket(site, range, range_start)
+    rows = fill_empty_buckets(
+        rows, range, range_start, get_bucket_start(range, now, site.tzinfo)
+    )
+    return format_chart_rows(rows, range)
+
+
+MULTI_RANGE_SQL = """
+    SELECT
+        GROUPING(day, hour, minute) AS grouping_id,
+        COALESCE(day, hour, minute) AS bucket,
+        COUNT(*) AS count
+    FROM (
+        SELECT
+            CASE WHEN "timestamp" >= %(daily_start)s
+                THEN date_trunc('day', "timestamp" AT TIME ZONE %(tz)s) END AS day,
+            CASE WHEN "timestamp" >= %(hourly_start)s
+                THEN date_trunc('hour', "timestamp" AT TIME ZONE %(tz)s) END AS hour,
+            CASE WHEN "timestamp" >= %(minute_start)s
+                THEN date_trunc('minute', "timestamp" AT TIME ZONE %(tz)s) END AS minute
+        FROM analytics_pageview
+        WHERE site_id = %(site_id)s AND "timestamp" >= %(scan_start)s
+    ) AS views
+    GROUP BY GROUPING SETS ((day), (hour), (minute))
+"""
+
+# GROUPING(day, hour, minute) is a bitmask of the columns *not* grouped on.
+MULTI_RANGE_GROUPING = {0b011: "daily", 0b101: "hourly", 0b110: "minute"}
+
+
+def _count_all_ranges_postgres(site, starts, scan_start):
+    tz = site.tzinfo
+    rows = {range: [] for range in CHART_RANGES}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            MULTI_RANGE_SQL,
+            {
+                "site_id": site.pk,
+                "tz": str(tz),
+                "scan_start": scan_start,
+                "daily_start": starts["daily"],
+                "hourly_start": starts["hourly"],
+                "minute_start": starts["minute"],
+            },
         )
-        formatter = lambda dt: dt.strftime("%H:%M")  # e.g. "14:52"
+        for grouping_id, bucket, count in cursor.fetchall():
+            if bucket is not None:
+                range = MULTI_RANGE_GROUPING[grouping_id]
+                rows[range].append((bucket.replace(tzinfo=tz), count))
+    return rows
+
 
+def _count_all_ranges_python(site, starts, scan_start):
+    tz = site.tzinfo
+    counters = {range: Counter() for range in CHART_RANGES}
+    timestamps = (
+        PageView.objects.filter(site=site, timestamp__gte=scan_start)
+        .values_list("timestamp", flat=True)
+        .iterator(chunk_size=10000)
+    )
+    for ts in timestamps:
+        for range, start in starts.items():
+            if ts >= start:
+                counters[range][get_bucket_start(range, ts, tz)] += 1
+    return {range: list(counter.items()) for range, counter in counters.items()}
+
+
+def get_all_site_analytics(site, now=None):
+    """
+    Count the site's page views for every chart range in a single pass.
+
+    Days already rolled up come from `SiteDailyStats`; everything newer is
+    bucketed from one scan of the raw rows. Postgres does the scan in one
+    GROUPING SETS query, other databases stream the timestamps once and bucket
+    them here. Buckets follow the site's timezone.
+    Returns `{range: [(bucket_start, count), ...]}` with empty buckets filled.
+    """
+    now = now or timezone.now()
+    tz = site.tzinfo
+    range_starts = {range: get_range_start(range, now, tz) for range in CHART_RANGES}
+
+    # Only the days after the rollup horizon have to be counted from raw rows.
+    raw_starts = dict(range_starts)
+    horizon = get_rollup_horizon(site)
+    if horizon is not None and horizon > range_starts["daily"]:
+        raw_starts["daily"] = horizon
+    scan_start = min(raw_starts.values())
+
+    if connection.vendor == "postgresql":
+        rows = _count_all_ranges_postgres(site, raw_starts, scan_start)
     else:
-        return []
+        rows = _count_all_ranges_python(site, raw_starts, scan_start)
+    if raw_starts["daily"] != range_starts["daily"]:
+        rows["daily"] += _get_rollup_rows(site, range_starts["daily"], horizon)
+
+    return {
+        range: fill_empty_buckets(
+            sorted(rows[range]),
+            range,
+            range_starts[range],
+            get_bucket_start(range, now, tz),
+        )
+        for range in CHART_RANGES
+    }
+
+
+def _get_names(model, ids):
+    return dict(model.objects.filter(id__in=set(ids)).values_list("id", "name"))
 
-    # Format timestamps before returning
-    return [
-        {"label": formatter(row["label"]), "count": row["count"]} for row in raw_data
-    ]
+
+def _count_legacy_urls(views, field):
+    """
+    Count page views not backfilled yet (see `backfill_url_dimensions`) by the
+    normalized host and path of their raw `field` column.
+    """
+    counts = Counter()
+    rows = views.exclude(**{field: ""}).values(field).annotate(count=Count("id"))
+    for row in rows:
+        host, path = normalize_url(row[field])
+        if host:
+            counts[host, path] += row["count"]
+    return counts
 
 
 def get_top_pages(site, limit=5):
-    return (
-        PageView.objects.filter(site=site)
-        .values("url")
+    """
+    Return the most viewed pages of `site` as `{"url", "view_count"}` rows,
+    grouped by normalized host and path. Page views recorded before URLs were
+    normalized are counted from their raw URL until they are backfilled.
+    """
+    views = PageView.objects.filter(site=site)
+    legacy = _count_legacy_urls(views.filter(hostname__isnull=True), "url")
+    rows = (
+        views.filter(pathname__isnull=False)
+        .values("hostname_id", "pathname_id")
         .annotate(view_count=Count("id"))
-        .order_by("-view_count")[:limit]
+        .order_by("-view_count")
     )
+    # Merging legacy counts needs every group, not just the top ones.
+    rows = list(rows if legacy else rows[:limit])
+    hosts = _get_names(Hostname, [row["hostname_id"] for row in rows])
+    paths = _get_names(Pathname, [row["pathname_id"] for row in rows])
+    counts = Counter()
+    for row in rows:
+        counts[hosts[row["hostname_id"]], paths[row["pathname_id"]]] += row["view_count"]
+    counts.update(legacy)
+    return [
+        {"url": f"{host}{path}", "view_count": view_count}
+        for (host, path), view_count in counts.most_common(limit)
+    ]
 
 
 def get_top_referrers(site, limit=5):
-    return (
-        PageView.objects.filter(site=site)
-        .exclude(referrer__isnull=True)
-        .exclude(referrer__exact="")
-        .values("referrer")
+    """
+    Return the hosts referring most page views to `site` as
+    `{"referrer", "count"}` rows, with `referrer` the bare host. Page views
+    recorded before URLs were normalized are counted from their raw referrer
+    until they are backfilled.
+    """
+    views = PageView.objects.filter(site=site)
+    legacy = Counter()
+    for (host, _path), count in _count_legacy_urls(
+        views.filter(hostname__isnull=True, referrer_hostname__isnull=True), "referrer"
+    ).items():
+        legacy[host] += count
+    rows = (
+        views.filter(referrer_hostname__isnull=False)
+        .values("referrer_hostname_id")
         .annotate(count=Count("id"))
-        .order_by("-count")[:limit]
+        .order_by("-count")
     )
+    rows = list(rows if legacy else rows[:limit])
+    hosts = _get_names(Hostname, [row["referrer_hostname_id"] for row in rows])
+    counts = Counter()
+    for row in rows:
+        counts[hosts[row["referrer_hostname_id"]]] += row["count"]
+    counts.update(legacy)
+    return [{"referrer": host, "count": count} for host, count in counts.most_common(limit)]
 
 
 def get_pageviews_by_day(site, days=14):
     now = timezone.now()
-    qs = (
-        PageView.objects.filter(
-            site=site, timestamp__gte=now - timezone.timedelta(days=days)
-        )
-        .annotate(day=TruncDay("timestamp"))
-        .values("day")
-        .annotate(count=Count("id"))
-        .order_by("day")
-    )
-    return [entry["day"].strftime("%Y-%m-%d") for entry in qs], [
-        entry["count"] for entry in qs
+    tz = site.tzinfo
+    today = get_bucket_start("daily", now, tz)
+    start = shift_bucket("daily", today, 1 - days)
+    rows = fill_empty_buckets(count_views_by_bucket(site, "daily", start), "daily", start, today)
+    return [day.strftime("%Y-%m-%d") for day, _count in rows], [
+        count for _day, count in rows
     ]
 
 
@@ -91,41 +369,68 @@ def get_page_views(site):
     return PageView.objects.filter(site=site).order_by("-timestamp")
 
 
-def get_view_stats(site):
-    now = timezone.now()
+def encode_log_cursor(page_view):
+    """
+    Encode the position of `page_view` in the page view log as an opaque token.
+    """
+    raw = f"{page_view.timestamp.isoformat()}|{page_view.pk}"
+    return urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
 
-    daily = (
-        PageView.objects.filter(
-            site=site, timestamp__gte=now - timezone.timedelta(days=30)
-        )
-        .annotate(day=TruncDay("timestamp"))
-        .values("day")
-        .annotate(count=Count("id"))
-        .order_by("day")
-    )
 
-    hourly = (
-        PageView.objects.filter(
-            site=site, timestamp__gte=now - timezone.timedelta(days=2)
-        )
-        .annotate(hour=TruncHour("timestamp"))
-        .values("hour")
-        .annotate(count=Count("id"))
-        .order_by("hour")
-    )
+def decode_log_cursor(cursor):
+    """
+    Decode a token from `encode_log_cursor` into `(timestamp, id)`, or None.
+    """
+    try:
+        timestamp, pk = urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (ValueError, UnicodeError):
+        return None
 
-    per_minute = (
-        PageView.objects.filter(
-            site=site, timestamp__gte=now - timezone.timedelta(hours=1)
+
+def get_page_view_log(site, cursor=None, direction="next", per_page=10):
+    """
+    Return one page of the site's page view log, newest first.
+
+    Pages are addressed by keyset on `(timestamp, id)` instead of OFFSET, so
+    every page costs the same index range scan however deep it is. `cursor`
+    is the token of the last row of the current page (direction "next") or of
+    its first row (direction "prev").
+    Returns `(page_views, next_cursor, prev_cursor)`; a cursor is None when
+    there is nothing further in that direction.
+    """
+    qs = PageView.objects.filter(site=site).select_related("visitor")
+    position = decode_log_cursor(cursor) if cursor else None
+
+    if position and direction == "prev":
+        timestamp, pk = position
+        rows = list(
+            qs.filter(Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, pk__gt=pk))
+            .order_by("timestamp", "pk")[: per_page + 1]
         )
-        .annotate(minute=TruncMinute("timestamp"))
-        .values("minute")
-        .annotate(count=Count("id"))
-        .order_by("minute")
-    )
+        has_prev = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        has_next = True
+    else:
+        if position:
+            timestamp, pk = position
+            qs = qs.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, pk__lt=pk))
+        rows = list(qs.order_by("-timestamp", "-pk")[: per_page + 1])
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        has_prev = position is not None
+
+    next_cursor = encode_log_cursor(rows[-1]) if rows and has_next else None
+    prev_cursor = encode_log_cursor(rows[0]) if rows and has_prev else None
+    return rows, next_cursor, prev_cursor
 
+
+def get_view_stats(site):
+    series = get_all_site_analytics(site)
     return {
-        "daily": list(daily),
-        "hourly": list(hourly),
-        "per_minute": list(per_minute),
+        "daily": [{"day": dt, "count": count} for dt, count in series["daily"]],
+        "hourly": [{"hour": dt, "count": count} for dt, count in series["hourly"]],
+        "per_minute": [
+            {"minute": dt, "count": count} for dt, count in series["minute"]
+        ],
     }
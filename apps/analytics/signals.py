@@ -0,0 +1,17 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.analytics.edge import update_site_snapshot
+from apps.analytics.models import Site
+
+
+@receiver(post_save, sender=Site)
+def add_site_to_snapshot(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: update_site_snapshot(instance.site_id))
+
+
+@receiver(post_delete, sender=Site)
+def remove_site_from_snapshot(sender, instance, **kwargs):
+    transaction.on_commit(lambda: update_site_snapshot(instance.site_id, exists=False))
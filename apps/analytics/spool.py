@@ -0,0 +1,274 @@
+"""
+Write-ahead spool for beacons that could not be stored.
+
+Each web process appends beacons as JSON lines to its own open segment in
+`PINGFOX_SPOOL_DIR`. Lines are flushed on every append and fsynced in batches
+(every `PINGFOX_SPOOL_FSYNC_EVERY` beacons or once per second), so the request
+path never waits on the disk for long. Segments are sealed once they reach
+`PINGFOX_SPOOL_SEGMENT_SIZE` bytes or `PINGFOX_SPOOL_SEGMENT_AGE` seconds, and
+`replay_spool` bulk-loads sealed segments once the database is back.
+
+The spool directory is local to each host. Run `manage.py replay_spool --loop`
+on every web host, unless the directory is on storage shared with the
+workers, where the periodic `replay_ingest_spool` actor replays it.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, transaction
+
+from apps.analytics.ingest import ingest_beacons
+from apps.analytics.rollups import refresh_site_aggregates
+
+
+OPEN_SUFFIX = ".open"
+SEALED_SUFFIX = ".ndjson"
+REPLAYING_SUFFIX = ".replaying"
+REJECTED_SUFFIX = ".rejected"
+# Claims older than this are from a replay that died, and are taken over.
+# Longer than the time limit of `replay_ingest_spool`.
+CLAIM_TIMEOUT = 2 * 60 * 60
+# Errors meaning the database is unavailable, as opposed to a bad beacon.
+UNAVAILABLE_ERRORS = (OperationalError, InterfaceError)
+# How often buffered lines are fsynced at the latest.
+FSYNC_INTERVAL = 1.0
+
+
+def get_spool_dir():
+    path = Path(settings.PINGFOX_SPOOL_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+class SpoolWriter:
+    """
+    Appends beacons to the current process's open segment.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._file = None
+        self._path = None
+        self._pid = None
+        self._opened_at = 0
+        self._size = 0
+        self._unsynced = 0
+        self._synced_at = 0
+
+    def _open(self):
+        now = time.time()
+        self._pid = os.getpid()
+        self._path = get_spool_dir() / f"{self._pid}-{time.time_ns()}{OPEN_SUFFIX}"
+        self._file = open(self._path, "ab")
+        self._opened_at = now
+        self._synced_at = now
+        self._size = 0
+        self._unsynced = 0
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._synced_at = time.time()
+
+    def _seal(self):
+        self._sync()
+        self._file.close()
+        self._file = None
+        try:
+            self._path.rename(self._path.with_suffix(SEALED_SUFFIX))
+        except FileNotFoundError:
+            # Idle for long enough that a replay worker claimed it already.
+            pass
+
+    def append(self, beacon):
+        """
+        Append one beacon to the spool.
+        """
+        line = json.dumps(beacon, separators=(",", ":")).encode("utf-8") + b"\n"
+        with self._lock:
+            if self._file is not None and self._pid != os.getpid():
+                # Forked: the segment belongs to the parent process.
+                self._file = None
+            if self._file is not None and (
+                self._size >= settings.PINGFOX_SPOOL_SEGMENT_SIZE
+                or time.time() - self._opened_at >= settings.PINGFOX_SPOOL_SEGMENT_AGE
+            ):
+                self._seal()
+            if self._file is None:
+                self._open()
+
+            self._file.write(line)
+            self._file.flush()
+            self._size += len(line)
+            self._unsynced += 1
+            if (
+                self._unsynced >= settings.PINGFOX_SPOOL_FSYNC_EVERY
+                or time.time() - self._synced_at >= FSYNC_INTERVAL
+            ):
+                self._sync()
+
+    def close(self):
+        """
+        Seal the open segment, if any.
+        """
+        with self._lock:
+            if self._file is not None and self._pid == os.getpid():
+                self._seal()
+
+
+spool_writer = SpoolWriter()
+
+
+def spool_beacon(beacon):
+    spool_writer.append(beacon)
+
+
+def _segment_name(path):
+    # "<pid>-<ns>" without the suffix and claim time.
+    return path.name.split(".", 1)[0]
+
+
+def _claimed_at(path):
+    try:
+        return int(path.name.split(".")[1])
+    except (IndexError, ValueError):
+        return 0
+
+
+def claim_segments():
+    """
+    Claim every segment that is ready to be replayed and return their paths.
+
+    Sealed segments are ready right away. Open segments are only taken once
+    they are idle for twice the segment age: their writer has exited, since
+    a live writer seals a segment of that age before appending to it again.
+    Segments claimed more than `CLAIM_TIMEOUT` seconds ago are taken over
+    from the replay that crashed or was killed while holding them. The claim
+    time is part of the claimed file's name.
+    """
+    spool_dir = get_spool_dir()
+    now = time.time()
+    stale_before = now - 2 * settings.PINGFOX_SPOOL_SEGMENT_AGE
+    claimed = []
+    for path in sorted(spool_dir.iterdir()):
+        try:
+            ready = path.suffix == SEALED_SUFFIX or (
+                path.suffix == OPEN_SUFFIX and path.stat().st_mtime < stale_before
+            ) or (
+                path.suffix == REPLAYING_SUFFIX and _claimed_at(path) < now - CLAIM_TIMEOUT
+            )
+        except FileNotFoundError:
+            continue
+        if ready:
+            target = spool_dir / f"{_segment_name(path)}.{int(now)}{REPLAYING_SUFFIX}"
+            try:
+                path.rename(target)
+            except FileNotFoundError:
+                # Claimed by another replay worker.
+                continue
+            claimed.append(target)
+    return claimed
+
+
+def release_segment(path):
+    """
+    Give a claimed segment back, to be replayed by a later run.
+    """
+    path.rename(path.with_name(_segment_name(path) + SEALED_SUFFIX))
+
+
+def read_segment(path):
+    """
+    Yield the beacons of a segment, skipping a torn last line.
+    """
+    with open(path, "rb") as file:
+        for number, line in enumerate(file, 1):
+            try:
+                yield json.loads(line)
+            except ValueError:
+                print(f"[PingFox Spool] Skipping unreadable line {number} of {path.name}.")
+
+
+def _reject(path, beacons):
+    rejected = path.with_name(_segment_name(path) + REJECTED_SUFFIX)
+    with open(rejected, "ab") as file:
+        for beacon in beacons:
+            file.write(json.dumps(beacon, separators=(",", ":")).encode("utf-8") + b"\n")
+        file.flush()
+        os.fsync(file.fileno())
+    print(f"[PingFox Spool] Set aside {len(beacons)} beacon(s) of {path.name} in {rejected.name}.")
+
+
+def replay_segment(path):
+    """
+    Store the beacons of a claimed segment and delete it.
+
+    The segment is stored in one transaction, so a replay that fails or is
+    killed leaves nothing behind and can start over. If the bulk insert fails
+    for a reason other than the database being unavailable, the beacons are
+    stored one by one instead, and those that still fail are moved to a
+    `.rejected` file next to the segment. The aggregates of the affected
+    sites are refreshed from the earliest replayed page view on, so late page
+    views are counted like any other. Returns the number of page views stored.
+    """
+    beacons = list(read_segment(path))
+    rejected = []
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                count, touched = ingest_beacons(beacons)
+        except UNAVAILABLE_ERRORS:
+            raise
+        except Exception as e:
+            print(f"[PingFox Spool] Bulk replay of {path.name} failed, storing beacons one by one: {e}")
+            count, touched = 0, {}
+            for beacon in beacons:
+                try:
+                    with transaction.atomic():
+                        stored, sites = ingest_beacons([beacon])
+                except UNAVAILABLE_ERRORS:
+                    raise
+                except Exception:
+                    rejected.append(beacon)
+                    continue
+                count += stored
+                for site, start in sites.items():
+                    if site not in touched or start < touched[site]:
+                        touched[site] = start
+    if rejected:
+        _reject(path, rejected)
+    # The page views are committed; from here on a retry would duplicate them.
+    path.unlink()
+    for site, start in touched.items():
+        refresh_site_aggregates(site, start)
+    return count
+
+
+def replay_spool():
+    """
+    Replay every ready segment. When the database is still unavailable the
+    remaining segments are given back and retried on the next run; so are
+    they when the replay is interrupted. Returns the number of page views
+    stored.
+    """
+    total = 0
+    claimed = claim_segments()
+    try:
+        for path in claimed:
+            try:
+                total += replay_segment(path)
+            except UNAVAILABLE_ERRORS as e:
+                print(f"[PingFox Spool] Replay of {path.name} failed, will retry: {e}")
+                break
+    finally:
+        # Replayed segments are gone; give the others back.
+        for path in claimed:
+            if path.exists():
+                release_segment(path)
+    return total
@@ -1,7 +1,18 @@
 import requests
 import dramatiq
+from django.utils import timezone
 from .models import Site, verification_file_path
-from apps.core.utils import get_or_null
+from .rollups import refresh_site_aggregates, rollup_site
+from .services import count_views_since
+from .visits import rebuild_visits
+from .spool import replay_spool
+from .edge import publish_site_snapshot
+from .ingest import ingest_beacons
+from .importer import import_enabled, import_file
+from .retention import get_retention_days, prune_orphaned_sessions, prune_team_data
+from .quota import get_period_end, get_period_start, get_team_quota_settings, quota_key
+from apps.accounts.models import Team
+from apps.core.utils import get_or_null, get_redis_connection
 
 
 @dramatiq.actor
@@ -28,3 +39,140 @@ def verify_site(site_id):
             continue
 
     print(f"[PingFox Verify] Verification failed for {site.domain}")
+
+
+@dramatiq.actor
+def reconcile_pageview_quotas():
+    """
+    Reset the Redis quota counters to the number of stored page views.
+
+    Counters drift when a collector dies with unflushed hits or Redis loses
+    keys; the database is the source of truth for what was accepted. Whole
+    days come from the daily rollups. Collectors pick up the corrected totals
+    on their next flush.
+    """
+    connection = get_redis_connection()
+    for team in Team.objects.filter(sites__isnull=False).distinct().only("id"):
+        _limit, reset_day = get_team_quota_settings(team.id)
+        period_start = get_period_start(reset_day)
+        expire_at = get_period_end(reset_day) + timezone.timedelta(days=1)
+        counters = {quota_key(team.id, None, period_start): 0}
+        for site in Site.objects.filter(team=team):
+            count = count_views_since(site, period_start)
+            if site.pageview_limit_override is not None:
+                counters[quota_key(team.id, site, period_start)] = count
+            else:
+                counters[quota_key(team.id, None, period_start)] += count
+
+        for key, count in counters.items():
+            connection.set(key, count, exat=expire_at)
+        print(f"[PingFox Quota] Reconciled {len(counters)} counter(s) for team {team.id}.")
+
+
+@dramatiq.actor(time_limit=60 * 60 * 1000)
+def prune_expired_data():
+    """
+    Delete analytics and form data older than each team's `data_retention_days`
+    and drop visitor sessions left without any page views.
+    """
+    totals = {
+        "page_views": 0,
+        "visits": 0,
+        "form_submissions": 0,
+        "daily_stats": 0,
+        "visitor_sessions": 0,
+    }
+    for team_id in Team.objects.values_list("id", flat=True):
+        retention_days = get_retention_days(team_id)
+        if retention_days is None:
+            continue
+        removed = prune_team_data(team_id, retention_days)
+        for key, count in removed.items():
+            totals[key] += count
+        if any(removed.values()):
+            print(f"[PingFox Retention] Team {team_id}: removed {removed}.")
+
+    totals["visitor_sessions"] = prune_orphaned_sessions()
+    print(f"[PingFox Retention] Removed {totals}.")
+    return totals
+
+
+@dramatiq.actor(time_limit=60 * 60 * 1000)
+def rollup_daily_stats():
+    """
+    Roll up every closed local day of every active site into `SiteDailyStats`.
+    """
+    days = 0
+    for site in Site.objects.filter(is_active=True):
+        days += rollup_site(site)
+    print(f"[PingFox Rollup] Wrote {days} daily rollup(s).")
+
+
+@dramatiq.actor(time_limit=60 * 60 * 1000)
+def rebuild_site_visits(site_id, since=None):
+    """
+    Recompute the visits of a site from its raw page views, e.g. after a
+    historical import. `since` is an ISO timestamp limiting the window.
+    """
+    site = get_or_null(Site, site_id=site_id)
+    if not site:
+        print(f"[PingFox Visits] Site ID {site_id} not found.")
+        return 0
+    start = timezone.datetime.fromisoformat(since) if since else None
+    count = rebuild_visits(site, start)
+    print(f"[PingFox Visits] Rebuilt {count} visit(s) for {site.site_id}.")
+    return count
+
+
+@dramatiq.actor(time_limit=60 * 60 * 1000)
+def replay_ingest_spool():
+    """
+    Store the beacons spooled while the database was unavailable. Only useful
+    when the spool directory is shared with the web hosts; otherwise each host
+    runs `manage.py replay_spool`.
+    """
+    count = replay_spool()
+    if count:
+        print(f"[PingFox Spool] Replayed {count} page view(s).")
+    return count
+
+
+@dramatiq.actor(queue_name="ingest")
+def ingest_beacon_batch(beacons, live=True):
+    """
+    Store a batch of beacons forwarded by an edge collector. Batches replayed
+    from a collector's spool are late, so their sites' aggregates are
+    refreshed instead.
+    """
+    count, touched = ingest_beacons(beacons, live=live)
+    if not live:
+        for site, start in touched.items():
+            refresh_site_aggregates(site, start)
+    return count
+
+
+@dramatiq.actor
+def sync_site_snapshot():
+    """
+    Republish the snapshot of site IDs the edge collectors validate against.
+    """
+    count = publish_site_snapshot()
+    print(f"[PingFox Edge] Published {count} site(s) to the collector snapshot.")
+    return count
+
+
+@dramatiq.actor(time_limit=6 * 60 * 60 * 1000, max_retries=0)
+def import_site_pageviews(site_id, path, format="csv"):
+    """
+    Import an export file (on storage shared with the workers) into a site.
+    """
+    site = get_or_null(Site, site_id=site_id)
+    if not site:
+        print(f"[PingFox Import] Site ID {site_id} not found.")
+        return None
+    if not import_enabled(site.team):
+        print(f"[PingFox Import] Imports are not enabled for team {site.team_id}.")
+        return None
+    result = import_file(site, path, format)
+    print(f"[PingFox Import] {site.site_id}: {result}.")
+    return result
@@ -19,7 +19,7 @@
   }
 
   function collectData(siteId) {
-    const endpoint = "{{ site_url }}api/analytics/collect/";
+    const endpoint = "{{ collect_url }}";
     const data = {
       pf_id: getPFID(),
       site_id: siteId,
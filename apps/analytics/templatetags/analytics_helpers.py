@@ -0,0 +1,20 @@
+from django import template
+
+register = template.Library()
+
+@register.filter
+def duration(value):
+    """
+    Format a timedelta as "1h 02m", "3m 05s" or "42s".
+    """
+    try:
+        seconds = int(value.total_seconds())
+    except AttributeError:
+        return value
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    if hours:
+        return f"{hours}h {minutes:02d}m"
+    if minutes:
+        return f"{minutes}m {seconds:02d}s"
+    return f"{seconds}s"
@@ -13,7 +13,8 @@ def domain(url):
 @register.filter
 def favicon(url):
     try:
-        domain = urlparse(url).netloc
+        # Accepts a bare host as well as a URL.
+        domain = urlparse(url).netloc or url
         return f"https://www.google.com/s2/favicons?domain={domain}"
     except:
         return ""
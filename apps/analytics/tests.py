@@ -1,3 +1,908 @@
-from django.test import TestCase
+import asyncio
+import io
+import ipaddress
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import date, datetime, timezone as dt_timezone
+from unittest import mock
+
+import redis
+from django.contrib.auth import get_user_model
+from django.db import OperationalError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.accounts.models import Team
+from apps.analytics import dashboard, edge, geoip, live, spool
+from apps.analytics.api import AnalyticsChartDataAPI
+from apps.analytics.caching import get_cached_site_analytics, invalidate_site_analytics
+from apps.analytics.devices import backfill_device_dimensions, get_screen_class, parse_user_agent
+from apps.analytics.importer import import_page_views, read_rows
+from apps.analytics.normalization import (
+    backfill_url_dimensions,
+    get_url_dimensions,
+    hostname_ids,
+    normalize_url,
+    pathname_ids,
+)
+from apps.analytics.ingest import InvalidBeacon, decode_payload, ingest_beacon, make_beacon
+from apps.analytics.models import (
+    BROWSER_CHROME,
+    BROWSER_EDGE,
+    BROWSER_SAFARI,
+    BROWSER_UNKNOWN,
+    DEVICE_BOT,
+    DEVICE_DESKTOP,
+    DEVICE_MOBILE,
+    DEVICE_TABLET,
+    DEVICE_UNKNOWN,
+    OS_ANDROID,
+    OS_IOS,
+    OS_LINUX,
+    OS_MACOS,
+    OS_UNKNOWN,
+    OS_WINDOWS,
+    SCREEN_LARGE,
+    SCREEN_MEDIUM,
+    SCREEN_SMALL,
+    SCREEN_UNKNOWN,
+    SCREEN_XLARGE,
+    PageView,
+    Site,
+    SiteDailyStats,
+    Visit,
+    VisitorSession,
+)
+from apps.analytics.visits import get_visit_stats, rebuild_visits, record_visit
+from apps.billing.models import PlanFeature
+from apps.analytics.quota import (
+    QUOTA_ALLOW,
+    QUOTA_DROP,
+    QuotaLimit,
+    check_pageview_quota,
+    quota_counter,
+    release_pageview_quota,
+)
+from apps.analytics.rollups import rollup_site
+from apps.analytics.retention import get_retention_days, prune_orphaned_sessions, prune_team_data
+from apps.analytics.services import (
+    count_views_by_bucket,
+    decode_log_cursor,
+    format_chart_rows,
+    get_all_site_analytics,
+    get_page_view_log,
+    get_site_analytics,
+    get_top_pages,
+    get_top_referrers,
+    local_midnight,
+    shift_bucket,
+)
+
+
+User = get_user_model()
+
+
+def create_site(name="Blog", **kwargs):
+    owner = User.objects.create_user(username=f"{name.lower()}-owner", password="password")
+    team = Team.objects.create(name=f"{name} team", slug=f"{name.lower()}-team", owner=owner)
+    return Site.objects.create(
+        team=team, owner=owner, name=name, domain="example.com", url="https://example.com", **kwargs
+    )
+
+
+def beacon(site, **data):
+    return make_beacon({"site_id": site.site_id, "url": "https://example.com/", **data}, "127.0.0.1")
+
+
+class FakeRedis:
+    """
+    Just enough of a Redis client for the quota counter.
+    """
+
+    def __init__(self):
+        self.values = {}
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.increments = []
+
+    def incrby(self, key, amount):
+        self.increments.append((key, amount))
+
+    def expireat(self, key, when):
+        pass
+
+    def execute(self):
+        results = []
+        for key, amount in self.increments:
+            self.redis.values[key] = self.redis.values.get(key, 0) + amount
+            results.extend([self.redis.values[key], True])
+        return results
+
+
+class QuotaMixin:
+    def setUp(self):
+        super().setUp()
+        quota_counter.reset()
+        self.redis = FakeRedis()
+        patcher = mock.patch("apps.analytics.quota.get_redis_connection", return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(quota_counter.reset)
+
+
+class DecodePayloadTests(TestCase):
+    def test_requires_site_id(self):
+        with self.assertRaises(InvalidBeacon):
+            decode_payload(b'{"url": "https://example.com/"}')
+
+    def test_rejects_invalid_json(self):
+        with self.assertRaises(InvalidBeacon):
+            decode_payload(b"{")
+
+    def test_coerces_screen_size(self):
+        data = decode_payload(b'{"site_id": "abc", "width": "1920", "height": 1080.0}')
+        self.assertEqual((data["width"], data["height"]), (1920, 1080))
+
+    def test_missing_screen_size_is_none(self):
+        data = decode_payload(b'{"site_id": "abc", "width": 0}')
+        self.assertEqual((data["width"], data["height"]), (None, None))
+
+    def test_rejects_invalid_screen_size(self):
+        for width in ('"abc"', "true", "-1", "1.5", "[1]"):
+            with self.subTest(width=width), self.assertRaises(InvalidBeacon):
+                decode_payload(f'{{"site_id": "abc", "width": {width}}}'.encode())
+
+    def test_rejects_invalid_strings(self):
+        for body in (
+            {"site_id": ["abc"]},
+            {"site_id": "abc", "url": 5},
+            {"site_id": "a" * 25},
+            {"site_id": "abc", "pf_id": {}},
+        ):
+            with self.subTest(body=body), self.assertRaises(InvalidBeacon):
+                decode_payload(json.dumps(body).encode())
+
+    def test_truncates_urls_and_user_agent(self):
+        long_url = "https://example.com/" + "a" * 300
+        data = decode_payload(
+            json.dumps({"site_id": "abc", "url": long_url, "referrer": long_url, "ua": "a" * 600}).encode()
+        )
+        self.assertEqual(data["url"], long_url[:200])
+        self.assertEqual(data["referrer"], long_url[:200])
+        self.assertEqual(len(data["ua"]), 512)
+
+
+class IngestTests(QuotaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.site = create_site()
+
+    def test_stores_page_view_and_visit(self):
+        page_view = ingest_beacon(beacon(self.site, pf_id="visitor", width=1280, height=720))
+        self.assertEqual(page_view.site, self.site)
+        self.assertEqual(page_view.screen_width, 1280)
+        self.assertEqual(page_view.visitor.pf_id, "visitor")
+        ingest_beacon(beacon(self.site, pf_id="visitor"))
+        self.assertEqual(list(Visit.objects.values_list("pageviews", flat=True)), [2])
+
+    def test_unknown_site(self):
+        with self.assertRaises(Site.DoesNotExist):
+            ingest_beacon(make_beacon({"site_id": "missing"}, "127.0.0.1"))
+
+    def test_failed_write_is_not_counted(self):
+        self.site.pageview_limit_override = 100
+        self.site.save()
+        with mock.patch.object(PageView, "save", side_effect=OperationalError("down")):
+            with self.assertRaises(OperationalError):
+                ingest_beacon(beacon(self.site))
+        ingest_beacon(beacon(self.site))
+        key = quota_counter.get_limit(self.site).key
+        self.assertEqual(quota_counter._counters[key][1], 1)
+
+    def test_collect_rejects_invalid_beacon(self):
+        response = self.client.post(
+            "/api/analytics/collect/",
+            json.dumps({"site_id": self.site.site_id, "width": "abc"}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(PageView.objects.exists())
+
+    def test_collect_keeps_beacons_with_long_urls(self):
+        response = self.client.post(
+            "/api/analytics/collect/",
+            json.dumps({"site_id": self.site.site_id, "url": "https://example.com/" + "a" * 300}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(PageView.objects.get().url), 200)
+
+    def test_collect_spools_when_database_is_down(self):
+        with (
+            mock.patch("apps.analytics.api.ingest_beacon", side_effect=OperationalError("down")),
+            mock.patch("apps.analytics.api.spool_beacon") as spool_beacon,
+        ):
+            response = self.client.post(
+                "/api/analytics/collect/",
+                json.dumps({"site_id": self.site.site_id, "url": "https://example.com/"}),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 202)
+        spool_beacon.assert_called_once()
+
+
+class QuotaTests(QuotaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.site = create_site()
+
+    def test_zero_override_is_a_limit(self):
+        self.site.pageview_limit_override = 0
+        self.site.save()
+        self.assertEqual(check_pageview_quota(self.site), QUOTA_DROP)
+
+    def test_counts_and_flushes_hits(self):
+        self.site.pageview_limit_override = 1000
+        self.site.save()
+        for _ in range(25):
+            self.assertEqual(check_pageview_quota(self.site), QUOTA_ALLOW)
+        key = quota_counter.get_limit(self.site).key
+        # The first 20 hits were flushed together, the rest are pending.
+        self.assertEqual(self.redis.values[key], 20)
+        self.assertEqual(quota_counter._counters[key][:2], [20, 5])
+
+    def test_drops_over_quota(self):
+        self.site.pageview_limit_override = 3
+        self.site.save()
+        outcomes = [check_pageview_quota(self.site) for _ in range(5)]
+        self.assertEqual(outcomes, [QUOTA_ALLOW] * 3 + [QUOTA_DROP] * 2)
+
+    def test_release(self):
+        self.site.pageview_limit_override = 1000
+        self.site.save()
+        for _ in range(3):
+            check_pageview_quota(self.site)
+        release_pageview_quota(self.site, 2)
+        key = quota_counter.get_limit(self.site).key
+        self.assertEqual(quota_counter._counters[key][1], 1)
+
+    def test_drops_counter_of_previous_period(self):
+        self.site.pageview_limit_override = 1000
+        self.site.save()
+        quota_counter._limits[self.site.pk] = (0, QuotaLimit("pf:quota:old", 1000, 1))
+        quota_counter._counters["pf:quota:old"] = [10, 0, 0]
+        quota_counter.get_limit(self.site)
+        self.assertNotIn("pf:quota:old", quota_counter._counters)
+
+
+class CollectorTests(TestCase):
+    def setUp(self):
+        from pingfox.collector import Collector
+
+        self.collector = Collector()
+        self.collector.snapshot.site_ids = {"known"}
+
+    def post(self, body):
+        async def receive():
+            return {"type": "http.request", "body": json.dumps(body).encode()}
+
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        async def handle():
+            scope = {
+                "type": "http",
+                "method": "POST",
+                "path": "/api/analytics/collect/",
+                "headers": [],
+                "client": ("127.0.0.1", 1234),
+            }
+            await self.collector(scope, receive, send)
+            self.collector._flusher.cancel()
+
+        asyncio.run(handle())
+        return messages[0]["status"]
+
+    def test_buffers_beacons_with_long_urls(self):
+        long_url = "https://example.com/" + "a" * 300
+        self.assertEqual(self.post({"site_id": "known", "url": long_url}), 202)
+        self.assertEqual([beacon["url"] for beacon in self.collector.buffer], [long_url[:200]])
+
+    def test_rejects_invalid_and_unknown_beacons(self):
+        self.assertEqual(self.post({"site_id": "known", "width": "abc"}), 400)
+        self.assertEqual(self.post({"site_id": "unknown"}), 404)
+        self.assertEqual(self.collector.buffer, [])
+
+    def test_spools_batches_when_the_broker_is_down(self):
+        beacons = [{"site_id": "known"}, {"site_id": "known"}]
+        with (
+            mock.patch.object(edge, "_send", side_effect=redis.ConnectionError),
+            mock.patch.object(edge, "spool_beacon") as spool_beacon,
+        ):
+            self.assertFalse(edge.forward_beacons(beacons))
+        self.assertEqual(spool_beacon.call_count, 2)
+
+
+class SpoolTests(QuotaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.site = create_site()
+        self.spool_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.spool_dir)
+        settings = override_settings(PINGFOX_SPOOL_DIR=self.spool_dir)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(spool.spool_writer.close)
+
+    def spool(self, *beacons):
+        for item in beacons:
+            spool.spool_beacon(item)
+        spool.spool_writer.close()
+
+    def files(self):
+        return sorted(name.split(".", 1)[1] for name in os.listdir(self.spool_dir))
+
+    def test_replay(self):
+        self.spool(beacon(self.site, pf_id="a"), beacon(self.site, pf_id="b"))
+        self.assertEqual(self.files(), ["ndjson"])
+        self.assertEqual(spool.replay_spool(), 2)
+        self.assertEqual(PageView.objects.filter(site=self.site).count(), 2)
+        self.assertEqual(self.files(), [])
+
+    def test_rejects_bad_beacons(self):
+        bad = beacon(self.site)
+        del bad["url"]
+        self.spool(beacon(self.site), bad, beacon(self.site))
+        self.assertEqual(spool.replay_spool(), 2)
+        self.assertEqual(self.files(), ["rejected"])
+        rejected = os.path.join(self.spool_dir, os.listdir(self.spool_dir)[0])
+        self.assertEqual(list(spool.read_segment(spool.Path(rejected))), [bad])
+
+    def test_keeps_segments_while_database_is_down(self):
+        self.spool(beacon(self.site))
+        with mock.patch.object(spool, "ingest_beacons", side_effect=OperationalError("down")):
+            self.assertEqual(spool.replay_spool(), 0)
+        self.assertEqual(self.files(), ["ndjson"])
+        self.assertEqual(spool.replay_spool(), 1)
+
+    def test_releases_segments_when_interrupted(self):
+        self.spool(beacon(self.site))
+        with mock.patch.object(spool, "ingest_beacons", side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                spool.replay_spool()
+        self.assertEqual(self.files(), ["ndjson"])
+
+    def test_takes_over_stale_claims(self):
+        line = json.dumps(beacon(self.site)) + "\n"
+        stale = int(time.time() - spool.CLAIM_TIMEOUT - 60)
+        with open(os.path.join(self.spool_dir, f"1-1.{stale}.replaying"), "w") as file:
+            file.write(line)
+        with open(os.path.join(self.spool_dir, f"1-2.{int(time.time())}.replaying"), "w") as file:
+            file.write(line)
+        claimed = spool.claim_segments()
+        self.assertEqual([path.name.split(".")[0] for path in claimed], ["1-1"])
+        for path in claimed:
+            spool.release_segment(path)
+
+
+class PageViewLogTests(TestCase):
+    def setUp(self):
+        self.site = create_site()
+        visitor = VisitorSession.objects.create(pf_id="visitor", user_agent="")
+        now = timezone.now()
+        # Pairs of page views share a timestamp, so pages split ties on the id.
+        PageView.objects.bulk_create(
+            PageView(
+                site=self.site,
+                visitor=visitor,
+                url="https://example.com/",
+                timestamp=now - timezone.timedelta(minutes=index // 2),
+            )
+            for index in range(25)
+        )
+        self.expected = list(
+            PageView.objects.filter(site=self.site).order_by("-timestamp", "-pk").values_list("pk", flat=True)
+        )
+
+    def test_walks_every_page(self):
+        seen = []
+        pages = []
+        cursor = None
+        while True:
+            rows, next_cursor, prev_cursor = get_page_view_log(self.site, cursor=cursor, per_page=10)
+            seen.extend(row.pk for row in rows)
+            pages.append((cursor, prev_cursor))
+            if next_cursor is None:
+                break
+            cursor = next_cursor
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(len(pages), 3)
+        self.assertIsNone(pages[0][1])
+
+    def test_previous_page(self):
+        _, next_cursor, _ = get_page_view_log(self.site, per_page=10)
+        rows, _, prev_cursor = get_page_view_log(self.site, cursor=next_cursor, per_page=10)
+        self.assertEqual([row.pk for row in rows], self.expected[10:20])
+        rows, next_cursor, prev_cursor = get_page_view_log(
+            self.site, cursor=prev_cursor, direction="prev", per_page=10
+        )
+        self.assertEqual([row.pk for row in rows], self.expected[:10])
+        self.assertIsNone(prev_cursor)
+        self.assertIsNotNone(next_cursor)
+
+    def test_invalid_cursor_starts_over(self):
+        self.assertIsNone(decode_log_cursor("not a cursor"))
+        rows, _, prev_cursor = get_page_view_log(self.site, cursor="not a cursor", per_page=10)
+        self.assertEqual([row.pk for row in rows], self.expected[:10])
+        self.assertIsNone(prev_cursor)
+
+
+class NormalizationTests(TestCase):
+    def setUp(self):
+        self.site = create_site()
+        self.visitor = VisitorSession.objects.create(pf_id="visitor", user_agent="")
+
+    def view(self, url, referrer="", normalized=True):
+        dimensions = get_url_dimensions(url, referrer) if normalized else {}
+        return PageView.objects.create(
+            site=self.site, visitor=self.visitor, url=url, referrer=referrer, **dimensions
+        )
+
+    def test_normalize_url(self):
+        self.assertEqual(
+            normalize_url("https://User@Example.COM.:8080/a?utm_source=x&id=1&gclid=y#top"),
+            ("example.com", "/a?id=1"),
+        )
+        self.assertEqual(normalize_url("https://example.com"), ("example.com", "/"))
+        self.assertEqual(normalize_url("/relative"), (None, None))
+
+    def test_top_pages_group_normalized_urls(self):
+        self.view("https://example.com/a?utm_source=x")
+        self.view("https://example.com/a")
+        self.view("https://example.com/b")
+        self.assertEqual(
+            get_top_pages(self.site),
+            [{"url": "example.com/a", "view_count": 2}, {"url": "example.com/b", "view_count": 1}],
+        )
+
+    def test_counts_rows_not_backfilled_yet(self):
+        self.view("https://example.com/a", "https://news.example.org/story")
+        self.view("https://example.com/b")
+        self.view("https://example.com/b?fbclid=1", "http://news.example.org/", normalized=False)
+        self.view("https://example.com/b", normalized=False)
+        expected_pages = [{"url": "example.com/b", "view_count": 3}, {"url": "example.com/a", "view_count": 1}]
+        expected_referrers = [{"referrer": "news.example.org", "count": 2}]
+        self.assertEqual(get_top_pages(self.site), expected_pages)
+        self.assertEqual(get_top_referrers(self.site), expected_referrers)
+        self.assertEqual(backfill_url_dimensions(), 2)
+        self.assertEqual(get_top_pages(self.site), expected_pages)
+        self.assertEqual(get_top_referrers(self.site), expected_referrers)
+
+
+class ImporterTests(TestCase):
+    def setUp(self):
+        self.site = create_site()
+
+    def import_ndjson(self, *lines):
+        return import_page_views(self.site, read_rows(io.StringIO("\n".join(lines)), "ndjson"))
+
+    def test_imports_csv(self):
+        export = (
+            "Timestamp,URL,Referrer,Visitor ID,Width\n"
+            "2026-01-02 10:00:00,/pricing/,https://news.example.org/a,visitor,1280\n"
+            "1767261600000,https://example.com/,,visitor,\n"
+        )
+        result = import_page_views(self.site, read_rows(io.StringIO(export), "csv"))
+        self.assertEqual(result, {"imported": 2, "skipped": 0})
+        views = PageView.objects.filter(site=self.site).order_by("timestamp")
+        self.assertEqual([view.url for view in views], ["https://example.com/", "https://example.com/pricing/"])
+        self.assertEqual(views[1].screen_width, 1280)
+        self.assertEqual(len({view.visitor_id for view in views}), 1)
+
+    def test_skips_bad_rows_and_keeps_going(self):
+        row = {"timestamp": "2026-01-02T10:00:00Z", "url": "/"}
+        result = self.import_ndjson(
+            json.dumps(row),
+            "{not json",
+            "[1, 2]",
+            json.dumps({**row, "url": "/" + "a" * 200}),
+            json.dumps({**row, "referrer": "https://example.org/" + "a" * 200}),
+            json.dumps({**row, "width": -1280}),
+            json.dumps({**row, "timestamp": "yesterday"}),
+            json.dumps(row),
+        )
+        self.assertEqual(result, {"imported": 2, "skipped": 6})
+        self.assertEqual(PageView.objects.filter(site=self.site).count(), 2)
+
+
+class RetentionTests(TestCase):
+    def setUp(self):
+        self.site = create_site()
+        self.team = self.site.team
+        self.team.refresh_from_db()
+        self.visitor = VisitorSession.objects.create(pf_id="visitor", user_agent="")
+        self.now = timezone.now()
+
+    def view(self, days_ago):
+        timestamp = self.now - timezone.timedelta(days=days_ago)
+        PageView.objects.create(site=self.site, visitor=self.visitor, url="https://example.com/", timestamp=timestamp)
+        Visit.objects.create(site=self.site, visitor=self.visitor, started_at=timestamp, last_seen_at=timestamp)
+        SiteDailyStats.objects.create(site=self.site, date=timestamp.date(), pageviews=1)
+
+    def test_retention_days_of_the_plan(self):
+        PlanFeature.objects.filter(plan=self.team.plan, key="data_retention_days").delete()
+        self.assertIsNone(get_retention_days(self.team.pk))
+        feature = PlanFeature.objects.create(plan=self.team.plan, key="data_retention_days", value="30")
+        self.assertEqual(get_retention_days(self.team.pk), 30)
+        feature.value = "0"
+        feature.save()
+        self.assertIsNone(get_retention_days(self.team.pk))
+
+    def test_prunes_rows_older_than_the_window(self):
+        self.view(40)
+        self.view(5)
+        with mock.patch("apps.analytics.retention.invalidate_site_analytics") as invalidate:
+            removed = prune_team_data(self.team.pk, 30, now=self.now)
+        self.assertEqual(removed, {"page_views": 1, "visits": 1, "form_submissions": 0, "daily_stats": 1})
+        invalidate.assert_called_once_with(self.site)
+        self.assertEqual(PageView.objects.count(), 1)
+        self.assertEqual(Visit.objects.count(), 1)
+        with mock.patch("apps.analytics.retention.invalidate_site_analytics") as invalidate:
+            prune_team_data(self.team.pk, 30, now=self.now)
+        invalidate.assert_not_called()
+
+    def test_prunes_only_idle_sessions_without_data(self):
+        self.view(5)
+        orphan = VisitorSession.objects.create(pf_id="orphan", user_agent="")
+        VisitorSession.objects.create(pf_id="other-orphan", user_agent="")
+        later = self.now + timezone.timedelta(days=2)
+        self.assertEqual(prune_orphaned_sessions(now=later), 2)
+        self.assertFalse(VisitorSession.objects.filter(pk=orphan.pk).exists())
+        self.assertTrue(VisitorSession.objects.filter(pk=self.visitor.pk).exists())
+        self.assertEqual(prune_orphaned_sessions(now=self.now), 0)
+
+
+class ChartCacheTests(TestCase):
+    def setUp(self):
+        self.site = create_site()
+        # Start from fresh keys: the cache outlives the test database.
+        invalidate_site_analytics(self.site)
+        self.visitor = VisitorSession.objects.create(pf_id="visitor", user_agent="")
+
+    def view(self, **delta):
+        PageView.objects.create(
+            site=self.site,
+            visitor=self.visitor,
+            url="https://example.com/",
+            timestamp=timezone.now() - timezone.timedelta(**delta),
+        )
+
+    def test_matches_the_uncached_chart(self):
+        self.view(hours=3)
+        self.view(days=2)
+        for range in ("daily", "hourly"):
+            with self.subTest(range=range):
+                data, etag = get_cached_site_analytics(self.site, range)
+                self.assertEqual(data, get_site_analytics(self.site, range))
+                self.assertTrue(etag.startswith('"'))
+
+    def test_served_from_cache_until_invalidated(self):
+        self.view(days=2)
+        data, etag = get_cached_site_analytics(self.site, "daily")
+        self.view(days=3)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_cached_site_analytics(self.site, "daily"), (data, etag))
+        invalidate_site_analytics(self.site)
+        new_data, new_etag = get_cached_site_analytics(self.site, "daily")
+        self.assertEqual(sum(row["count"] for row in new_data), 2)
+        self.assertNotEqual(new_etag, etag)
+
+    def test_chart_api_answers_not_modified(self):
+        def get(**headers):
+            request = APIRequestFactory().get(
+                "/api/analytics/chart-data/", {"site_id": self.site.site_id, "range": "hourly"}, **headers
+            )
+            force_authenticate(request, self.site.owner)
+            return AnalyticsChartDataAPI.as_view()(request)
+
+        response = get()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("max-age=300", response["Cache-Control"])
+        self.assertEqual(get(HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+
+class AllRangesTests(TestCase):
+    def setUp(self):
+        self.site = create_site(timezone="Asia/Kolkata")
+        visitor = VisitorSession.objects.create(pf_id="visitor", user_agent="")
+        now = timezone.now()
+        PageView.objects.bulk_create(
+            PageView(site=self.site, visitor=visitor, url="https://example.com/", timestamp=now - delta)
+            for delta in (
+                timezone.timedelta(seconds=5),
+                timezone.timedelta(minutes=30),
+                timezone.timedelta(hours=5),
+                timezone.timedelta(days=3),
+                timezone.timedelta(days=40),
+            )
+        )
+
+    def test_matches_each_range_counted_alone(self):
+        series = get_all_site_analytics(self.site)
+        for range, rows in series.items():
+            with self.subTest(range=range):
+                self.assertEqual(format_chart_rows(rows, range), get_site_analytics(self.site, range))
+
+    def test_counts_only_views_within_each_range(self):
+        series = get_all_site_analytics(self.site)
+        totals = {range: sum(count for _, count in rows) for range, rows in series.items()}
+        self.assertEqual(totals, {"daily": 4, "hourly": 3, "minute": 2})
+
+
+class TimezoneRollupTests(TestCase):
+    def setUp(self):
+        self.site = create_site(timezone="America/New_York")
+        self.tz = self.site.tzinfo
+        self.visitor = VisitorSession.objects.create(pf_id="visitor", user_agent="")
+
+    def view(self, timestamp):
+        PageView.objects.create(
+            site=self.site, visitor=self.visitor, url="https://example.com/", timestamp=timestamp
+        )
+
+    def test_days_follow_the_site_timezone(self):
+        # 02:00 UTC on March 2nd is still March 1st in New York.
+        self.view(datetime(2026, 3, 2, 2, tzinfo=dt_timezone.utc))
+        self.view(datetime(2026, 3, 2, 12, tzinfo=dt_timezone.utc))
+        start = local_midnight(date(2026, 3, 1), self.tz)
+        rows = count_views_by_bucket(self.site, "daily", start, local_midnight(date(2026, 3, 3), self.tz))
+        self.assertEqual(rows, [(start, 1), (local_midnight(date(2026, 3, 2), self.tz), 1)])
+
+    def test_days_stay_on_local_midnight_across_dst(self):
+        day = local_midnight(date(2026, 3, 7), self.tz)
+        self.assertEqual(shift_bucket("daily", day, 2), local_midnight(date(2026, 3, 9), self.tz))
+        hour = datetime(2026, 3, 8, 1, tzinfo=self.tz)
+        self.assertEqual(shift_bucket("hourly", hour).hour, 3)
+
+    def test_rollups_match_raw_counts(self):
+        for day, hour in ((1, 23), (3, 12), (3, 13)):
+            self.view(datetime(2026, 3, day, hour, tzinfo=self.tz))
+        start = local_midnight(date(2026, 3, 1), self.tz)
+        end = local_midnight(date(2026, 3, 5), self.tz)
+        raw = count_views_by_bucket(self.site, "daily", start, end)
+        self.assertEqual(rollup_site(self.site, now=datetime(2026, 3, 4, 12, tzinfo=self.tz)), 3)
+        stats = SiteDailyStats.objects.filter(site=self.site).order_by("date")
+        self.assertEqual(
+            list(stats.values_list("date", "pageviews")),
+            [(date(2026, 3, 1), 1), (date(2026, 3, 2), 0), (date(2026, 3, 3), 2)],
+        )
+        self.view(datetime(2026, 3, 4, 9, tzinfo=self.tz))
+        rows = [row for row in count_views_by_bucket(self.site, "daily", start, end) if row[1]]
+        self.assertEqual(rows, raw + [(local_midnight(date(2026, 3, 4), self.tz), 1)])
+
+
+class DashboardPanelTests(TransactionTestCase):
+    def setUp(self):
+        # Lookup ids are committed here, and the tables are flushed after each test.
+        for lookup in (hostname_ids, pathname_ids):
+            lookup.clear()
+            self.addCleanup(lookup.clear)
+        self.site = create_site()
+        invalidate_site_analytics(self.site)
+        visitor = VisitorSession.objects.create(pf_id="visitor", user_agent="")
+        for path in ("/", "/", "/about/"):
+            PageView.objects.create(
+                site=self.site,
+                visitor=visitor,
+                url=f"https://example.com{path}",
+                **get_url_dimensions(f"https://example.com{path}"),
+            )
+
+    def test_computes_missing_panels_concurrently(self):
+        self.assertEqual(dashboard.get_cached_panels(self.site), {})
+        panels = dashboard.get_dashboard(self.site)
+        self.assertEqual(set(panels), set(dashboard.PANELS))
+        self.assertEqual(panels["page_views"], 3)
+        self.assertEqual(panels["top_pages"][0], {"url": "example.com/", "view_count": 2})
+        self.assertEqual(dashboard.get_cached_panels(self.site), panels)
+
+    def test_panel_is_cached(self):
+        self.assertEqual(dashboard.get_panel(self.site, "visitors"), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(dashboard.get_panel(self.site, "visitors"), 1)
+        self.assertEqual(dashboard.get_cached_panels(self.site), {"visitors": 1})
+        invalidate_site_analytics(self.site)
+        self.assertEqual(dashboard.get_cached_panels(self.site), {})
+
+
+class LiveStatsTests(TestCase):
+    def test_publish_pageview(self):
+        connection = mock.MagicMock()
+        connection.pipeline.return_value.execute.return_value = [1, 0, 3, True, 7, True]
+        site = Site(pk=42)
+        with mock.patch.object(live, "get_redis_connection", return_value=connection):
+            live.publish_pageview(site, "visitor")
+        channel, data = connection.publish.call_args.args
+        self.assertEqual(channel, "pf:live:42")
+        self.assertEqual(
+            {key: value for key, value in json.loads(data).items() if key != "ts"},
+            {"active_visitors": 3, "pageviews_per_second": 7},
+        )
+
+    def test_publish_pageview_ignores_redis_errors(self):
+        with mock.patch.object(live, "get_redis_connection", side_effect=redis.ConnectionError):
+            live.publish_pageview(Site(pk=42), "visitor")
+
+    def test_slow_streams_only_get_the_latest_stats(self):
+        async def dispatch():
+            hub = live.LiveHub()
+            queue = asyncio.Queue(maxsize=1)
+            hub._queues["pf:live:1"].add(queue)
+            for data in (b"first", b"second"):
+                hub._dispatch({"channel": b"pf:live:1", "data": data})
+            return [queue.get_nowait() for _ in range(queue.qsize())]
+
+        self.assertEqual(asyncio.run(dispatch()), ["second"])
+
+    def test_stream_sends_current_stats_then_updates(self):
+        async def stream():
+            queue = asyncio.Queue()
+            queue.put_nowait('{"active_visitors": 2}')
+            hub = mock.Mock(
+                join=mock.AsyncMock(return_value=queue),
+                get_stats=mock.AsyncMock(return_value={"active_visitors": 1}),
+                leave=mock.AsyncMock(),
+            )
+            with mock.patch.object(live, "live_hub", hub), mock.patch.object(live, "MIN_PUSH_INTERVAL", 0):
+                events = live.stream_live_stats(Site(pk=42))
+                received = [await anext(events), await anext(events)]
+                await events.aclose()
+            hub.leave.assert_awaited_once_with(42, queue)
+            return received
+
+        self.assertEqual(
+            asyncio.run(stream()),
+            [
+                'event: stats\ndata: {"active_visitors": 1}\n\n',
+                'event: stats\ndata: {"active_visitors": 2}\n\n',
+            ],
+        )
+
+
+@override_settings(PINGFOX_VISIT_TIMEOUT=30)
+class VisitTests(TestCase):
+    def setUp(self):
+        self.site = create_site()
+        self.start = timezone.now() - timezone.timedelta(days=1)
+
+    def view(self, visitor, minutes, path="/"):
+        page_view = PageView.objects.create(
+            site=self.site,
+            visitor=VisitorSession.objects.get_or_create(pf_id=visitor, defaults={"user_agent": ""})[0],
+            url=f"https://example.com{path}",
+            timestamp=self.start + timezone.timedelta(minutes=minutes),
+        )
+        record_visit(page_view)
+        return page_view
+
+    def visits(self):
+        return list(
+            Visit.objects.filter(site=self.site)
+            .order_by("visitor__pf_id", "started_at")
+            .values_list("visitor__pf_id", "pageviews", "entry_url", "exit_url")
+        )
+
+    def test_views_within_the_timeout_extend_the_visit(self):
+        self.view("a", 0, "/")
+        self.view("a", 20, "/pricing/")
+        self.view("a", 60, "/blog/")
+        self.view("b", 5)
+        self.assertEqual(
+            self.visits(),
+            [
+                ("a", 2, "https://example.com/", "https://example.com/pricing/"),
+                ("a", 1, "https://example.com/blog/", "https://example.com/blog/"),
+                ("b", 1, "https://example.com/", "https://example.com/"),
+            ],
+        )
+        stats = get_visit_stats(self.site)
+        self.assertEqual((stats["visits"], stats["bounce_rate"]), (3, 66.7))
+        self.assertEqual(stats["avg_duration"], timezone.timedelta(minutes=20) / 3)
+
+    def test_rebuild_matches_recorded_visits(self):
+        for visitor, minutes in (("a", 0), ("a", 10), ("b", 15), ("a", 50), ("a", 70)):
+            self.view(visitor, minutes)
+        recorded = self.visits()
+        self.assertEqual(rebuild_visits(self.site), 3)
+        self.assertEqual(self.visits(), recorded)
+        # A partial rebuild keeps the visit that was still open at its start.
+        self.assertEqual(rebuild_visits(self.site, self.start + timezone.timedelta(minutes=60)), 1)
+        self.assertEqual(self.visits(), recorded)
+
+
+class DeviceTests(TestCase):
+    USER_AGENTS = {
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/126.0 Safari/537.36 Edg/126.0": (BROWSER_EDGE, OS_WINDOWS, DEVICE_DESKTOP),
+        "Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) "
+        "Version/17.5 Mobile/15E148 Safari/604.1": (BROWSER_SAFARI, OS_IOS, DEVICE_MOBILE),
+        "Mozilla/5.0 (Linux; Android 14; SM-X710) AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/126.0 Safari/537.36": (BROWSER_CHROME, OS_ANDROID, DEVICE_TABLET),
+        "Mozilla/5.0 (Macintosh; Intel Mac OS X 14_5) AppleWebKit/605.1.15 (KHTML, like Gecko) "
+        "Version/17.5 Safari/605.1.15": (BROWSER_SAFARI, OS_MACOS, DEVICE_DESKTOP),
+        "Mozilla/5.0 (X11; Linux x86_64) HeadlessChrome/126.0 Safari/537.36": (
+            BROWSER_CHROME,
+            OS_LINUX,
+            DEVICE_BOT,
+        ),
+        "": (BROWSER_UNKNOWN, OS_UNKNOWN, DEVICE_UNKNOWN),
+    }
+
+    def test_parse_user_agent(self):
+        for user_agent, expected in self.USER_AGENTS.items():
+            with self.subTest(user_agent=user_agent):
+                self.assertEqual(parse_user_agent(user_agent), expected)
+
+    def test_screen_class(self):
+        for width, expected in (
+            (None, SCREEN_UNKNOWN),
+            ("abc", SCREEN_UNKNOWN),
+            (375, SCREEN_SMALL),
+            (768, SCREEN_MEDIUM),
+            (1280, SCREEN_LARGE),
+            (2560, SCREEN_XLARGE),
+        ):
+            with self.subTest(width=width):
+                self.assertEqual(get_screen_class(width), expected)
+
+    def test_backfill(self):
+        user_agent, expected = next(iter(self.USER_AGENTS.items()))
+        VisitorSession.objects.bulk_create(
+            [VisitorSession(pf_id="old", user_agent=user_agent), VisitorSession(pf_id="empty", user_agent="")]
+        )
+        self.assertEqual(backfill_device_dimensions(), 1)
+        visitor = VisitorSession.objects.get(pf_id="old")
+        self.assertEqual((visitor.browser, visitor.os, visitor.device_type), expected)
+
+
+class GeoIPTests(TestCase):
+    def setUp(self):
+        self.reader = mock.Mock()
+        self.reader.get.return_value = {"country": {"iso_code": "DE"}, "subdivisions": [{"iso_code": "BE"}]}
+        patcher = mock.patch.object(geoip, "_reader", self.reader)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        geoip._lookup_network.cache_clear()
+        self.addCleanup(geoip._lookup_network.cache_clear)
+
+    def test_resolves_once_per_network(self):
+        self.assertEqual(geoip.get_location_dimensions("81.2.69.142"), {"country": "DE", "region": "BE"})
+        self.assertEqual(geoip.lookup_location("81.2.69.7"), ("DE", "BE"))
+        self.reader.get.assert_called_once_with(ipaddress.ip_address("81.2.69.0"))
+
+    def test_unknown_locations(self):
+        for ip in ("", "not an ip", "127.0.0.1", "192.168.1.10"):
+            with self.subTest(ip=ip):
+                self.assertEqual(geoip.lookup_location(ip), geoip.UNKNOWN_LOCATION)
+        self.reader.get.assert_not_called()
+        with mock.patch.object(geoip, "_reader", False):
+            self.assertEqual(geoip.lookup_location("81.2.69.142"), geoip.UNKNOWN_LOCATION)
+
+    def test_forwarded_for_is_only_trusted_behind_a_proxy(self):
+        with override_settings(PINGFOX_TRUST_X_FORWARDED_FOR=False):
+            self.assertEqual(geoip.resolve_client_ip("10.0.0.1", "81.2.69.142"), "10.0.0.1")
+        with override_settings(PINGFOX_TRUST_X_FORWARDED_FOR=True):
+            self.assertEqual(geoip.resolve_client_ip("10.0.0.1", "81.2.69.142, 10.0.0.2"), "81.2.69.142")
 
-# Create your tests here.
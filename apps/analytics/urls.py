@@ -8,7 +8,13 @@ urlpatterns = [
     path("edit/<str:site_id>/", views.edit_site, name="sites_edit"),
     path("delete/<str:site_id>/", views.delete_site, name="sites_delete"),
     path("details/<str:site_id>/", views.site_details, name="sites_details"),
+    path(
+        "details/<str:site_id>/panels/<str:panel>/",
+        views.site_panel,
+        name="sites_panel",
+    ),
     path("verify/<str:site_id>/", views.send_verification, name="sites_verify"),
     path("chart/<str:site_id>/", views.site_chart, name="sites_chart"),
+    path("live/<str:site_id>/", views.live_stats, name="sites_live"),
     path("download/<str:site_id>/", views.download_csv, name="sites_download_csv"),
 ]
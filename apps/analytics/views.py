@@ -1,24 +1,27 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from .services import get_site_analytics
-from django.core.paginator import Paginator
 from django.contrib import messages
 import csv, json
 from .models import PageView, VisitorSession, Site
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.db.models import F
+from django.conf import settings
+from django.http import Http404
 from apps.analytics.services import (
     get_site_analytics,
-    get_visitors,
-    get_page_views,
-    get_top_pages,
-    get_top_referrers,
-    get_pageviews_by_day,
+    get_page_view_log,
 )
 from apps.analytics.models import PageView
 from apps.accounts.utils import get_current_team
 from .forms import SiteCreationForm
 from apps.analytics.tasks import verify_site
+from apps.analytics.caching import get_cached_all_site_analytics
+from apps.analytics.rollups import reset_site_rollups
+from apps.analytics.live import stream_live_stats
+from apps.analytics.dashboard import PANELS, get_cached_panels, get_panel, submit_panels
+from apps.core.utils import lean_route
 
 
 @login_required
@@ -38,20 +41,35 @@ def site_chart(request, site_id):
     Render the analytics chart for a specific site.
     """
     site = get_object_or_404(Site, site_id=site_id, owner=request.user)
-    daily = get_site_analytics(site, "daily")
-    hourly = get_site_analytics(site, "hourly")
-    minute = get_site_analytics(site, "minute")
+    series = get_cached_all_site_analytics(site)
     return render(
         request,
         "analytics/partials/site_chart.html",
         {
-            "daily": daily,
-            "hourly": hourly,
-            "minute": minute,
+            "daily": series["daily"],
+            "hourly": series["hourly"],
+            "minute": series["minute"],
         },
     )
 
 
+@login_required
+async def live_stats(request, site_id):
+    """
+    Stream the live visitor stats of a site as server-sent events.
+    """
+    user = await request.auser()
+    site = await Site.objects.filter(site_id=site_id, owner=user).afirst()
+    if site is None:
+        raise Http404("Site not found.")
+    response = StreamingHttpResponse(
+        stream_live_stats(site), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 @login_required
 def download_csv(request, site_id):
     site = get_object_or_404(Site, site_id=site_id, owner=request.user)
@@ -87,16 +105,19 @@ def download_csv(request, site_id):
     return response
 
 
+@lean_route
 def serve_pf_js(request):
     """
     Serve the PingFox tracking script.
     """
-    site_url = request.build_absolute_uri("/")
+    collect_url = settings.PINGFOX_COLLECTOR_URL or request.build_absolute_uri(
+        reverse("collect_data")
+    )
     response = render(
         request,
         "analytics/pf.js",
         content_type="application/javascript",
-        context={"site_url": site_url},
+        context={"collect_url": collect_url},
     )
     response["Cache-Control"] = "no-cache"
     return response
@@ -153,6 +174,9 @@ def edit_site(request, site_id):
     form = SiteCreationForm(request.POST or None, instance=site)
     if request.method == "POST" and form.is_valid():
         form.save()
+        if "timezone" in form.changed_data:
+            # Rollups are per local day, so they have to be rebuilt.
+            reset_site_rollups(site)
         messages.success(request, "Site updated successfully!")
         return redirect("analytics:index")
 
@@ -186,30 +210,53 @@ def site_details(request, site_id):
 
     # Pagination
     per_page = request.GET.get("per_page", 10)
-    per_page = int(per_page) if str(per_page).isdigit() else 10
-    page_number = request.GET.get("page")
+    per_page = min(int(per_page), 100) if str(per_page).isdigit() and int(per_page) else 10
+    cursor = request.GET.get("cursor")
+    direction = request.GET.get("direction", "next")
 
-    # Data fetching
-    visitors = get_visitors(site)
-    page_views_qs = get_page_views(site)
-    top_pages = get_top_pages(site)
-    top_referrers = get_top_referrers(site)
-    chart_labels, chart_data = get_pageviews_by_day(site)
+    # Panels that are not cached yet are either loaded lazily by HTMX or
+    # computed in the dashboard pool while the page view log is fetched here.
+    cached = get_cached_panels(site)
+    missing = [name for name in PANELS if name not in cached]
+    futures = {} if settings.PINGFOX_DASHBOARD_LAZY_PANELS else submit_panels(site, missing)
 
-    paginator = Paginator(page_views_qs, per_page)
-    page_obj = paginator.get_page(page_number)
+    page_views, next_cursor, prev_cursor = get_page_view_log(
+        site, cursor=cursor, direction=direction, per_page=per_page
+    )
+
+    cached.update({name: future.result() for name, future in futures.items()})
+    panels = {
+        name: {
+            "name": name,
+            "template": panel["template"],
+            "loaded": name in cached,
+            "data": cached.get(name),
+        }
+        for name, panel in PANELS.items()
+    }
 
     context = {
         "site": site,
-        "visitors": visitors,
-        "page_views": page_obj,
-        "top_pages": top_pages,
-        "top_referrers": top_referrers,
+        "page_views": page_views,
+        "per_page": per_page,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+        "panels": panels,
         "active_tab": "analytics",
-        "page_number": page_number,
-        "paginator": paginator,
-        "page_obj": page_obj,
-        "chart_labels": json.dumps(chart_labels),
-        "chart_data": json.dumps(chart_data),
     }
     return render(request, "sites/details.html", context)
+
+
+@login_required
+def site_panel(request, site_id, panel):
+    """
+    Render a single dashboard panel, used by the lazily loaded placeholders.
+    """
+    site = get_object_or_404(Site, site_id=site_id, owner=request.user)
+    if panel not in PANELS:
+        raise Http404("Unknown panel.")
+    return render(
+        request,
+        PANELS[panel]["template"],
+        {"site": site, "data": get_panel(site, panel)},
+    )
@@ -0,0 +1,199 @@
+"""
+Sessionization of page views into visits.
+
+A visit is a run of page views by one visitor on one site where no two
+consecutive views are further apart than `PINGFOX_VISIT_TIMEOUT` minutes. The
+collector extends or opens a visit on every beacon; `rebuild_visits` replays
+raw page views for backfills, imports and retention changes.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.utils import timezone
+
+from apps.analytics.devices import get_screen_class
+from apps.analytics.models import PageView, Visit, VisitorSession
+
+
+def get_visit_timeout():
+    return timezone.timedelta(minutes=settings.PINGFOX_VISIT_TIMEOUT)
+
+
+def _new_visit(site, visitor, page_view):
+    return Visit(
+        site=site,
+        visitor_id=visitor.pk,
+        started_at=page_view.timestamp,
+        last_seen_at=page_view.timestamp,
+        pageviews=1,
+        entry_url=page_view.url,
+        exit_url=page_view.url,
+        referrer=page_view.referrer or None,
+        browser=visitor.browser,
+        os=visitor.os,
+        device_type=visitor.device_type,
+        screen_class=get_screen_class(page_view.screen_width),
+        country=page_view.country,
+    )
+
+
+def lock_visitors(visitor_ids):
+    """
+    Lock the rows of the given visitors until the end of the transaction, in
+    primary key order so concurrent batches cannot deadlock. Page views of a
+    locked visitor can still be inserted.
+    """
+    list(
+        VisitorSession.objects.select_for_update(no_key=True)
+        .filter(pk__in=visitor_ids)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+
+
+def record_visit(page_view):
+    """
+    Add `page_view` to the visitor's open visit on its site, or start a new
+    visit when the previous one timed out. The visitor is locked first, so
+    concurrent page views of one visitor cannot both start a visit.
+    """
+    with transaction.atomic():
+        lock_visitors([page_view.visitor_id])
+        extended = Visit.objects.filter(
+            site_id=page_view.site_id,
+            visitor_id=page_view.visitor_id,
+            last_seen_at__gte=page_view.timestamp - get_visit_timeout(),
+            last_seen_at__lte=page_view.timestamp,
+        ).update(
+            pageviews=F("pageviews") + 1,
+            last_seen_at=page_view.timestamp,
+            exit_url=page_view.url,
+        )
+        if not extended:
+            _new_visit(page_view.site, page_view.visitor, page_view).save()
+
+
+def _build_visits(site, page_views, timeout):
+    """
+    Group page views ordered by visitor and time into unsaved visits.
+    """
+    visit = None
+    for view in page_views:
+        if (
+            visit is not None
+            and visit.visitor_id == view.visitor_id
+            and view.timestamp - visit.last_seen_at <= timeout
+        ):
+            visit.pageviews += 1
+            visit.last_seen_at = view.timestamp
+            visit.exit_url = view.url
+            continue
+        if visit is not None:
+            yield visit
+        visit = _new_visit(site, view.visitor, view)
+    if visit is not None:
+        yield visit
+
+
+def rebuild_visits(site, start=None, batch_size=1000):
+    """
+    Recompute the visits of `site` from its page views since `start` (all of
+    them by default). Visits still open at `start` are rebuilt as a whole, so
+    the window never splits a visit in two. Returns the number of visits written.
+    """
+    timeout = get_visit_timeout()
+    visits = Visit.objects.filter(site=site)
+    if start is not None:
+        open_start = (
+            visits.filter(last_seen_at__gte=start - timeout, started_at__lt=start)
+            .order_by("started_at")
+            .values_list("started_at", flat=True)
+            .first()
+        )
+        start = min(start, open_start) if open_start else start
+        visits = visits.filter(started_at__gte=start)
+
+    page_views = (
+        PageView.objects.filter(site=site)
+        .select_related("visitor")
+        .only(
+            "visitor_id",
+            "timestamp",
+            "url",
+            "referrer",
+            "screen_width",
+            "country",
+            "visitor__browser",
+            "visitor__os",
+            "visitor__device_type",
+        )
+        .order_by("visitor_id", "timestamp", "id")
+    )
+    if start is not None:
+        page_views = page_views.filter(timestamp__gte=start)
+
+    with transaction.atomic():
+        visits.delete()
+        total = 0
+        batch = []
+        for visit in _build_visits(site, page_views.iterator(chunk_size=batch_size), timeout):
+            batch.append(visit)
+            if len(batch) >= batch_size:
+                Visit.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        Visit.objects.bulk_create(batch)
+        total += len(batch)
+    return total
+
+
+def get_visit_stats(site, start=None):
+    """
+    Return the number of visits, the bounce rate (percentage of single page
+    visits) and the average visit duration of `site` since `start`.
+    """
+    visits = Visit.objects.filter(site=site)
+    if start is not None:
+        visits = visits.filter(started_at__gte=start)
+    stats = visits.aggregate(
+        visits=Count("id"),
+        bounces=Count("id", filter=Q(pageviews=1)),
+        pageviews=Sum("pageviews"),
+        duration=Avg(
+            ExpressionWrapper(F("last_seen_at") - F("started_at"), output_field=DurationField())
+        ),
+    )
+    count = stats["visits"]
+    return {
+        "visits": count,
+        "bounce_rate": round(stats["bounces"] * 100 / count, 1) if count else 0,
+        "pages_per_visit": round(stats["pageviews"] / count, 1) if count else 0,
+        "avg_duration": stats["duration"] or timezone.timedelta(),
+    }
+
+
+# Visit fields that can be broken down, in dashboard order.
+BREAKDOWN_FIELDS = ["country", "device_type", "browser", "os", "screen_class"]
+
+
+def get_visit_breakdown(site, field, start=None):
+    """
+    Return `[{"label", "count"}]` visits of `site` per value of the device
+    dimension `field`, most common first.
+    """
+    visits = Visit.objects.filter(site=site)
+    if start is not None:
+        visits = visits.filter(started_at__gte=start)
+    labels = dict(Visit._meta.get_field(field).choices or [])
+    return [
+        {"label": labels.get(row[field], row[field]), "count": row["count"]}
+        for row in visits.values(field).annotate(count=Count("id")).order_by("-count")
+    ]
+
+
+def get_device_breakdowns(site, start=None):
+    """
+    Return the visit breakdowns of `site` for every device dimension.
+    """
+    return {field: get_visit_breakdown(site, field, start) for field in BREAKDOWN_FIELDS}
@@ -0,0 +1,109 @@
+"""
+Cached catalog of the active pricing plans.
+
+Pricing is shown on many pages but changes rarely, so the active plans are
+read once with their features, stored in the cache, and handed to templates
+as immutable `PlanInfo` objects. Each process also keeps the catalog it last
+built, so rendering a page costs a single cache lookup of the version and no
+query. Saving or deleting a `Plan` or `PlanFeature` bumps the version. A
+process re-reads the plans after `LOCAL_TTL` seconds even when the version did
+not change, so a bump that never reaches it (with a per-process cache) only
+delays the update.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from types import MappingProxyType
+
+from django.core.cache import cache
+
+from apps.billing.models import Plan
+
+
+CATALOG_VERSION_KEY = "billing:plans:version"
+# Entries are versioned, so this only bounds how long old versions are kept.
+CATALOG_TTL = 24 * 60 * 60
+# Seconds a process keeps its catalog before reading the plans again.
+LOCAL_TTL = 60
+
+_local = None
+_local_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class PlanInfo:
+    """
+    Read-only view of an active plan and its features.
+    """
+
+    id: int
+    name: str
+    slug: str
+    price: Decimal
+    description: str
+    visible: bool
+    highlighted: bool
+    ranking: int
+    is_base_plan: bool
+    features: MappingProxyType
+
+    def get_feature(self, key, default=None):
+        return self.features.get(key, default)
+
+    @property
+    def is_pro(self):
+        return self.get_feature("is_pro", False) == "true"
+
+
+def invalidate_plan_catalog():
+    """
+    Make every process rebuild the catalog on its next use.
+    """
+    cache.set(CATALOG_VERSION_KEY, cache.get(CATALOG_VERSION_KEY, 0) + 1, None)
+
+
+def _load_rows():
+    plans = Plan.objects.filter(is_active=True).prefetch_related("features").order_by("ranking", "name")
+    return [
+        {
+            "id": plan.id,
+            "name": plan.name,
+            "slug": plan.slug,
+            "price": plan.price,
+            "description": plan.description,
+            "visible": plan.visible,
+            "highlighted": plan.highlighted,
+            "ranking": plan.ranking,
+            "is_base_plan": plan.is_base_plan,
+            "features": {feature.key: feature.value for feature in plan.features.all()},
+        }
+        for plan in plans
+    ]
+
+
+def get_plan_catalog():
+    """
+    Return the active plans, ordered for display, as a tuple of `PlanInfo`.
+    """
+    global _local
+    version = cache.get(CATALOG_VERSION_KEY, 0)
+    now = time.monotonic()
+    local = _local
+    if local is not None and local[0] == version and local[1] > now:
+        return local[2]
+
+    with _local_lock:
+        key = f"billing:plans:{version}"
+        # An expired catalog of the same version is re-read from the database;
+        # the cached rows may be just as old.
+        rows = cache.get(key) if local is None or local[0] != version else None
+        if rows is None:
+            rows = _load_rows()
+            cache.set(key, rows, CATALOG_TTL)
+        plans = tuple(
+            PlanInfo(**{**row, "features": MappingProxyType(row["features"])}) for row in rows
+        )
+        _local = (version, now + LOCAL_TTL, plans)
+    return plans
@@ -1,10 +1,10 @@
-from .models import Plan
+from .catalog import get_plan_catalog
 
 def pricing_plans(request):
     """
     Context processor to add active pricing plans to the context.
+    The plans come from the cached catalog and are read-only.
     """
-    active_plans = Plan.objects.filter(is_active=True).order_by('ranking', 'name')
     return {
-        'active_pricing_plans': active_plans
-    }
\ No newline at end of file
+        'active_pricing_plans': get_plan_catalog()
+    }
@@ -1,9 +1,13 @@
+from django.db import transaction
 from django.dispatch import receiver
-from django.db.models.signals import post_migrate, post_save
+from django.db.models.signals import post_delete, post_migrate, post_save
 
 
+from apps.billing.catalog import invalidate_plan_catalog
 from apps.billing.models import Plan, PlanFeature, RedeemCode, CodeRedemption
 from apps.billing.seed import BASE_FREE_PLAN, DEFAULT_FEATURES
+from apps.hooks.models import WebhookEvent
+from apps.hooks.routing import publish_event
 
 
 @receiver(post_migrate)
@@ -13,6 +17,17 @@ def create_base_free_plan(sender, **kwargs):
         PlanFeature.objects.get_or_create(plan=plan, key=key, defaults={"value": value})
 
 
+@receiver(post_save, sender=Plan)
+@receiver(post_delete, sender=Plan)
+@receiver(post_save, sender=PlanFeature)
+@receiver(post_delete, sender=PlanFeature)
+def refresh_plan_catalog(sender, **kwargs):
+    """
+    Rebuild the cached pricing catalog after any plan or feature change.
+    """
+    transaction.on_commit(invalidate_plan_catalog)
+
+
 @receiver(post_save, sender=CodeRedemption)
 def update_redeem_code(sender, instance, created, **kwargs):
     """
@@ -29,3 +44,8 @@ def update_redeem_code(sender, instance, created, **kwargs):
             redeem_code.is_active = False
         instance.team.save()
         redeem_code.save()
+        publish_event(
+            WebhookEvent.TEAM_PLAN_CHANGED,
+            instance.team_id,
+            {"plan": redeem_code.plan.slug, "plan_name": redeem_code.plan.name},
+        )
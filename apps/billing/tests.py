@@ -1,3 +1,50 @@
+from unittest import mock
+
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from apps.billing import catalog
+from apps.billing.catalog import CATALOG_VERSION_KEY, get_plan_catalog, invalidate_plan_catalog
+from apps.billing.models import Plan
+
+
+class PlanCatalogTests(TestCase):
+    def setUp(self):
+        catalog._local = None
+        self.addCleanup(setattr, catalog, "_local", None)
+
+    def slugs(self):
+        return [plan.slug for plan in get_plan_catalog()]
+
+    def test_lists_active_plans_by_ranking(self):
+        Plan.objects.create(name="Zeta", slug="zeta", ranking=2)
+        Plan.objects.create(name="Alpha", slug="alpha", ranking=1)
+        Plan.objects.create(name="Retired", slug="retired", ranking=0, is_active=False)
+        invalidate_plan_catalog()
+        slugs = self.slugs()
+        self.assertLess(slugs.index("alpha"), slugs.index("zeta"))
+        self.assertNotIn("retired", slugs)
+
+    def test_reuses_the_catalog_of_the_same_version(self):
+        invalidate_plan_catalog()
+        plans = get_plan_catalog()
+        with self.assertNumQueries(0):
+            self.assertIs(get_plan_catalog(), plans)
+
+    def test_rebuilds_after_a_version_change(self):
+        invalidate_plan_catalog()
+        self.assertNotIn("team", self.slugs())
+        # Saving does not bump the version here: on_commit callbacks do not run.
+        Plan.objects.create(name="Team", slug="team")
+        self.assertNotIn("team", self.slugs())
+        # Another process bumped the version.
+        cache.set(CATALOG_VERSION_KEY, cache.get(CATALOG_VERSION_KEY, 0) + 1, None)
+        self.assertIn("team", self.slugs())
+
+    def test_rebuilds_without_a_version_change_after_the_ttl(self):
+        invalidate_plan_catalog()
+        self.assertNotIn("team", self.slugs())
+        Plan.objects.create(name="Team", slug="team")
+        later = catalog.time.monotonic() + catalog.LOCAL_TTL + 1
+        with mock.patch.object(catalog.time, "monotonic", return_value=later):
+            self.assertIn("team", self.slugs())
@@ -0,0 +1,34 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+
+class Command(BaseCommand):
+    help = "Enqueue the actors in PINGFOX_PERIODIC_TASKS at their configured intervals."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Enqueue every periodic task once and exit.",
+        )
+
+    def handle(self, *args, **options):
+        tasks = {
+            import_string(path): interval
+            for path, interval in settings.PINGFOX_PERIODIC_TASKS.items()
+        }
+        next_run = {actor: 0 for actor in tasks}
+
+        while True:
+            now = time.monotonic()
+            for actor, interval in tasks.items():
+                if next_run[actor] <= now:
+                    actor.send()
+                    next_run[actor] = now + interval
+                    self.stdout.write(f"Enqueued {actor.actor_name}")
+            if options["once"]:
+                return
+            time.sleep(max(1, min(next_run.values()) - time.monotonic()))
@@ -0,0 +1,122 @@
+from functools import lru_cache
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.core.handlers.base import BaseHandler
+from django.core.handlers.exception import convert_exception_to_response
+from django.urls import Resolver404, resolve
+from django.utils.module_loading import import_string
+
+
+LEAN_ROUTE_MIDDLEWARE = "apps.core.middleware.LeanRouteMiddleware"
+
+
+@lru_cache(maxsize=4096)
+def is_lean_path(path):
+    """
+    Whether `path` resolves to a view marked with `apps.core.utils.lean_route`.
+    """
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return False
+    return getattr(match.func, "lean_route", False)
+
+
+def get_lean_middleware():
+    """
+    The middleware that still runs for lean routes: everything listed after
+    the dispatcher, minus `LEAN_ROUTE_SKIPPED_MIDDLEWARE`.
+    """
+    middleware = list(settings.MIDDLEWARE)
+    following = middleware[middleware.index(LEAN_ROUTE_MIDDLEWARE) + 1 :]
+    return [path for path in following if path not in settings.LEAN_ROUTE_SKIPPED_MIDDLEWARE]
+
+
+class LeanHandler(BaseHandler):
+    """
+    Request handler running the reduced middleware chain of lean routes.
+    Built the same way as Django's own chain, from `get_lean_middleware()`.
+    """
+
+    def load_middleware(self, is_async=False):
+        self._view_middleware = []
+        self._template_response_middleware = []
+        self._exception_middleware = []
+
+        get_response = self._get_response_async if is_async else self._get_response
+        handler = convert_exception_to_response(get_response)
+        handler_is_async = is_async
+        for middleware_path in reversed(get_lean_middleware()):
+            middleware = import_string(middleware_path)
+            middleware_can_sync = getattr(middleware, "sync_capable", True)
+            middleware_can_async = getattr(middleware, "async_capable", False)
+            if not handler_is_async and middleware_can_sync:
+                middleware_is_async = False
+            else:
+                middleware_is_async = middleware_can_async
+            try:
+                adapted_handler = self.adapt_method_mode(
+                    middleware_is_async, handler, handler_is_async
+                )
+                mw_instance = middleware(adapted_handler)
+            except MiddlewareNotUsed:
+                continue
+            handler = adapted_handler
+            if mw_instance is None:
+                raise ImproperlyConfigured(f"Middleware factory {middleware_path} returned None.")
+
+            if hasattr(mw_instance, "process_view"):
+                self._view_middleware.insert(0, self.adapt_method_mode(is_async, mw_instance.process_view))
+            if hasattr(mw_instance, "process_template_response"):
+                self._template_response_middleware.append(
+                    self.adapt_method_mode(is_async, mw_instance.process_template_response)
+                )
+            if hasattr(mw_instance, "process_exception"):
+                self._exception_middleware.append(
+                    self.adapt_method_mode(False, mw_instance.process_exception)
+                )
+
+            handler = convert_exception_to_response(mw_instance)
+            handler_is_async = middleware_is_async
+
+        self._middleware_chain = self.adapt_method_mode(is_async, handler, handler_is_async)
+
+
+class LeanRouteMiddleware:
+    """
+    Router-level dispatcher for lean routes.
+
+    Listed first in `MIDDLEWARE`. Requests for views marked with `lean_route`
+    are handed to a separate chain without the session, authentication,
+    messages and activation middleware, so public high-volume endpoints never
+    load a session or a user. Every other request continues down the normal
+    chain. `request.user` is always anonymous on lean routes.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self.lean_handler = LeanHandler()
+        self.lean_handler.load_middleware(is_async=self.is_async)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if is_lean_path(request.path_info):
+            request.user = AnonymousUser()
+            return self.lean_handler._middleware_chain(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if is_lean_path(request.path_info):
+            request.user = AnonymousUser()
+            return await self.lean_handler._middleware_chain(request)
+        return await self.get_response(request)
@@ -1,3 +1,47 @@
+import json
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.contrib.sessions.backends.db import SessionStore
 from django.test import TestCase
 
-# Create your tests here.
+from apps.core.middleware import get_lean_middleware, is_lean_path
+
+
+class LeanRouteTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(username="user", password="password")
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = "django.contrib.auth.backends.ModelBackend"
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+
+    def test_lean_paths(self):
+        self.assertTrue(is_lean_path("/api/analytics/collect/"))
+        self.assertTrue(is_lean_path("/pf.js"))
+        self.assertFalse(is_lean_path("/api/analytics/chart-data/"))
+        self.assertFalse(is_lean_path("/no/such/page/"))
+
+    def test_lean_chain_skips_sessions_and_users(self):
+        middleware = get_lean_middleware()
+        self.assertNotIn("apps.core.middleware.LeanRouteMiddleware", middleware)
+        for path in settings.LEAN_ROUTE_SKIPPED_MIDDLEWARE:
+            self.assertNotIn(path, middleware)
+        self.assertIn("corsheaders.middleware.CorsMiddleware", middleware)
+
+    def test_lean_route_never_loads_the_session(self):
+        # An invalid beacon is answered before any query of the view itself.
+        with self.assertNumQueries(0):
+            response = self.client.post(
+                "/api/analytics/collect/", json.dumps({"width": 1}), content_type="application/json"
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+
+    async def test_async_dispatch(self):
+        response = await self.async_client.post(
+            "/api/analytics/collect/", json.dumps({"width": 1}), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
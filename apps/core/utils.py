@@ -1,3 +1,10 @@
+import redis
+from django.conf import settings
+
+
+_redis_connection = None
+
+
 def get_or_null(model, **kwargs):
     """
     Retrieve an object from the database or return None if it does not exist.
@@ -16,17 +23,35 @@ def get_or_null(model, **kwargs):
     
 
 
+# Headers that let any origin call the public collection endpoints.
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "POST, GET, OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type",
+}
+
+
 def cors_enabled(func):
     def wrapper(*args, **kwargs):
         response = func(*args, **kwargs)
-        response["Access-Control-Allow-Origin"] = "*"
-        response["Access-Control-Allow-Methods"] = "POST, GET, OPTIONS"
-        response["Access-Control-Allow-Headers"] = "Content-Type"
+        for header, value in CORS_HEADERS.items():
+            response[header] = value
         return response
 
     return wrapper
 
 
+def lean_route(view):
+    """
+    Mark a public, anonymous view as a lean route: it is dispatched without the
+    session, authentication, messages and activation middleware (see
+    `apps.core.middleware.LeanRouteMiddleware`), and `request.user` is always
+    anonymous. Apply it as the outermost decorator.
+    """
+    view.lean_route = True
+    return view
+
+
 def is_htmx(request):
     """
     Check if the request is an HTMX request.
@@ -37,4 +62,17 @@ def is_htmx(request):
     Returns:
         bool: True if the request is an HTMX request, False otherwise.
     """
-    return "HX-Request" in request.headers or "hx-request" in request.headers
\ No newline at end of file
+    return "HX-Request" in request.headers or "hx-request" in request.headers
+
+
+def get_redis_connection():
+    """
+    Return the shared Redis client for the configured REDIS_URL.
+
+    The client keeps its own connection pool, so it is created once per process
+    and reused by every caller.
+    """
+    global _redis_connection
+    if _redis_connection is None:
+        _redis_connection = redis.Redis.from_url(settings.REDIS_URL)
+    return _redis_connection
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0004_form_webhook_secret'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='formsubmission',
+            index=models.Index(fields=['form', 'submitted_at'], name='forms_forms_form_id_8bb17e_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0005_formsubmission_forms_forms_form_id_8bb17e_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='formsubmission',
+            name='submitted_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='The date and time when the form was submitted.', verbose_name='Submitted At'),
+        ),
+    ]
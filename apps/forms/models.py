@@ -5,6 +5,7 @@ import secrets
 from django_resized import ResizedImageField
 from colorfield.fields import ColorField
 from apps.accounts.models import Team
+from django.utils import timezone
 from django.utils.text import slugify
 from apps.analytics.models import VisitorSession
 
@@ -388,7 +389,7 @@ class FormSubmission(models.Model):
         help_text=_("The form to which this submission belongs."),
     )
     submitted_at = models.DateTimeField(
-        auto_now_add=True,
+        default=timezone.now,
         verbose_name=_("Submitted At"),
         help_text=_("The date and time when the form was submitted."),
     )
@@ -412,3 +413,6 @@ class FormSubmission(models.Model):
         verbose_name = _("Form Submission")
         verbose_name_plural = _("Form Submissions")
         ordering = ["-submitted_at"]
+        indexes = [
+            models.Index(fields=["form", "submitted_at"]),
+        ]
@@ -5,7 +5,7 @@ from apps.analytics.models import PageView, VisitorSession
 from apps.analytics.models import Site
 from django.conf import settings
 from apps.hooks.models import WebhookEvent
-from apps.hooks.tasks import deliver_webhook
+from apps.hooks.routing import Endpoint, publish_event
 
 @receiver(post_save, sender=Form)
 def create_form_analytics(sender, instance, created, **kwargs):
@@ -35,26 +35,39 @@ def delete_form_analytics(sender, instance, **kwargs):
     ).delete()
 
 
+@receiver(pre_delete, sender=Form)
+def create_form_deleted_webhook(sender, instance, **kwargs):
+    publish_event(
+        WebhookEvent.FORM_DELETED,
+        instance.team_id,
+        {"form_id": instance.id, "form_name": instance.name},
+    )
+
+
 @receiver(post_save, sender=FormSubmission)
 def create_form_submission_webhook(sender, instance, created, **kwargs):
+    """
+    Queue the webhooks of a new submission: the form's own webhook and the
+    team's subscriptions. They are written to the outbox in the submission's
+    transaction and published by the webhook relay after commit.
+    """
     if created:
-        if not instance.form.webhook_url or not instance.form.webhook_secret:
-            return
-        # Trigger a webhook event for the new form submission
-        event = WebhookEvent.objects.create(
-            type=WebhookEvent.FORM_SUBMITTED,
-            team_id=instance.form.team_id,
-            site_id=instance.form.site.site_id or None,
-            data={
-                "form_id": instance.form.id,
-                "form_name": instance.form.name,
+        form = instance.form
+        endpoints = []
+        if form.webhook_url and form.webhook_secret:
+            endpoints.append(Endpoint(form.webhook_url, form.webhook_secret))
+        # Forms without analytics have no site.
+        site = getattr(form, "site", None)
+        publish_event(
+            WebhookEvent.FORM_SUBMITTED,
+            form.team_id,
+            {
+                "form_id": form.id,
+                "form_name": form.name,
                 "submission_id": instance.id,
                 "submitted_at": instance.submitted_at.isoformat(),
                 "fields": instance.cleaned_data,
-            }
+            },
+            site_id=site.site_id if site else None,
+            endpoints=endpoints,
         )
-        deliver_webhook.send(
-            event.id,
-            webhook_url=instance.form.webhook_url,
-            secret=instance.form.webhook_secret
-        )
\ No newline at end of file
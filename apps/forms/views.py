@@ -7,6 +7,7 @@ from .forms import PingFoxFormCreatationForm, DynamicFormSchemaForm, FormStyleFo
 from django.contrib import messages
 from .models import Form, FormSubmission
 from django.views.decorators.http import require_POST
+from django.db import transaction
 import json
 from django.http import HttpResponseBadRequest, JsonResponse, HttpResponse
 from django.contrib import messages
@@ -18,6 +19,7 @@ from apps.forms.utils import (
 )
 
 from apps.accounts.utils import get_current_team
+from apps.core.utils import lean_route
 
 
 @login_required
@@ -250,6 +252,7 @@ def save_form_schema_view(request, slug):
         return HttpResponseBadRequest(f"Error saving schema: {str(e)}")
 
 
+@lean_route
 def form_public_view(request, slug):
     """
     Render a public view of the form.
@@ -271,7 +274,7 @@ def form_public_view(request, slug):
 
 @require_POST
 def form_submit_view(request, slug):
-    form_obj = get_object_or_404(Form, slug=slug)
+    form_obj = get_object_or_404(Form.objects.select_related("site"), slug=slug)
     pf_id = get_pf_id(request)
     if not form_obj.is_active:
         return HttpResponseBadRequest("This form is not active or does not exist.")
@@ -288,20 +291,22 @@ def form_submit_view(request, slug):
     form_class = create_form_from_form_model(form_obj)
     form = form_class(request.POST)
     if form.is_valid():
-        FormSubmission.objects.create(
-            form=form_obj,
-            data=form.cleaned_data,
-        )
-        # Lock the form to prevent further submissions
-        form_obj.is_locked = True
-        form_obj.save()
-
-        # Add the visitor to the form's visitors
-        visitor, created = VisitorSession.objects.get_or_create(
-            pf_id=pf_id,
-            defaults={"user_agent": request.META.get("HTTP_USER_AGENT", "")},
-        )
-        form_obj.visitors.add(visitor)
+        # The submission and its webhook outbox entry are committed together.
+        with transaction.atomic():
+            FormSubmission.objects.create(
+                form=form_obj,
+                data=form.cleaned_data,
+            )
+            # Lock the form to prevent further submissions
+            form_obj.is_locked = True
+            form_obj.save()
+
+            # Add the visitor to the form's visitors
+            visitor, created = VisitorSession.objects.get_or_create(
+                pf_id=pf_id,
+                defaults={"user_agent": request.META.get("HTTP_USER_AGENT", "")},
+            )
+            form_obj.visitors.add(visitor)
 
         if form_obj.redirect_url:
             return redirect(form_obj.redirect_url)
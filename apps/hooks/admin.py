@@ -1,7 +1,56 @@
 from django.contrib import admin
-from .models import WebhookEvent
+from django.db.models import Avg, Count, Max, Q, Sum
+from .models import WebhookDelivery, WebhookEvent, WebhookOutbox, WebhookSubscription
 
 
 @admin.register(WebhookEvent)
 class WebhookEventAdmin(admin.ModelAdmin):
-    pass
\ No newline at end of file
+    pass
+
+
+@admin.register(WebhookDelivery)
+class WebhookDeliveryAdmin(admin.ModelAdmin):
+    """
+    Delivery attempts, with a per-host summary of the filtered attempts above
+    the list.
+    """
+
+    list_display = ("event", "host", "status_code", "status_class", "total_ms", "ttfb_ms", "payload_size", "attempted_at")
+    list_filter = ("status_class", "host", "attempted_at")
+    list_select_related = ("event",)
+    date_hierarchy = "attempted_at"
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        try:
+            queryset = response.context_data["cl"].queryset
+        except (AttributeError, KeyError):
+            # Redirects and error pages have no changelist.
+            return response
+        response.context_data["summary"] = (
+            queryset.order_by()
+            .values("host")
+            .annotate(
+                attempts=Count("id"),
+                failures=Count("id", filter=~Q(status_class=WebhookDelivery.SUCCESS)),
+                avg_total_ms=Avg("total_ms"),
+                max_total_ms=Max("total_ms"),
+                avg_ttfb_ms=Avg("ttfb_ms"),
+                avg_connect_ms=Avg("connect_ms"),
+                payload_bytes=Sum("payload_size"),
+            )
+            .order_by("-attempts")
+        )
+        return response
+
+
+@admin.register(WebhookSubscription)
+class WebhookSubscriptionAdmin(admin.ModelAdmin):
+    list_display = ("team", "event_type", "url", "is_active", "created_at")
+    list_filter = ("event_type", "is_active")
+
+
+@admin.register(WebhookOutbox)
+class WebhookOutboxAdmin(admin.ModelAdmin):
+    list_display = ("event", "webhook_url", "created_at")
+    exclude = ("secret",)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class HooksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.hooks'
+
+    def ready(self):
+        import apps.hooks.signals  # noqa: F401
@@ -0,0 +1,195 @@
+"""
+Benchmark helpers for webhook delivery.
+
+`Receiver` is a local webhook endpoint with configurable latency, error rate
+and slow-drip responses that verifies signatures and counts what it receives.
+`generate_webhook_events` queues signed events for a set of endpoints the way
+`publish_event` does, in bulk. `DeliveryTimer` measures how long worker
+threads spend in `deliver_webhook`. The `benchmark_webhooks` management
+command builds on these helpers.
+"""
+
+import hashlib
+import hmac
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dramatiq.middleware import Middleware
+from django.utils import timezone
+
+from apps.hooks.models import WebhookEvent, WebhookOutbox
+from apps.hooks.utils import sign_event
+
+
+BATCH_SIZE = 1000
+# Chunks a slow-drip response body is sent in.
+DRIP_CHUNKS = 10
+
+
+class _ReceiverHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        receiver = self.server.receiver
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        expected = "sha256=" + hmac.new(receiver.secret.encode(), body, hashlib.sha256).hexdigest()
+        valid = hmac.compare_digest(self.headers.get("X-PingFox-Signature", ""), expected)
+        try:
+            event_id = json.loads(body)["id"]
+        except (ValueError, KeyError, TypeError):
+            event_id = None
+
+        with receiver.lock:
+            fail = receiver.random.random() < receiver.error_rate
+            latency = receiver.latency + receiver.random.uniform(0, receiver.jitter)
+        if latency:
+            time.sleep(latency)
+
+        status = 503 if fail else (200 if valid else 403)
+        reply = b'{"status": "ok"}' if status == 200 else b'{"status": "error"}'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        if receiver.drip:
+            # Trickle the body out to hold the connection open.
+            size = max(1, len(reply) // DRIP_CHUNKS)
+            for start in range(0, len(reply), size):
+                self.wfile.write(reply[start : start + size])
+                self.wfile.flush()
+                time.sleep(receiver.drip / DRIP_CHUNKS)
+        else:
+            self.wfile.write(reply)
+        receiver.record(event_id, status)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Receiver:
+    """
+    A local webhook endpoint on its own thread.
+
+    Each request waits `latency` plus up to `jitter` seconds, fails with a 503
+    with probability `error_rate` and, with `drip`, sends its response body in
+    small chunks over `drip` seconds. Requests with an invalid signature get a
+    403.
+    """
+
+    def __init__(self, secret, latency=0.0, jitter=0.0, error_rate=0.0, drip=0.0, seed=None):
+        self.secret = secret
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.drip = drip
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.statuses = Counter()
+        self.delivered = set()
+        self.duplicates = 0
+        self.server = None
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/webhook/"
+
+    def start(self, host="127.0.0.1", port=0):
+        self.server = ThreadingHTTPServer((host, port), _ReceiverHandler)
+        self.server.daemon_threads = True
+        self.server.receiver = self
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def record(self, event_id, status):
+        with self.lock:
+            self.statuses[status] += 1
+            if status == 200:
+                if event_id in self.delivered:
+                    self.duplicates += 1
+                self.delivered.add(event_id)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "url": self.url,
+                "requests": sum(self.statuses.values()),
+                "responses": {str(status): count for status, count in sorted(self.statuses.items())},
+                "delivered": len(self.delivered),
+                "duplicates": self.duplicates,
+            }
+
+
+def generate_webhook_events(team_id, endpoints, count, marker=None, batch_size=BATCH_SIZE):
+    """
+    Create `count` signed `form.submitted` events spread round-robin over the
+    `apps.hooks.routing.Endpoint`s and queue them in the outbox. The events
+    get `marker` as their site ID so a run can find and delete them. Returns
+    the marker.
+    """
+    marker = marker or f"bench:{uuid.uuid4().hex[:12]}"
+    timestamp = timezone.now()
+    for start in range(0, count, batch_size):
+        events = []
+        outbox = []
+        for index in range(start, min(start + batch_size, count)):
+            endpoint = endpoints[index % len(endpoints)]
+            event = WebhookEvent(
+                type=WebhookEvent.FORM_SUBMITTED,
+                timestamp=timestamp,
+                team_id=str(team_id),
+                site_id=marker,
+                data={
+                    "form_id": 0,
+                    "form_name": "Benchmark",
+                    "submission_id": index,
+                    "submitted_at": timestamp.isoformat(),
+                    "fields": {"name": f"Visitor {index}", "email": f"visitor{index}@example.com"},
+                },
+            )
+            sign_event(event, endpoint.secret)
+            events.append(event)
+            outbox.append(WebhookOutbox(event=event, webhook_url=endpoint.url, secret=endpoint.secret))
+        WebhookEvent.objects.bulk_create(events)
+        WebhookOutbox.objects.bulk_create(outbox)
+    return marker
+
+
+class DeliveryTimer(Middleware):
+    """
+    Worker middleware adding up the time spent processing `actor_name`
+    messages, and counting them by outcome.
+    """
+
+    def __init__(self, actor_name="deliver_webhook"):
+        self.actor_name = actor_name
+        self.lock = threading.Lock()
+        self.started = {}
+        self.busy = 0.0
+        self.outcomes = Counter()
+
+    def before_process_message(self, broker, message):
+        if message.actor_name == self.actor_name:
+            self.started[message.message_id] = time.perf_counter()
+
+    def after_process_message(self, broker, message, *, result=None, exception=None):
+        started = self.started.pop(message.message_id, None)
+        if started is None:
+            return
+        with self.lock:
+            self.busy += time.perf_counter() - started
+            self.outcomes["failed" if exception is not None else "succeeded"] += 1
+
+    after_skip_message = after_process_message
@@ -0,0 +1,154 @@
+"""
+Timed HTTP delivery of webhooks.
+
+Requests go through a per-thread `requests.Session` whose connections record
+when DNS resolution, connecting (TCP and TLS) and the response headers
+finished, so each attempt can be broken down like curl's `-w` timings. The
+session keeps connections to an endpoint alive between deliveries; attempts
+on a reused connection have no DNS or connect timing.
+"""
+
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+_local = threading.local()
+
+
+def _mark(phase, value):
+    timings = getattr(_local, "timings", None)
+    if timings is not None:
+        timings[phase] = value
+
+
+class _TimedConnectionMixin:
+    def _new_conn(self):
+        # Resolve separately to time DNS, then connect to the resolved address.
+        dns_host = self._dns_host
+        start = time.perf_counter()
+        try:
+            address = socket.getaddrinfo(dns_host, self.port, 0, socket.SOCK_STREAM)[0][4][0]
+        except socket.gaierror:
+            # Let urllib3 resolve again and raise its own error.
+            address = None
+        _mark("dns", time.perf_counter() - start)
+        if address is not None:
+            self._dns_host = address
+        try:
+            return super()._new_conn()
+        finally:
+            self._dns_host = dns_host
+
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _mark("connect", time.perf_counter() - start)
+
+    def getresponse(self):
+        response = super().getresponse()
+        _mark("headers_at", time.perf_counter())
+        return response
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedAdapter(HTTPAdapter):
+    """
+    Transport adapter whose connections record their timings.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+def _get_session():
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = TimedAdapter()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _local.session = session
+    return session
+
+
+@dataclass
+class DeliveryAttempt:
+    """
+    Outcome and timings, in seconds, of one webhook request. `dns` and
+    `connect` are None when an open connection was reused, `ttfb` is None
+    when no response arrived.
+    """
+
+    host: str
+    payload_size: int
+    status_code: int = None
+    response_text: str = ""
+    error: str = ""
+    dns: float = None
+    connect: float = None
+    ttfb: float = None
+    total: float = 0.0
+
+    @property
+    def status_class(self):
+        if self.status_code is None:
+            return "error"
+        return f"{self.status_code // 100}xx"
+
+    @property
+    def delivered(self):
+        return self.status_code is not None and self.status_code < 400
+
+
+def post_webhook(url, payload, headers, timeout=5):
+    """
+    POST `payload` to `url` and return a `DeliveryAttempt`. Never raises for
+    network or HTTP errors; they are reported in the attempt.
+    """
+    attempt = DeliveryAttempt(host=urlsplit(url).hostname or "", payload_size=len(payload))
+    _local.timings = timings = {}
+    start = time.perf_counter()
+    try:
+        response = _get_session().post(url, data=payload, headers=headers, timeout=timeout)
+        attempt.status_code = response.status_code
+        attempt.response_text = response.text[:200]
+    except Exception as e:
+        attempt.error = str(e)
+    finally:
+        attempt.total = time.perf_counter() - start
+        _local.timings = None
+
+    attempt.dns = timings.get("dns")
+    if "connect" in timings:
+        # The connect phase of urllib3 includes the DNS lookup.
+        attempt.connect = timings["connect"] - (attempt.dns or 0)
+    if "headers_at" in timings:
+        attempt.ttfb = timings["headers_at"] - start
+    return attempt
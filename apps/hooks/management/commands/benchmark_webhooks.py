@@ -0,0 +1,239 @@
+import json
+import secrets
+import time
+from collections import Counter
+
+import dramatiq
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils import timezone
+from dramatiq import Worker
+
+from apps.accounts.models import Team
+from apps.analytics.benchmarks import format_table, summarize
+from apps.hooks.benchmarks import DeliveryTimer, Receiver, generate_webhook_events
+from apps.hooks.models import WebhookDelivery, WebhookEvent, WebhookOutbox
+from apps.hooks.outbox import relay_outbox
+from apps.hooks.routing import Endpoint
+from apps.hooks.tasks import RETRY_STATUS_CODES, deliver_webhook
+
+
+class Command(BaseCommand):
+    help = (
+        "Deliver generated webhook events to local receivers and report throughput, "
+        "latency, retries and worker utilization. Events go through the outbox relay "
+        "and the configured broker to an in-process worker; run it against a "
+        "development database and broker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--events", type=int, default=5000, help="Number of events to deliver.")
+        parser.add_argument("--receivers", type=int, default=2, help="Number of local receivers.")
+        parser.add_argument("--latency", type=float, default=20, help="Receiver latency in milliseconds.")
+        parser.add_argument(
+            "--jitter",
+            type=float,
+            default=0,
+            help="Random extra receiver latency of up to this many milliseconds.",
+        )
+        parser.add_argument(
+            "--error-rate",
+            type=float,
+            default=0.0,
+            help="Fraction of requests the receivers answer with a 503.",
+        )
+        parser.add_argument(
+            "--drip",
+            type=float,
+            default=0,
+            help="Milliseconds over which receivers trickle out each response body.",
+        )
+        parser.add_argument("--threads", type=int, default=8, help="Worker threads delivering webhooks.")
+        parser.add_argument("--max-retries", type=int, default=3, help="Retries per delivery.")
+        parser.add_argument(
+            "--min-backoff",
+            type=int,
+            default=100,
+            help="Milliseconds before the first retry; doubles on every retry.",
+        )
+        parser.add_argument("--max-backoff", type=int, default=2000, help="Longest retry delay in milliseconds.")
+        parser.add_argument("--timeout", type=float, default=600, help="Seconds to wait for the deliveries.")
+        parser.add_argument("--team", type=int, help="Team the events belong to. Defaults to the first team.")
+        parser.add_argument("--seed", type=int, help="Seed for reproducible receiver errors and latency.")
+        parser.add_argument("--keep", action="store_true", help="Keep the generated events and delivery records.")
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Run even though the outbox holds deliveries; they are sent to their real URLs too.",
+        )
+        parser.add_argument("--json", help="Also write the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        team = Team.objects.filter(pk=options["team"]).first() if options["team"] else Team.objects.order_by("pk").first()
+        if team is None:
+            raise CommandError("No team found to create the events for.")
+        if options["events"] < 1 or options["receivers"] < 1 or options["threads"] < 1:
+            raise CommandError("--events, --receivers and --threads must be at least 1.")
+        pending = WebhookOutbox.objects.count()
+        if pending and not options["force"]:
+            raise CommandError(
+                f"The outbox holds {pending} delivery(ies), which the benchmark would send to "
+                "their real URLs. Relay or delete them first, or pass --force."
+            )
+
+        receivers = [
+            Receiver(
+                secrets.token_urlsafe(16),
+                latency=options["latency"] / 1000,
+                jitter=options["jitter"] / 1000,
+                error_rate=options["error_rate"],
+                drip=options["drip"] / 1000,
+                seed=None if options["seed"] is None else options["seed"] + index,
+            ).start()
+            for index in range(options["receivers"])
+        ]
+        endpoints = [Endpoint(receiver.url, receiver.secret) for receiver in receivers]
+
+        broker = dramatiq.get_broker()
+        timer = DeliveryTimer()
+        broker.add_middleware(timer)
+        # Deliveries have a queue of their own; the other queues of the broker
+        # belong to the running app.
+        worker = Worker(
+            broker,
+            queues={deliver_webhook.queue_name},
+            worker_threads=options["threads"],
+            worker_timeout=100,
+        )
+
+        started_at = timezone.now()
+        started = time.perf_counter()
+        marker = generate_webhook_events(team.pk, endpoints, options["events"])
+        generated = time.perf_counter()
+        events = WebhookEvent.objects.filter(site_id=marker)
+        try:
+            # Relay everything before the worker starts writing, so the relay's
+            # transactions never wait for the worker's (SQLite locks the whole
+            # database).
+            relay_outbox(
+                max_retries=options["max_retries"],
+                min_backoff=options["min_backoff"],
+                max_backoff=options["max_backoff"],
+            )
+            relayed = time.perf_counter()
+            worker.start()
+
+            # An event is finished once delivered, out of retries, or failed with
+            # a client error that is not retried.
+            retried_codes = "|".join(str(code) for code in RETRY_STATUS_CODES)
+            finished = (
+                Q(delivered=True)
+                | Q(delivery_attempts__gt=options["max_retries"])
+                | (
+                    Q(last_delivery_status__regex=r"^4\d\d: ")
+                    & ~Q(last_delivery_status__regex=rf"^({retried_codes}): ")
+                )
+            )
+            deadline = time.monotonic() + options["timeout"]
+            while events.filter(finished).count() < options["events"]:
+                if time.monotonic() > deadline:
+                    self.stderr.write(f"Timed out after {options['timeout']}s.")
+                    break
+                time.sleep(0.2)
+            elapsed = time.perf_counter() - relayed
+            worker.stop()
+
+            results = self.get_results(events, options, elapsed)
+            results["generate_seconds"] = round(generated - started, 3)
+            results["relay_seconds"] = round(relayed - generated, 3)
+            results["worker"] = {
+                "threads": options["threads"],
+                "busy_seconds": round(timer.busy, 3),
+                "utilization": round(timer.busy / (options["threads"] * elapsed), 3) if elapsed else 0,
+                "messages": dict(timer.outcomes),
+            }
+            results["receivers"] = [receiver.stats() for receiver in receivers]
+        finally:
+            worker.stop()
+            for receiver in receivers:
+                receiver.stop()
+            if not options["keep"]:
+                events.delete()
+        self.report(results)
+
+        if options["json"]:
+            with open(options["json"], "w") as file:
+                json.dump(
+                    {
+                        "started_at": started_at.isoformat(),
+                        "options": {
+                            key: options[key]
+                            for key in (
+                                "events",
+                                "receivers",
+                                "latency",
+                                "jitter",
+                                "error_rate",
+                                "drip",
+                                "threads",
+                                "max_retries",
+                                "min_backoff",
+                                "max_backoff",
+                                "seed",
+                            )
+                        },
+                        "broker": type(broker).__name__,
+                        "results": results,
+                    },
+                    file,
+                    indent=2,
+                )
+
+    def get_results(self, events, options, elapsed):
+        deliveries = WebhookDelivery.objects.filter(event__in=events)
+        attempts = list(deliveries.values_list("total_ms", "ttfb_ms", "status_class"))
+        attempts_per_event = Counter(events.values_list("delivery_attempts", flat=True))
+        delivered = events.filter(delivered=True).count()
+        return {
+            "events": options["events"],
+            "delivered": delivered,
+            "failed": options["events"] - delivered,
+            "elapsed_seconds": round(elapsed, 3),
+            "throughput": round(delivered / elapsed, 1) if elapsed else 0,
+            "attempts": len(attempts),
+            "retries": sum((count - 1) * total for count, total in attempts_per_event.items() if count > 1),
+            "attempts_per_event": {str(count): total for count, total in sorted(attempts_per_event.items())},
+            "status_classes": dict(Counter(status_class for _, _, status_class in attempts)),
+            "latency": {
+                "total": summarize([total for total, _, _ in attempts]),
+                "ttfb": summarize([ttfb for _, ttfb, _ in attempts if ttfb is not None]),
+            },
+        }
+
+    def report(self, results):
+        self.stdout.write(
+            f"Delivered {results['delivered']} of {results['events']} event(s) in "
+            f"{results['elapsed_seconds']:.1f}s ({results['throughput']}/s) with "
+            f"{results['attempts']} attempt(s) and {results['retries']} retry(ies)."
+        )
+        self.stdout.write(
+            format_table(
+                results["latency"],
+                ["count", "mean_ms", "p50_ms", "p99_ms", "max_ms"],
+            )
+        )
+        worker = results["worker"]
+        self.stdout.write(
+            f"Worker: {worker['threads']} thread(s), {worker['utilization']:.0%} busy, "
+            f"messages {worker['messages']}."
+        )
+        self.stdout.write(
+            "Attempts per event: "
+            + ", ".join(f"{count}: {total}" for count, total in results["attempts_per_event"].items())
+        )
+        for receiver in results["receivers"]:
+            self.stdout.write(
+                f"Receiver {receiver['url']}: {receiver['requests']} request(s), "
+                f"{receiver['delivered']} delivered, {receiver['duplicates']} duplicate(s), "
+                f"responses {receiver['responses']}."
+            )
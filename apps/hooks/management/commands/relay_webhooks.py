@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.hooks.outbox import BATCH_SIZE, relay_outbox
+
+
+class Command(BaseCommand):
+    help = "Publish pending webhook deliveries from the outbox to the task queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait between polls of the outbox.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="Deliveries to publish per transaction.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Publish every pending delivery once and exit.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            count = relay_outbox(options["batch_size"])
+            if count:
+                self.stdout.write(f"Relayed {count} webhook(s)")
+            if options["once"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,67 @@
+"""
+Prometheus metrics of webhook deliveries.
+
+They are exported by the exposition server of `dramatiq.middleware.Prometheus`
+next to the `dramatiq_*` metrics. That middleware switches `prometheus_client`
+to multiprocess mode after the worker boots, so the metrics are created on
+first use rather than at import time.
+"""
+
+import threading
+
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+PAYLOAD_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+class _Metrics:
+    def __init__(self):
+        # Imported here, see the module docstring.
+        import prometheus_client as prom
+
+        registry = prom.CollectorRegistry()
+        self.deliveries = prom.Counter(
+            "pingfox_webhook_deliveries_total",
+            "Webhook delivery attempts by destination host and status class.",
+            ["host", "status_class"],
+            registry=registry,
+        )
+        self.durations = prom.Histogram(
+            "pingfox_webhook_delivery_seconds",
+            "Time spent in each phase of webhook delivery attempts.",
+            ["host", "phase"],
+            buckets=DURATION_BUCKETS,
+            registry=registry,
+        )
+        self.payload_sizes = prom.Histogram(
+            "pingfox_webhook_payload_bytes",
+            "Size of delivered webhook payloads.",
+            ["host"],
+            buckets=PAYLOAD_BUCKETS,
+            registry=registry,
+        )
+
+
+def _get_metrics():
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = _Metrics()
+    return _metrics
+
+
+def observe_delivery(attempt):
+    """
+    Record a `DeliveryAttempt`.
+    """
+    metrics = _get_metrics()
+    metrics.deliveries.labels(attempt.host, attempt.status_class).inc()
+    metrics.payload_sizes.labels(attempt.host).observe(attempt.payload_size)
+    for phase in ("dns", "connect", "ttfb", "total"):
+        value = getattr(attempt, phase)
+        if value is not None:
+            metrics.durations.labels(attempt.host, phase).observe(value)
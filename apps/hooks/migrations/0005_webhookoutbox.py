@@ -0,0 +1,23 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hooks', '0004_alter_webhookevent_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('webhook_url', models.URLField(max_length=1024)),
+                ('secret', models.CharField(max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='outbox', to='hooks.webhookevent')),
+            ],
+        ),
+    ]
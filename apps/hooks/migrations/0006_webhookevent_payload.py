@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hooks', '0005_webhookoutbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookevent',
+            name='payload',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='webhookevent',
+            name='signature',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
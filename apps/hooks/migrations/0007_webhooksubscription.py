@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:00
+
+import apps.hooks.models
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_alter_team_slug'),
+        ('hooks', '0006_webhookevent_payload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookSubscription',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('*', 'All Events'), ('form.submitted', 'Form Submitted'), ('team.plan_changed', 'Team Plan Changed'), ('form.deleted', 'Form Deleted'), ('visitor.session', 'Visitor Session')], max_length=64)),
+                ('url', models.URLField(max_length=1024)),
+                ('secret', models.CharField(default=apps.hooks.models.generate_webhook_secret, max_length=255)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='webhook_subscriptions', to='accounts.team')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='webhookevent',
+            name='subscription',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='events', to='hooks.webhooksubscription'),
+        ),
+        migrations.AddConstraint(
+            model_name='webhooksubscription',
+            constraint=models.UniqueConstraint(fields=('team', 'event_type', 'url'), name='unique_webhook_subscription'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:02
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hooks', '0007_webhooksubscription'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('host', models.CharField(max_length=255)),
+                ('attempted_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('status_class', models.CharField(choices=[('2xx', 'Success'), ('3xx', 'Redirect'), ('4xx', 'Client Error'), ('5xx', 'Server Error'), ('error', 'Connection Error')], max_length=8)),
+                ('payload_size', models.PositiveIntegerField()),
+                ('dns_ms', models.FloatField(blank=True, null=True)),
+                ('connect_ms', models.FloatField(blank=True, null=True)),
+                ('ttfb_ms', models.FloatField(blank=True, null=True)),
+                ('total_ms', models.FloatField()),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='hooks.webhookevent')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['attempted_at'], name='hooks_webho_attempt_45989b_idx'), models.Index(fields=['host', 'attempted_at'], name='hooks_webho_host_c41abb_idx')],
+            },
+        ),
+    ]
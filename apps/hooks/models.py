@@ -33,6 +33,13 @@ def generate_event_id(prefix="evt_"):
     """
     return f"{prefix}{secrets.token_urlsafe(8)}"
 
+
+def generate_webhook_secret():
+    """
+    Generates the signing secret of a new subscription.
+    """
+    return secrets.token_urlsafe(32)
+
 class WebhookEvent(models.Model):
     FORM_SUBMITTED = "form.submitted"
     TEAM_PLAN_CHANGED = "team.plan_changed"
@@ -51,8 +58,15 @@ class WebhookEvent(models.Model):
 
     team_id = models.CharField(max_length=64)
     site_id = models.CharField(max_length=64, blank=True, null=True)
+    # The endpoint the event is delivered to; empty for form webhooks.
+    subscription = models.ForeignKey(
+        "WebhookSubscription", on_delete=models.SET_NULL, blank=True, null=True, related_name="events"
+    )
 
     data = models.JSONField()
+    # The signed request body, computed once by `apps.hooks.utils.sign_event`.
+    payload = models.BinaryField(blank=True, null=True)
+    signature = models.CharField(max_length=64, blank=True, null=True)
 
     delivered = models.BooleanField(default=False)
     delivery_attempts = models.PositiveIntegerField(default=0)
@@ -60,3 +74,88 @@ class WebhookEvent(models.Model):
 
     def __str__(self):
         return f"{self.type} ({self.id})"
+
+
+class WebhookDelivery(models.Model):
+    """
+    One delivery attempt of an event: its outcome, payload size and timings
+    in milliseconds. Timings of the DNS and connect phases are empty when an
+    open connection was reused.
+    """
+
+    SUCCESS = "2xx"
+    REDIRECT = "3xx"
+    CLIENT_ERROR = "4xx"
+    SERVER_ERROR = "5xx"
+    ERROR = "error"
+    STATUS_CLASSES = [
+        (SUCCESS, "Success"),
+        (REDIRECT, "Redirect"),
+        (CLIENT_ERROR, "Client Error"),
+        (SERVER_ERROR, "Server Error"),
+        (ERROR, "Connection Error"),
+    ]
+
+    event = models.ForeignKey(WebhookEvent, on_delete=models.CASCADE, related_name="deliveries")
+    host = models.CharField(max_length=255)
+    attempted_at = models.DateTimeField(default=timezone.now)
+    status_code = models.PositiveSmallIntegerField(blank=True, null=True)
+    status_class = models.CharField(max_length=8, choices=STATUS_CLASSES)
+    payload_size = models.PositiveIntegerField()
+    dns_ms = models.FloatField(blank=True, null=True)
+    connect_ms = models.FloatField(blank=True, null=True)
+    ttfb_ms = models.FloatField(blank=True, null=True)
+    total_ms = models.FloatField()
+    error = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["attempted_at"]),
+            models.Index(fields=["host", "attempted_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.event_id} → {self.host} ({self.status_code or self.status_class})"
+
+
+class WebhookSubscription(models.Model):
+    """
+    An endpoint of a team that receives one type of event, or every event.
+    Events are matched to subscriptions by `apps.hooks.routing`.
+    """
+
+    ALL_EVENTS = "*"
+    EVENT_TYPES = [(ALL_EVENTS, "All Events"), *WebhookEvent.EVENT_TYPES]
+
+    team = models.ForeignKey("accounts.Team", on_delete=models.CASCADE, related_name="webhook_subscriptions")
+    event_type = models.CharField(max_length=64, choices=EVENT_TYPES)
+    url = models.URLField(max_length=1024)
+    secret = models.CharField(max_length=255, default=generate_webhook_secret)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["team", "event_type", "url"], name="unique_webhook_subscription"),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} → {self.url}"
+
+
+class WebhookOutbox(models.Model):
+    """
+    A webhook delivery waiting to be published to the task queue.
+
+    Rows are written in the same transaction as the event that triggers them
+    and deleted by the relay (`manage.py relay_webhooks`) once their delivery
+    task is enqueued, so requests never wait on the broker.
+    """
+
+    event = models.OneToOneField(WebhookEvent, on_delete=models.CASCADE, related_name="outbox")
+    webhook_url = models.URLField(max_length=1024)
+    secret = models.CharField(max_length=255)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Outbox {self.event_id} → {self.webhook_url}"
@@ -0,0 +1,59 @@
+"""
+Relay of the webhook outbox.
+
+Webhook deliveries are recorded as `WebhookOutbox` rows in the transaction of
+the change that triggers them. The relay claims committed rows in batches,
+enqueues a `deliver_webhook` task for each and deletes them in the same
+transaction. If the broker is unavailable the transaction rolls back and the
+rows are retried on the next pass. Delivery is at least once: a relay that
+dies after enqueueing but before committing enqueues the batch again.
+"""
+
+import dramatiq
+import redis
+from django.db import transaction
+
+from apps.hooks.models import WebhookOutbox
+from apps.hooks.tasks import deliver_webhook
+
+
+BATCH_SIZE = 100
+
+
+def relay_batch(batch_size=BATCH_SIZE, **options):
+    """
+    Publish one batch of pending deliveries. Rows locked by another relay
+    are skipped. `options` are passed on as message options; deliveries are
+    only retried when they include `max_retries`. Returns the number of
+    deliveries enqueued.
+    """
+    with transaction.atomic():
+        rows = list(
+            WebhookOutbox.objects.select_for_update(skip_locked=True).order_by("id")[:batch_size]
+        )
+        for row in rows:
+            deliver_webhook.send_with_options(
+                args=(row.event_id,),
+                kwargs={"webhook_url": row.webhook_url, "secret": row.secret},
+                **options,
+            )
+        WebhookOutbox.objects.filter(id__in=[row.id for row in rows]).delete()
+    return len(rows)
+
+
+def relay_outbox(batch_size=BATCH_SIZE, **options):
+    """
+    Publish every pending delivery. Returns the number enqueued, stopping
+    early when the broker is unavailable.
+    """
+    total = 0
+    while True:
+        try:
+            count = relay_batch(batch_size, **options)
+        except (dramatiq.errors.DramatiqError, redis.RedisError) as e:
+            print(f"[PingFox Webhooks] Broker unavailable, will retry: {e}")
+            break
+        total += count
+        if count < batch_size:
+            break
+    return total
@@ -0,0 +1,129 @@
+"""
+Routing of webhook events to subscribed endpoints.
+
+Each process keeps an index of the active `WebhookSubscription`s keyed by
+`(team_id, event_type)`, so the endpoints of an event are found with a
+dictionary lookup instead of a query. The index is rebuilt when the version
+in the cache changes; saving or deleting a subscription bumps it. A process
+also rebuilds it after `LOCAL_TTL` seconds, so a bump that never reaches it
+(with a per-process cache) only delays the update.
+`publish_event` fans an event out to its endpoints with one bulk insert of
+events and one of outbox rows, in the caller's transaction.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from apps.hooks.models import WebhookEvent, WebhookOutbox, WebhookSubscription
+from apps.hooks.tasks import relay_webhook_outbox
+from apps.hooks.utils import sign_event
+
+
+ROUTING_VERSION_KEY = "hooks:routing:version"
+# Seconds a process keeps its index before reading the subscriptions again.
+LOCAL_TTL = 60
+
+_local = None
+_local_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    """
+    Where and how to deliver an event. `subscription_id` is None for
+    endpoints configured outside of subscriptions, such as form webhooks.
+    """
+
+    url: str
+    secret: str
+    subscription_id: int = None
+
+
+def invalidate_routing_index():
+    """
+    Make every process rebuild the routing index on its next use.
+    """
+    cache.set(ROUTING_VERSION_KEY, cache.get(ROUTING_VERSION_KEY, 0) + 1, None)
+
+
+def _build_index():
+    index = {}
+    subscriptions = WebhookSubscription.objects.filter(is_active=True).values_list(
+        "id", "team_id", "event_type", "url", "secret"
+    )
+    for subscription_id, team_id, event_type, url, secret in subscriptions.order_by("id"):
+        index.setdefault((str(team_id), event_type), []).append(Endpoint(url, secret, subscription_id))
+    return {key: tuple(endpoints) for key, endpoints in index.items()}
+
+
+def get_routing_index():
+    """
+    Return `{(team_id, event_type): (Endpoint, ...)}` for every active
+    subscription. Team IDs are strings, as in `WebhookEvent.team_id`.
+    """
+    global _local
+    version = cache.get(ROUTING_VERSION_KEY, 0)
+    now = time.monotonic()
+    local = _local
+    if local is not None and local[0] == version and local[1] > now:
+        return local[2]
+
+    with _local_lock:
+        index = _build_index()
+        _local = (version, now + LOCAL_TTL, index)
+    return index
+
+
+def get_endpoints(team_id, event_type):
+    """
+    The endpoints subscribed to `event_type` for a team, including those
+    subscribed to every event.
+    """
+    index = get_routing_index()
+    team_id = str(team_id)
+    return index.get((team_id, event_type), ()) + index.get((team_id, WebhookSubscription.ALL_EVENTS), ())
+
+
+def publish_event(event_type, team_id, data, site_id=None, endpoints=()):
+    """
+    Record an event for every subscribed endpoint, plus `endpoints`, and
+    queue their deliveries in the outbox. Each endpoint gets its own
+    `WebhookEvent`, signed with its secret. Once committed, a relay is queued
+    so the deliveries go out without waiting for the next scheduled pass.
+    Returns the created events.
+    """
+    endpoints = [*get_endpoints(team_id, event_type), *endpoints]
+    if not endpoints:
+        return []
+
+    timestamp = timezone.now()
+    events = []
+    for endpoint in endpoints:
+        event = WebhookEvent(
+            type=event_type,
+            timestamp=timestamp,
+            team_id=str(team_id),
+            site_id=site_id,
+            subscription_id=endpoint.subscription_id,
+            data=data,
+        )
+        sign_event(event, endpoint.secret)
+        events.append(event)
+
+    with transaction.atomic():
+        WebhookEvent.objects.bulk_create(events)
+        WebhookOutbox.objects.bulk_create(
+            [
+                WebhookOutbox(event=event, webhook_url=endpoint.url, secret=endpoint.secret)
+                for event, endpoint in zip(events, endpoints)
+            ]
+        )
+        # Robust: the rows are committed, a scheduled relay sends them if the
+        # broker is down.
+        transaction.on_commit(relay_webhook_outbox.send, robust=True)
+    return events
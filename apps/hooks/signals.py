@@ -0,0 +1,15 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.hooks.models import WebhookSubscription
+from apps.hooks.routing import invalidate_routing_index
+
+
+@receiver(post_save, sender=WebhookSubscription)
+@receiver(post_delete, sender=WebhookSubscription)
+def refresh_routing_index(sender, **kwargs):
+    """
+    Rebuild the routing index after any subscription change.
+    """
+    transaction.on_commit(invalidate_routing_index)
@@ -1,36 +1,107 @@
 # billing/tasks.py
 
-import requests
-import json
+from datetime import timedelta
+
 import dramatiq
-from .models import WebhookEvent
-from .serializers import WebhookEventSerializer
-from .utils import generate_webhook_signature
+from dramatiq.middleware import CurrentMessage
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from .delivery import post_webhook
+from .metrics import observe_delivery
+from .models import WebhookDelivery, WebhookEvent
+from .utils import get_signed_payload
 
-@dramatiq.actor
+
+# Attempts failing with these are retried, when retries are enabled.
+RETRY_STATUS_CLASSES = (WebhookDelivery.SERVER_ERROR, WebhookDelivery.ERROR)
+RETRY_STATUS_CODES = (408, 429)
+
+
+def _to_ms(seconds):
+    return round(seconds * 1000, 3) if seconds is not None else None
+
+
+def _retries_enabled():
+    message = CurrentMessage.get_current_message()
+    return message is not None and bool(message.options.get("max_retries"))
+
+
+@dramatiq.actor(queue_name="webhooks")
 def deliver_webhook(event_id: str, webhook_url: str, secret: str):
+    """
+    POST the stored payload of an event. The body and signature are computed
+    once, so retries send the same bytes without serializing again. Every
+    attempt is recorded as a `WebhookDelivery` and in the Prometheus metrics.
+    Failed attempts are final, unless the message was sent with a
+    `max_retries` option (see `relay_outbox`): then network errors, timeouts,
+    rate limiting and server errors are retried with the message's backoff.
+    """
     try:
-        event = WebhookEvent.objects.get(id=event_id)
-        serializer = WebhookEventSerializer(event)
-        payload_json = json.dumps(serializer.data, default=str)
-
-        signature = generate_webhook_signature(payload_json, secret)
-
-        response = requests.post(
-            webhook_url,
-            data=payload_json,
-            headers={
-                "Content-Type": "application/json",
-                "X-PingFox-Signature": f"sha256={signature}",
-            },
-            timeout=5,
-        )
-
-        event.delivered = response.status_code < 400
-        event.last_delivery_status = f"{response.status_code}: {response.text[:200]}"
-    except Exception as e:
-        event.delivered = False
-        event.last_delivery_status = f"Error: {str(e)}"
-    finally:
-        event.delivery_attempts += 1
-        event.save(update_fields=["delivered", "last_delivery_status", "delivery_attempts"])
+        payload, signature = get_signed_payload(event_id, secret)
+    except WebhookEvent.DoesNotExist:
+        print(f"[PingFox Webhooks] Event {event_id} no longer exists, skipping delivery.")
+        return
+
+    attempt = post_webhook(
+        webhook_url,
+        payload,
+        headers={
+            "Content-Type": "application/json",
+            "X-PingFox-Signature": f"sha256={signature}",
+        },
+        timeout=5,
+    )
+    observe_delivery(attempt)
+    WebhookDelivery.objects.create(
+        event_id=event_id,
+        host=attempt.host[:255],
+        status_code=attempt.status_code,
+        status_class=attempt.status_class,
+        payload_size=attempt.payload_size,
+        dns_ms=_to_ms(attempt.dns),
+        connect_ms=_to_ms(attempt.connect),
+        ttfb_ms=_to_ms(attempt.ttfb),
+        total_ms=_to_ms(attempt.total),
+        error=attempt.error[:255],
+    )
+
+    if attempt.status_code is not None:
+        last_delivery_status = f"{attempt.status_code}: {attempt.response_text}"
+    else:
+        last_delivery_status = f"Error: {attempt.error}"[:255]
+    WebhookEvent.objects.filter(id=event_id).update(
+        delivered=attempt.delivered,
+        last_delivery_status=last_delivery_status,
+        delivery_attempts=F("delivery_attempts") + 1,
+    )
+    retry = attempt.status_class in RETRY_STATUS_CLASSES or attempt.status_code in RETRY_STATUS_CODES
+    if retry and _retries_enabled():
+        raise dramatiq.Retry(f"Delivery of {event_id} to {attempt.host} failed: {last_delivery_status}")
+
+
+@dramatiq.actor
+def prune_webhook_deliveries():
+    """
+    Delete delivery records older than PINGFOX_WEBHOOK_DELIVERY_RETENTION_DAYS.
+    """
+    cutoff = timezone.now() - timedelta(days=settings.PINGFOX_WEBHOOK_DELIVERY_RETENTION_DAYS)
+    deleted, _ = WebhookDelivery.objects.filter(attempted_at__lt=cutoff).delete()
+    if deleted:
+        print(f"[PingFox Webhooks] Pruned {deleted} delivery record(s).")
+    return deleted
+
+
+@dramatiq.actor
+def relay_webhook_outbox():
+    """
+    Publish pending webhook deliveries; a fallback for deployments that do not
+    run `manage.py relay_webhooks`.
+    """
+    # Imported here: the outbox module imports this one.
+    from .outbox import relay_outbox
+
+    count = relay_outbox()
+    if count:
+        print(f"[PingFox Webhooks] Relayed {count} webhook(s).")
+    return count
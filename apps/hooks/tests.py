@@ -1,3 +1,185 @@
+import hashlib
+import hmac
+import json
+from datetime import datetime, timezone as dt_timezone
+from unittest import mock
+
+import dramatiq
+import redis
+from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-# Create your tests here.
+from apps.accounts.models import Team
+from apps.hooks import routing
+from apps.hooks.delivery import DeliveryAttempt
+from apps.hooks.models import WebhookDelivery, WebhookEvent, WebhookOutbox, WebhookSubscription
+from apps.hooks.outbox import relay_outbox
+from apps.hooks.routing import get_endpoints, invalidate_routing_index, publish_event
+from apps.hooks.tasks import deliver_webhook, relay_webhook_outbox
+from apps.hooks.utils import encode_payload, generate_webhook_signature, get_signed_payload, sign_event
+
+
+def create_event(**kwargs):
+    return WebhookEvent.objects.create(
+        type=WebhookEvent.FORM_SUBMITTED,
+        timestamp=datetime(2026, 1, 2, 3, 4, 5, tzinfo=dt_timezone.utc),
+        team_id="1",
+        data={"form_name": "Contact", "fields": {"name": "Zoë"}},
+        **kwargs,
+    )
+
+
+class SigningTests(TestCase):
+    def test_payload_is_canonical(self):
+        event = create_event()
+        payload = encode_payload(event)
+        body = json.loads(payload)
+        self.assertEqual(list(body), sorted(body))
+        self.assertEqual(body["timestamp"], "2026-01-02T03:04:05Z")
+        self.assertNotIn(b", ", payload)
+        self.assertIn("Zoë".encode(), payload)
+
+    def test_signature_is_keyed_with_the_secret(self):
+        payload = b'{"id":"evt"}'
+        expected = hmac.new(b"secret", payload, hashlib.sha256).hexdigest()
+        self.assertEqual(generate_webhook_signature("secret", payload), expected)
+        self.assertEqual(generate_webhook_signature("secret", payload.decode()), expected)
+
+    def test_sign_event(self):
+        event = create_event()
+        sign_event(event, "secret")
+        self.assertEqual(event.payload, encode_payload(event))
+        self.assertEqual(event.signature, generate_webhook_signature("secret", event.payload))
+
+    def test_signs_events_created_before_payloads_were_stored(self):
+        event = create_event()
+        payload, signature = get_signed_payload(event.id, "secret")
+        self.assertEqual(signature, generate_webhook_signature("secret", payload))
+        event.refresh_from_db()
+        self.assertEqual(bytes(event.payload), payload)
+
+    def test_stored_payload_is_sent_as_is(self):
+        event = create_event(payload=b"{}", signature="abc")
+        self.assertEqual(get_signed_payload(event.id, "secret"), (b"{}", "abc"))
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        for index in range(3):
+            WebhookOutbox.objects.create(
+                event=create_event(), webhook_url=f"https://example.com/{index}/", secret="secret"
+            )
+
+    def test_relays_every_row(self):
+        with mock.patch.object(deliver_webhook, "send_with_options") as send:
+            self.assertEqual(relay_outbox(batch_size=2, max_retries=3), 3)
+        self.assertFalse(WebhookOutbox.objects.exists())
+        self.assertEqual(send.call_count, 3)
+        self.assertEqual(send.call_args.kwargs["max_retries"], 3)
+        self.assertEqual(send.call_args.kwargs["kwargs"]["secret"], "secret")
+
+    def test_keeps_rows_when_broker_is_unavailable(self):
+        with mock.patch.object(deliver_webhook, "send_with_options", side_effect=redis.ConnectionError):
+            self.assertEqual(relay_outbox(), 0)
+        self.assertEqual(WebhookOutbox.objects.count(), 3)
+
+
+class DeliveryTests(TestCase):
+    def deliver(self, status_code, retries=False, **kwargs):
+        event = create_event()
+        attempt = DeliveryAttempt(
+            host="example.com", payload_size=10, status_code=status_code, total=0.01, **kwargs
+        )
+        with (
+            mock.patch("apps.hooks.tasks.post_webhook", return_value=attempt),
+            mock.patch("apps.hooks.tasks._retries_enabled", return_value=retries),
+        ):
+            deliver_webhook(event.id, "https://example.com/", "secret")
+        event.refresh_from_db()
+        return event
+
+    def test_records_the_attempt(self):
+        event = self.deliver(200)
+        self.assertTrue(event.delivered)
+        self.assertEqual(event.delivery_attempts, 1)
+        delivery = WebhookDelivery.objects.get(event=event)
+        self.assertEqual((delivery.status_class, delivery.total_ms), ("2xx", 10.0))
+
+    def test_failure_is_final_without_retry_options(self):
+        event = self.deliver(503)
+        self.assertFalse(event.delivered)
+        self.assertEqual(event.last_delivery_status, "503: ")
+
+    def test_records_network_errors(self):
+        event = self.deliver(None, error="ConnectionError")
+        self.assertEqual(event.last_delivery_status, "Error: ConnectionError")
+        self.assertEqual(WebhookDelivery.objects.get(event=event).status_class, WebhookDelivery.ERROR)
+
+    def test_retries_server_errors_and_rate_limits(self):
+        for status_code in (None, 429, 503):
+            with self.subTest(status_code=status_code), self.assertRaises(dramatiq.Retry):
+                self.deliver(status_code, retries=True)
+
+    def test_client_errors_are_final(self):
+        event = self.deliver(404, retries=True)
+        self.assertFalse(event.delivered)
+        self.assertEqual(event.delivery_attempts, 1)
+
+
+class RoutingTests(TestCase):
+    def setUp(self):
+        owner = get_user_model().objects.create_user(username="owner", password="password")
+        self.team = Team.objects.create(name="Team", slug="team", owner=owner)
+        routing._local = None
+        self.addCleanup(setattr, routing, "_local", None)
+
+    def subscribe(self, event_type=WebhookEvent.FORM_SUBMITTED, url="https://example.com/hook/", **kwargs):
+        return WebhookSubscription.objects.create(team=self.team, event_type=event_type, url=url, **kwargs)
+
+    def test_routes_by_team_and_event_type(self):
+        subscription = self.subscribe()
+        catch_all = self.subscribe(WebhookSubscription.ALL_EVENTS)
+        self.subscribe(url="https://example.com/inactive/", is_active=False)
+        invalidate_routing_index()
+        endpoints = get_endpoints(self.team.pk, WebhookEvent.FORM_SUBMITTED)
+        self.assertEqual([endpoint.subscription_id for endpoint in endpoints], [subscription.pk, catch_all.pk])
+        self.assertEqual(get_endpoints(self.team.pk + 1, WebhookEvent.FORM_SUBMITTED), ())
+
+    def test_version_bump_rebuilds_the_index(self):
+        self.assertEqual(get_endpoints(self.team.pk, WebhookEvent.FORM_SUBMITTED), ())
+        self.subscribe()
+        invalidate_routing_index()
+        self.assertEqual(len(get_endpoints(self.team.pk, WebhookEvent.FORM_SUBMITTED)), 1)
+
+    def test_rebuilds_the_index_without_a_version_bump_after_the_ttl(self):
+        self.assertEqual(get_endpoints(self.team.pk, WebhookEvent.FORM_SUBMITTED), ())
+        # Saving does not bump the version here: on_commit callbacks do not run.
+        self.subscribe()
+        self.assertEqual(get_endpoints(self.team.pk, WebhookEvent.FORM_SUBMITTED), ())
+        later = routing.time.monotonic() + routing.LOCAL_TTL + 1
+        with mock.patch.object(routing.time, "monotonic", return_value=later):
+            self.assertEqual(len(get_endpoints(self.team.pk, WebhookEvent.FORM_SUBMITTED)), 1)
+
+    def test_publish_event_signs_one_event_per_endpoint(self):
+        self.subscribe(secret="first")
+        invalidate_routing_index()
+        extra = routing.Endpoint("https://example.org/hook/", "second")
+        events = publish_event(WebhookEvent.FORM_SUBMITTED, self.team.pk, {"x": 1}, endpoints=[extra])
+        self.assertEqual(len(events), 2)
+        for event, secret in zip(events, ["first", "second"]):
+            self.assertEqual(event.signature, generate_webhook_signature(secret, event.payload))
+        self.assertEqual(
+            sorted(WebhookOutbox.objects.values_list("webhook_url", flat=True)),
+            ["https://example.com/hook/", "https://example.org/hook/"],
+        )
+
+    def test_publish_event_queues_a_relay_once_committed(self):
+        self.subscribe()
+        invalidate_routing_index()
+        with (
+            mock.patch.object(relay_webhook_outbox, "send") as send,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            publish_event(WebhookEvent.FORM_SUBMITTED, self.team.pk, {"x": 1})
+            send.assert_not_called()
+        send.assert_called_once_with()
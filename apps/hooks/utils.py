@@ -1,7 +1,62 @@
 import hmac, hashlib
+import json
+
+from rest_framework import serializers
+
+from .models import WebhookEvent
+
+
+# Formats timestamps exactly like `WebhookEventSerializer`.
+_timestamp_field = serializers.DateTimeField()
+
 
 def generate_webhook_signature(secret, payload):
     """
     Generate a HMAC signature for the given payload using the provided secret.
     """
-    return hmac.new(secret.encode(), payload.encode(), hashlib.sha256).hexdigest()
\ No newline at end of file
+    if isinstance(payload, str):
+        payload = payload.encode()
+    return hmac.new(secret.encode(), payload, hashlib.sha256).hexdigest()
+
+
+def encode_payload(event):
+    """
+    The canonical JSON body of an event: the fields of
+    `WebhookEventSerializer`, compact, with sorted keys and UTF-8 encoded.
+    """
+    body = {
+        "id": event.id,
+        "type": event.type,
+        "timestamp": _timestamp_field.to_representation(event.timestamp),
+        # Unsaved instances may still hold integer IDs.
+        "team_id": str(event.team_id),
+        "site_id": str(event.site_id) if event.site_id is not None else None,
+        "data": event.data,
+    }
+    return json.dumps(body, separators=(",", ":"), sort_keys=True, ensure_ascii=False, default=str).encode()
+
+
+def sign_event(event, secret):
+    """
+    Store the payload and signature of an event on the instance, without
+    saving it. Done once; every delivery attempt sends the stored bytes.
+    """
+    event.payload = encode_payload(event)
+    event.signature = generate_webhook_signature(secret, event.payload)
+
+
+def get_signed_payload(event_id, secret):
+    """
+    Return `(payload, signature)` for an event, signing it first if it was
+    created before payloads were stored.
+    """
+    row = WebhookEvent.objects.filter(id=event_id).values_list("payload", "signature").first()
+    if row is None:
+        raise WebhookEvent.DoesNotExist(f"Webhook event {event_id} does not exist.")
+    payload, signature = row
+    if payload is None or not signature:
+        event = WebhookEvent.objects.get(id=event_id)
+        sign_event(event, secret)
+        event.save(update_fields=["payload", "signature"])
+        return event.payload, event.signature
+    return bytes(payload), signature
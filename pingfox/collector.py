@@ -0,0 +1,174 @@
+"""
+Standalone edge collector for pingfox.
+
+A minimal ASGI application that accepts `pf.js` beacons without the Django
+request stack: no middleware, URL resolution or database access per request.
+Beacons are validated with the same code as `collect_data`, checked against a
+local snapshot of the site IDs and forwarded to the ingestion queue in batches.
+Run it next to (or instead of) the main app for collection traffic:
+
+    uvicorn pingfox.collector:application --workers 4
+
+and point `PINGFOX_COLLECTOR_URL` at its collect URL so pf.js uses it.
+"""
+
+import asyncio
+import json
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pingfox.settings')
+django.setup()
+
+from django.conf import settings  # noqa: E402
+
+from apps.analytics.edge import SiteSnapshot, forward_beacons, forward_spool  # noqa: E402
+from apps.analytics.geoip import resolve_client_ip  # noqa: E402
+from apps.analytics.ingest import MAX_PAYLOAD_SIZE, InvalidBeacon, decode_payload, make_beacon  # noqa: E402
+from apps.analytics.spool import spool_beacon, spool_writer  # noqa: E402
+from apps.core.utils import CORS_HEADERS  # noqa: E402
+
+
+COLLECT_PATH = "/api/analytics/collect/"
+HEALTH_PATH = "/health/"
+
+_CORS_HEADERS = [(name.lower().encode(), value.encode()) for name, value in CORS_HEADERS.items()]
+
+
+class Collector:
+    """
+    The collector application. Accepted beacons are buffered in memory and
+    flushed by a background task every `PINGFOX_COLLECTOR_FLUSH_INTERVAL`
+    seconds, or as soon as `PINGFOX_COLLECTOR_BATCH_SIZE` are waiting.
+    """
+
+    def __init__(self):
+        self.snapshot = SiteSnapshot()
+        self.buffer = []
+        self._full = None
+        self._flusher = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            self._start()
+            await self._handle(scope, receive, send)
+
+    def _start(self):
+        if self._flusher is None:
+            self._full = asyncio.Event()
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await asyncio.to_thread(self.snapshot.refresh)
+                self._start()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self._flusher is not None:
+                    self._flusher.cancel()
+                await self._flush()
+                await asyncio.to_thread(spool_writer.close)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), settings.PINGFOX_COLLECTOR_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            try:
+                await self._flush()
+                if self.snapshot.is_stale():
+                    await asyncio.to_thread(self.snapshot.refresh)
+            except Exception as e:
+                # Keep flushing; the beacons of a failed batch are spooled.
+                print(f"[PingFox Edge] Flush failed: {e}")
+
+    async def _flush(self):
+        beacons, self.buffer = self.buffer, []
+        if beacons:
+            try:
+                sent = await asyncio.to_thread(forward_beacons, beacons)
+            except Exception:
+                # forward_beacons only spools on broker errors; keep the batch.
+                await asyncio.to_thread(self._spool, beacons)
+                raise
+            if sent:
+                await asyncio.to_thread(forward_spool)
+
+    def _spool(self, beacons):
+        for beacon in beacons:
+            spool_beacon(beacon)
+
+    async def _handle(self, scope, receive, send):
+        method = scope["method"]
+        if scope["path"] == HEALTH_PATH:
+            await self._respond(send, 200, {"status": "ok", "buffered": len(self.buffer)})
+            return
+        if scope["path"] != COLLECT_PATH:
+            await self._respond(send, 404, {"status": "error", "message": "Not found."})
+            return
+        if method == "OPTIONS":
+            await self._respond(send, 204, None)
+            return
+        if method != "POST":
+            await self._respond(send, 400, {"status": "error", "message": "Invalid request method."})
+            return
+
+        try:
+            data = decode_payload(await self._read_body(receive))
+        except InvalidBeacon as e:
+            await self._respond(send, 400, {"status": "error", "message": str(e)})
+            return
+        if data["site_id"] not in self.snapshot:
+            await self._respond(send, 404, {"status": "error", "message": "Site not found."})
+            return
+
+        headers = dict(scope["headers"])
+        client_ip = resolve_client_ip(
+            (scope.get("client") or ("", 0))[0],
+            headers.get(b"x-forwarded-for", b"").decode("latin-1"),
+        )
+        beacon = make_beacon(data, client_ip)
+        self.buffer.append(beacon)
+        if len(self.buffer) >= settings.PINGFOX_COLLECTOR_BATCH_SIZE:
+            self._full.set()
+        await self._respond(
+            send,
+            202,
+            {
+                "status": "success",
+                "message": "Data queued.",
+                "visitor_id": beacon["pf_id"],
+                "page_view_id": None,
+            },
+        )
+
+    async def _read_body(self, receive):
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            # Stop reading early; decode_payload rejects the oversized body.
+            if not message.get("more_body") or len(body) > MAX_PAYLOAD_SIZE:
+                return body
+
+    async def _respond(self, send, status, payload):
+        body = json.dumps(payload).encode() if payload is not None else b""
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            *_CORS_HEADERS,
+        ]
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+application = Collector()
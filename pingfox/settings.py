@@ -27,6 +27,7 @@ env = environ.Env(
     DB_HOST=(str, "localhost"),
     DB_PORT=(str, "5432"),
     REDIS_URL=(str, "redis://localhost:6379"),
+    CACHE_URL=(str, ""),
     DJANGO_EMAIL_BACKEND=(str, "django.core.mail.backends.console.EmailBackend"),
     EMAIL_HOST=(str, "smtp.gmail.com"),
     EMAIL_PORT=(int, 587),
@@ -36,6 +37,22 @@ env = environ.Env(
     PINGFOX_SITE_ID=(str, "default-site-id"),
     PINGFOX_JS_SRC_URL=(str, "http://localhost:8000/pf.js"),
     PINGFOX_VERIFICATION_TOKEN=(str, "default-verification-token"),
+    PINGFOX_QUOTA_POLICY=(str, "drop"),
+    PINGFOX_QUOTA_SAMPLE_RATE=(float, 0.1),
+    PINGFOX_DASHBOARD_WORKERS=(int, 4),
+    PINGFOX_VISIT_TIMEOUT=(int, 30),
+    PINGFOX_GEOIP_DATABASE=(str, ""),
+    PINGFOX_TRUST_X_FORWARDED_FOR=(bool, False),
+    PINGFOX_SPOOL_DIR=(str, ""),
+    PINGFOX_SPOOL_SEGMENT_SIZE=(int, 8 * 1024 * 1024),
+    PINGFOX_SPOOL_SEGMENT_AGE=(int, 60),
+    PINGFOX_SPOOL_FSYNC_EVERY=(int, 100),
+    PINGFOX_DASHBOARD_LAZY_PANELS=(bool, True),
+    PINGFOX_COLLECTOR_URL=(str, ""),
+    PINGFOX_COLLECTOR_BATCH_SIZE=(int, 500),
+    PINGFOX_COLLECTOR_FLUSH_INTERVAL=(float, 1.0),
+    PINGFOX_COLLECTOR_SNAPSHOT_INTERVAL=(int, 30),
+    PINGFOX_WEBHOOK_DELIVERY_RETENTION_DAYS=(int, 30),
 )
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -89,6 +106,7 @@ LOGIN_REDIRECT_URL = "core:home"
 
 
 MIDDLEWARE = [
+    "apps.core.middleware.LeanRouteMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
@@ -101,6 +119,15 @@ MIDDLEWARE = [
     "apps.accounts.middleware.UserActivationMiddleware",
 ]
 
+# Middleware skipped for views marked with `apps.core.utils.lean_route`: public
+# endpoints that never use sessions, users or messages.
+LEAN_ROUTE_SKIPPED_MIDDLEWARE = [
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+    "apps.accounts.middleware.UserActivationMiddleware",
+]
+
 
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -116,16 +143,28 @@ CSRF_TRUSTED_ORIGINS = [
 ]
 
 
+REDIS_URL = env("REDIS_URL", default="redis://localhost:6379")
+
+# The cache carries invalidation versions (charts, webhook routing, plans, team
+# navigation) between the web and worker processes, so it must be shared by all
+# of them. Defaults to the Redis server of the broker; `locmemcache://` is only
+# safe when everything runs in a single process.
+CACHES = {
+    "default": env.cache("CACHE_URL", default=REDIS_URL),
+}
+
 DRAMATIQ_BROKER = {
     "BROKER": "dramatiq.brokers.redis.RedisBroker",
     "OPTIONS": {
-        "url": env("REDIS_URL", default="redis://localhost:6379"),
+        "url": REDIS_URL,
     },
     "MIDDLEWARE": [
         "dramatiq.middleware.Prometheus",
         "dramatiq.middleware.AgeLimit",
         "dramatiq.middleware.TimeLimit",
         "dramatiq.middleware.Retries",
+        # Lets deliver_webhook read the retry options of its message.
+        "dramatiq.middleware.CurrentMessage",
         "django_dramatiq.middleware.DbConnectionsMiddleware",
     ],
 }
@@ -236,6 +275,63 @@ PINGFOX_SITE_ID = env("PINGFOX_SITE_ID", default="default-site-id")
 PINGFOX_JS_SRC_URL = env("PINGFOX_JS_SRC_URL", default="http://localhost:8000/pf.js")
 PINGFOX_VERIFICATION_TOKEN = env("PINGFOX_VERIFICATION_TOKEN")
 
+# What to do with beacons once a team (or a site with a limit override) has
+# used up its pageview quota: "drop", "sample" or "flag".
+PINGFOX_QUOTA_POLICY = env("PINGFOX_QUOTA_POLICY", default="drop")
+# Fraction of over-quota beacons that are still stored with the "sample" policy.
+PINGFOX_QUOTA_SAMPLE_RATE = env("PINGFOX_QUOTA_SAMPLE_RATE", default=0.1)
+
+# Minutes of inactivity after which a visitor's next page view starts a new visit.
+PINGFOX_VISIT_TIMEOUT = env("PINGFOX_VISIT_TIMEOUT", default=30)
+
+# Path of a MaxMind DB file (e.g. GeoLite2-Country.mmdb) used to resolve
+# visitors' countries. Requires the optional `maxminddb` package; empty disables it.
+PINGFOX_GEOIP_DATABASE = env("PINGFOX_GEOIP_DATABASE", default="")
+# Take the client IP from X-Forwarded-For. Only enable behind a trusted proxy.
+PINGFOX_TRUST_X_FORWARDED_FOR = env("PINGFOX_TRUST_X_FORWARDED_FOR", default=False)
+
+# Beacons that cannot be stored while the database is unavailable are appended
+# to segment files in this directory. Each host replays its own directory with
+# `manage.py replay_spool --loop`; the `replay_ingest_spool` actor only sees it
+# when the directory is on storage shared with the workers.
+PINGFOX_SPOOL_DIR = env("PINGFOX_SPOOL_DIR", default="") or BASE_DIR / "spool"
+# A segment is sealed for replay at this size (bytes) or age (seconds).
+PINGFOX_SPOOL_SEGMENT_SIZE = env("PINGFOX_SPOOL_SEGMENT_SIZE", default=8 * 1024 * 1024)
+PINGFOX_SPOOL_SEGMENT_AGE = env("PINGFOX_SPOOL_SEGMENT_AGE", default=60)
+# Spooled beacons are fsynced in batches of this size (and at least every second).
+PINGFOX_SPOOL_FSYNC_EVERY = env("PINGFOX_SPOOL_FSYNC_EVERY", default=100)
+
+# Threads computing dashboard panels concurrently, shared by all requests.
+PINGFOX_DASHBOARD_WORKERS = env("PINGFOX_DASHBOARD_WORKERS", default=4)
+# Render uncached dashboard panels as placeholders loaded by HTMX after the
+# first paint, instead of computing them before the page is returned.
+PINGFOX_DASHBOARD_LAZY_PANELS = env("PINGFOX_DASHBOARD_LAZY_PANELS", default=True)
+
+# Public collect URL of the edge collector (`uvicorn pingfox.collector:application`)
+# that pf.js sends beacons to, e.g. "https://collect.example.com/api/analytics/collect/".
+# Empty sends them to this app's own collect endpoint.
+PINGFOX_COLLECTOR_URL = env("PINGFOX_COLLECTOR_URL", default="")
+# The edge collector forwards beacons to the ingestion queue in batches of this
+# size, or every this many seconds, whichever comes first.
+PINGFOX_COLLECTOR_BATCH_SIZE = env("PINGFOX_COLLECTOR_BATCH_SIZE", default=500)
+PINGFOX_COLLECTOR_FLUSH_INTERVAL = env("PINGFOX_COLLECTOR_FLUSH_INTERVAL", default=1.0)
+# Seconds between checks of the edge collector for a changed site snapshot.
+PINGFOX_COLLECTOR_SNAPSHOT_INTERVAL = env("PINGFOX_COLLECTOR_SNAPSHOT_INTERVAL", default=30)
+
+# Days to keep the per-attempt webhook delivery records shown in the admin.
+PINGFOX_WEBHOOK_DELIVERY_RETENTION_DAYS = env("PINGFOX_WEBHOOK_DELIVERY_RETENTION_DAYS", default=30)
+
+# Actors enqueued by `manage.py runscheduler`, mapped to their interval in seconds.
+PINGFOX_PERIODIC_TASKS = {
+    "apps.analytics.tasks.reconcile_pageview_quotas": 15 * 60,
+    "apps.analytics.tasks.prune_expired_data": 24 * 60 * 60,
+    "apps.analytics.tasks.rollup_daily_stats": 15 * 60,
+    "apps.analytics.tasks.replay_ingest_spool": 60,
+    "apps.analytics.tasks.sync_site_snapshot": 5 * 60,
+    "apps.hooks.tasks.relay_webhook_outbox": 60,
+    "apps.hooks.tasks.prune_webhook_deliveries": 24 * 60 * 60,
+}
+
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (